@@ -0,0 +1,266 @@
+#!/usr/bin/python3
+"""Serialized in-process build API
+
+Runs a project's build inside the calling Python process, i.e. without
+spawning an interpreter for the project's nqbp.py script (and without
+re-importing NQBP and re-parsing the usage string), e.g. for helper scripts
+that build a dependent project (see other/compile_catch2_base.py):
+
+    from nqbplib import api
+    result = api.build( '/work/pkg/projects/foo/linux/gcc', 'posix64', ['-g'] )
+    if ( not result.ok ):
+        print( result.reason )
+        for d in result.diagnostics:
+            print( d.file, d.line, d.severity, d.message )
+
+build() never exits the process, i.e. a failed build (including the errors
+that nqbp.py reports by exiting) is returned as a failed BuildResult.
+
+This is NOT a re-entrant build engine.  A build still uses the process wide
+NQBP state (the my_globals values, the current working directory, the
+environment variables, the directory stack), which is saved before and
+restored after each build, i.e. builds do not see the state of previous
+builds and the caller's state is unchanged.  Because the state is process
+wide, builds are serialized (one build at a time per process).  Build
+orchestrators that run builds concurrently (e.g. bob) use one process per
+build.
+
+Capturing the output (capture=True, the default) is process wide as well: the
+stdout/stderr file descriptors (1 and 2) of the process are redirected for the
+duration of the build, i.e. the output of ALL threads of the calling process
+(not just the build's) is captured while a build runs.  Hosts that write to the
+console from other threads while building (e.g. an IDE or a progress display)
+should pass capture=False.
+
+The NQBP_WORK_ROOT, NQBP_PKG_ROOT, and NQBP_XPKGS_ROOT environment variables
+must be set (same as for nqbp.py).
+"""
+
+import os
+import re
+import sys
+import time
+import shlex
+import tempfile
+import threading
+import traceback
+import collections
+import importlib.util
+
+#
+from . import utils
+from . import my_globals
+from .output import Printer
+
+# Name of the toolchain module in the project directory
+TOOLCHAIN_MODULE = 'mytoolchain.py'
+
+# A compiler/linker message
+Diagnostic = collections.namedtuple( 'Diagnostic', 'file line column severity message' )
+
+# Compiler message formats: GCC/Clang and MSVC
+_DIAG_GCC  = re.compile( r'^(?P<file>(?:[A-Za-z]:)?[^:\s][^:]*):(?P<line>\d+):(?:(?P<column>\d+):)?\s*(?:fatal )?(?P<severity>error|warning|note):\s*(?P<message>.*)$' )
+_DIAG_MSVC = re.compile( r'^(?P<file>\S.*?)\((?P<line>\d+)(?:,(?P<column>\d+))?\)\s*:\s*(?:fatal )?(?P<severity>error|warning)\b\s*(?P<message>.*)$' )
+
+# Serializes the builds (the NQBP state is process wide)
+_lock = threading.Lock()
+
+
+#-----------------------------------------------------------------------------
+class BuildResult:
+    """ The outcome of a build:
+
+        project      The project directory
+        ok           True if the build succeeded
+        rc           Exit code of the equivalent nqbp.py invocation
+        reason       Error message of a failed build (or None)
+        elapsed      Wall time of the build in seconds
+        variants     The build variants that were built (in order)
+        artifacts    Dictionary of variant -> final output file (for the
+                     variants that were built successfully)
+        phases       List of (phase, elapsed-seconds) of the build phases
+        edges        Dictionary of the ninja edge counts (edges executed,
+                     total, objects, compiled, compile_ms, archived,
+                     archive_ms), summed over the variants, and the peak
+                     number of concurrent edges (peak_parallel)
+        output       The build's output (stdout/stderr of NQBP, ninja, and the
+                     compiler), or None when the output was not captured
+        diagnostics  List of the Diagnostics found in the output
+        events       The build's events (see the nqbp.py '--events' option)
+    """
+    def __init__( self, project ):
+        self.project     = project
+        self.ok          = False
+        self.rc          = None
+        self.reason      = None
+        self.elapsed     = 0.0
+        self.variants    = []
+        self.artifacts   = {}
+        self.phases      = []
+        self.edges       = {}
+        self.output      = None
+        self.diagnostics = []
+        self.events      = []
+
+    def __repr__( self ):
+        return f"BuildResult({self.project!r}, ok={self.ok}, rc={self.rc}, elapsed={self.elapsed:.3f})"
+
+    def _add_event( self, record ):
+        self.events.append( record )
+        name = record['event']
+        if ( name == 'variant_start' ):
+            self.variants.append( record['variant'] )
+        elif ( name == 'variant_end' ):
+            self.artifacts[record['variant']] = record['output']
+        elif ( name == 'phase' ):
+            self.phases.append( (record['phase'], record['elapsed']) )
+        elif ( name == 'ninja_edges' ):
+            for k, v in record.items():
+                if ( k == 'peak_parallel' ):
+                    self.edges[k] = max( self.edges.get( k, 0 ), v )
+                elif ( k not in ('ts', 'event') ):
+                    self.edges[k] = self.edges.get( k, 0 ) + v
+
+
+#-----------------------------------------------------------------------------
+def build( project_dir, variant=None, options=None, capture=True ):
+    """ Builds the project in 'project_dir' (i.e. the directory that contains
+        the project's nqbp.py and mytoolchain.py files).  'variant' is the
+        build variant (None is the toolchain's default variant).  'options'
+        are additional nqbp.py command line options, either a list or a
+        string, e.g. ['-g', '--bldnum', '12'].  When 'capture' is set, the
+        build's output is captured (BuildResult.output) instead of written to
+        the console.  Returns a BuildResult.
+    """
+    project_dir = os.path.abspath( project_dir )
+    if ( options == None ):
+        options = []
+    elif ( isinstance( options, str ) ):
+        options = shlex.split( options, posix=(os.name == 'posix') )
+    argv = [ os.path.join( project_dir, 'nqbp.py' ) ] + list( options )
+    if ( variant != None ):
+        argv.extend( ['-b', variant] )
+
+    result  = BuildResult( project_dir )
+    printer = Printer()
+    printer.add_event_listener( result._add_event )
+    with _lock:
+        state = _save_state()
+        start = time.time()
+        try:
+            with _capture_output( capture ) as captured:
+                result.rc, result.reason = _run( argv, project_dir, printer, variant )
+        finally:
+            _restore_state( state )
+        result.elapsed = time.time() - start
+
+    result.ok = result.rc == 0
+    if ( capture ):
+        result.output      = captured.text
+        result.diagnostics = parse_diagnostics( result.output, _variant_dir( project_dir, result ) )
+    if ( not result.ok and result.reason == None ):
+        errors        = [ l.strip() for l in (result.output or '').splitlines() if l.startswith( 'ERROR:' ) ]
+        result.reason = errors[-1] if errors else f"ERROR: Build failed (exit code {result.rc})"
+    return result
+
+def parse_diagnostics( text, cwd=None ):
+    """ Returns the list of compiler Diagnostics (GCC/Clang and MSVC formats)
+        in 'text'.  Relative file names are relative to 'cwd' (when set).
+    """
+    result = []
+    for line in text.splitlines():
+        m = _DIAG_GCC.match( line ) or _DIAG_MSVC.match( line.strip() )
+        if ( m ):
+            column = m.group( 'column' )
+            fname  = m.group( 'file' )
+            if ( cwd != None ):
+                fname = os.path.normpath( os.path.join( cwd, fname ) )
+            result.append( Diagnostic( fname, int( m.group( 'line' ) ), int( column ) if column else None, m.group( 'severity' ), m.group( 'message' ).strip() ) )
+    return result
+
+#-----------------------------------------------------------------------------
+def _variant_dir( project_dir, result ):
+    # The compiler runs in the variant directory (Note: a build stops at the first failed variant)
+    return os.path.join( project_dir, '_' + result.variants[-1] ) if result.variants else project_dir
+
+def _run( argv, project_dir, printer, variant ):
+    # Runs the build. Returns (rc, reason)
+    from . import mk
+    try:
+        utils.set_pkg_and_wrkspace_roots( argv[0] )
+        mk.build( argv, lambda: _load_toolchain( project_dir, variant ), project_dir, printer )
+    except SystemExit as e:
+        if ( e.code == None or e.code == 0 ):
+            return ( 0, None )
+        if ( isinstance( e.code, int ) ):
+            return ( e.code, None )
+        return ( 1, str( e.code ) )
+    except KeyboardInterrupt:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        return ( 1, f"{type(e).__name__}: {e}" )
+    return ( 0, None )
+
+def _load_toolchain( project_dir, variant ):
+    # Executes the project's mytoolchain.py (always a fresh module, i.e. module level code sees the current build's state)
+    fname = os.path.join( project_dir, TOOLCHAIN_MODULE )
+    if ( not os.path.isfile( fname ) ):
+        sys.exit( f"ERROR: Missing toolchain script: {fname}" )
+    spec   = importlib.util.spec_from_file_location( 'mytoolchain', fname )
+    module = importlib.util.module_from_spec( spec )
+    sys.path.insert( 0, project_dir )
+    try:
+        spec.loader.exec_module( module )
+    finally:
+        sys.path.remove( project_dir )
+    toolchain = module.create()
+
+    # Reject an unknown variant BEFORE the build creates its variant directory (i.e. no '_<variant>' debris in the project directory)
+    if ( variant != None and variant not in toolchain.get_variants() ):
+        sys.exit( f"ERROR: Invalid variant ({variant}) selected" )
+    return toolchain
+
+#-----------------------------------------------------------------------------
+def _save_state():
+    globals_ = { k: v for k, v in vars( my_globals ).items() if k.startswith( '_NQBP_' ) }
+    return ( globals_, os.getcwd(), dict( os.environ ), list( utils._dirstack ), utils.verbose_mode )
+
+def _restore_state( state ):
+    globals_, cwd, environ, dirstack, verbose = state
+    for k, v in globals_.items():
+        setattr( my_globals, k, v )
+    os.chdir( cwd )
+    os.environ.clear()
+    os.environ.update( environ )
+    utils._dirstack[:] = dirstack
+    utils.verbose_mode = verbose
+
+class _capture_output:
+    # Redirects the stdout/stderr file descriptors (i.e. including the output of child processes) to a temporary file
+    def __init__( self, enabled ):
+        self.enabled = enabled
+        self.text    = None
+
+    def __enter__( self ):
+        if ( self.enabled ):
+            sys.stdout.flush()
+            sys.stderr.flush()
+            self._file  = tempfile.TemporaryFile()
+            self._saved = ( os.dup( 1 ), os.dup( 2 ) )
+            os.dup2( self._file.fileno(), 1 )
+            os.dup2( self._file.fileno(), 2 )
+        return self
+
+    def __exit__( self, exc_type, exc_value, tb ):
+        if ( self.enabled ):
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2( self._saved[0], 1 )
+            os.dup2( self._saved[1], 2 )
+            os.close( self._saved[0] )
+            os.close( self._saved[1] )
+            self._file.seek( 0 )
+            self.text = self._file.read().decode( errors='replace' )
+            self._file.close()
+        return False
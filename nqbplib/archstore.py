@@ -0,0 +1,276 @@
+#!/usr/bin/python3
+"""Workspace level store of prebuilt archives (for xpkgs directories)
+
+The external packages (i.e. the xpkgs directories listed in libdirs.b) are
+typically compiled with the same options by many projects in the workspace.
+The store saves the archive (and object files) of an xpkgs directory after a
+successful build, and subsequent builds - of any project - that would compile
+the directory identically link the stored archive instead of generating the
+directory's compile edges.
+
+A stored archive is identified by a key that is the hash of:
+
+    - the toolchain identity (the resolved compiler path/size/timestamp, the
+      archiver, etc.)
+    - the effective compile options (excluding the compiler launcher)
+    - the directory's source files (names and content)
+
+When an archive is stored, the header files that the object files depend on
+(from the ninja deps log) are recorded along with a hash of their contents.
+The archive is only reused when all of the recorded header files are
+unchanged.  Archives that depend on a file in the project directory (e.g. a
+project specific config header) are only reused by that project.
+
+Note: A header file that is added to an include path that precedes the
+originally found header (i.e. a shadowing header) is not detected.
+
+The store is enabled by setting the NQBP_ARCHIVE_STORE environment variable to
+'1' (the store is located in the NQBP_CACHE_ROOT directory) or to the path of
+the store directory.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+#
+from . import utils
+from . import deps
+from .my_globals import NQBP_CACHE_ROOT
+from .my_globals import NQBP_PRJ_DIR
+
+# Environment variable that enables the store
+STORE_ENV = 'NQBP_ARCHIVE_STORE'
+
+# File that describes a stored archive
+MANIFEST = 'manifest.json'
+
+# File (in the build variant's object directory) that records a restored archive
+MARKER = '.nqbp_archive'
+
+# Extensions of files that are stored along with an object file (split DWARF, coverage notes)
+COMPANION_EXTS = ( '.dwo', '.gcno' )
+
+# Change when the key/manifest format changes
+_STORE_VERSION = 1
+
+# Memo of file content hashes (path -> (mtime_ns, size, hash))
+_hashes = {}
+
+
+#-----------------------------------------------------------------------------
+def get_root():
+    """ Returns the store directory, or None when the store is not enabled """
+    value = os.environ.get( STORE_ENV, '0' ).strip()
+    if ( value in ('', '0') ):
+        return None
+    if ( value == '1' ):
+        return os.path.join( NQBP_CACHE_ROOT(), 'archives' )
+    return os.path.abspath( value )
+
+def create( printer, toolchain, arguments ):
+    """ Returns a Store instance for the current toolchain/build variant, or
+        None when the store is not enabled (or the compiler cannot be
+        identified).  Must be called after the toolchain's pre_build()
+    """
+    root = get_root()
+    if ( root == None ):
+        return None
+    identity = toolchain_identity( toolchain, arguments )
+    if ( identity == None ):
+        printer.debug( '# archive store: disabled, unable to identify the compiler' )
+        return None
+    return Store( printer, toolchain, root, identity )
+
+def toolchain_identity( toolchain, arguments ):
+    """ Returns the hash of the toolchain identity and effective compile
+        options (or None if the compiler cannot be resolved).  The project
+        directory is replaced by a placeholder so that projects with identical
+        options share the stored archives.
+    """
+    ccid = toolchain._validate_cc_cache_key()
+    if ( ccid == None ):
+        return None
+    opts   = toolchain._all_opts
+    values = [ _STORE_VERSION,
+               type(toolchain).__module__, type(toolchain).__name__, ccid,
+               toolchain._asm, toolchain._ar if toolchain._lto == None else toolchain._lto_archiver(), toolchain._ar_options,
+               toolchain._obj_ext, toolchain._ar_library_name, toolchain._cflag_symdef, toolchain._asmflag_symdef,
+               toolchain._build_time_utc if arguments['--bldtime'] else 0,
+               opts.cflags, opts.inc, opts.c_only_flags, opts.cppflags, opts.asmflags, opts.asminc ]
+    text = '\n'.join( str(v) for v in values ).replace( NQBP_PRJ_DIR(), '$PRJ' )
+    return utils.hash_string( text )
+
+def file_hash( fname ):
+    """ Returns the hash of the file's content (or None if the file does not
+        exist).  The results are memoized by the file's timestamp/size.
+    """
+    try:
+        st = os.stat( fname )
+    except OSError:
+        return None
+    memo = _hashes.get( fname )
+    if ( memo != None and memo[0] == st.st_mtime_ns and memo[1] == st.st_size ):
+        return memo[2]
+    h = hashlib.sha1()
+    with open( fname, 'rb' ) as fd:
+        for chunk in iter( lambda: fd.read( 1 << 20 ), b'' ):
+            h.update( chunk )
+    _hashes[fname] = ( st.st_mtime_ns, st.st_size, h.hexdigest() )
+    return _hashes[fname][2]
+
+def _read_json( fname ):
+    try:
+        with open( fname, 'r' ) as fd:
+            return json.load( fd )
+    except (OSError, ValueError):
+        return None
+
+def _read_text( fname ):
+    try:
+        with open( fname, 'r' ) as fd:
+            return fd.read()
+    except OSError:
+        return None
+
+#-----------------------------------------------------------------------------
+class Store:
+    """ Archive store for a single build (i.e. toolchain and build variant).
+        The current working directory must be the build variant directory.
+    """
+    def __init__( self, printer, toolchain, root, identity ):
+        self.root      = root
+        self.identity  = identity
+        self.hits      = 0
+        self.misses    = 0
+        self._printer  = printer
+        self._obj_ext  = '.' + toolchain._obj_ext
+        self._libname  = toolchain._ar_library_name
+        self._os_sep   = toolchain._os_sep
+        self._prjdir   = NQBP_PRJ_DIR()
+        self._pending  = []
+
+    def key( self, srcpath, files ):
+        """ Returns the key for the directory 'srcpath' that contains the
+            source files 'files' (relative to srcpath)
+        """
+        text = [ self.identity, os.path.abspath( srcpath ) ]
+        for f in sorted( files ):
+            text.append( f"{f}|{file_hash( os.path.join( srcpath, f ) )}" )
+        return utils.hash_string( '\n'.join( text ) )
+
+    def restore( self, key, objdir ):
+        """ Copies the stored archive/object files for 'key' to the object
+            directory 'objdir' (relative to the build variant directory).
+            Returns (library, objfiles) - in the same format as the toolchain's
+            ar() and cc() methods - or None when there is no (valid) stored
+            archive.
+        """
+        entry    = self._entry_dir( key )
+        manifest = _read_json( os.path.join( entry, MANIFEST ) )
+        if ( manifest == None or manifest.get( 'version' ) != _STORE_VERSION or not self._is_valid( manifest ) ):
+            self.misses += 1
+            self._discard_restored( objdir )
+            return None
+
+        self.hits += 1
+        marker   = os.path.join( objdir, MARKER )
+        objfiles = [ utils.standardize_dir_sep( os.path.join( objdir, o ), self._os_sep ) for o in manifest['objects'] ]
+        library  = os.path.join( objdir, self._libname )
+        current  = _read_text( marker )
+        if ( current != key or not all( os.path.isfile( f ) for f in objfiles + [library] ) ):
+            os.makedirs( objdir, exist_ok=True )
+            for f in manifest['files']:
+                shutil.copyfile( os.path.join( entry, f ), os.path.join( objdir, f ) )  # Note: new timestamps, i.e. the link is re-run
+            with open( marker, 'w' ) as fd:
+                fd.write( key )
+        self._printer.debug( f'# archive store: using {entry} for {objdir}' )
+        return ( library, objfiles )
+
+    def add( self, key, objdir, library, objfiles ):
+        """ Registers the archive of a compiled directory. The archive is
+            stored by publish() after a successful build
+        """
+        self._pending.append( (key, objdir, library, objfiles) )
+
+    def publish( self ):
+        """ Stores the archives of the compiled directories. Returns the number
+            of archives stored
+        """
+        if ( len(self._pending) == 0 ):
+            return 0
+        depslog = deps.read_ninja_deps( deps.NINJA_DEPS_LOG )
+        count   = 0
+        for key, objdir, library, objfiles in self._pending:
+            depfiles = {}
+            for o in objfiles:
+                if ( o not in depslog ):
+                    break
+                for d in depslog[o]:
+                    depfiles[os.path.abspath( d )] = None
+            else:
+                if ( self._store( key, library, objfiles, depfiles ) ):
+                    count += 1
+        self._pending = []
+        return count
+
+    #-------------------------------------------------------------------------
+    def _entry_dir( self, key ):
+        return os.path.join( self.root, key[:2], key )
+
+    def _is_valid( self, manifest ):
+        if ( manifest.get( 'project' ) not in (None, self._prjdir) ):
+            return False
+        for fname, h in manifest['deps'].items():
+            if ( file_hash( fname ) != h ):
+                return False
+        return True
+
+    def _discard_restored( self, objdir ):
+        # Delete restored files so that ninja compiles (rather than trusts) them
+        marker = os.path.join( objdir, MARKER )
+        if ( not os.path.isfile( marker ) ):
+            return
+        for f in os.listdir( objdir ):
+            if ( f.endswith( self._obj_ext ) or f.endswith( COMPANION_EXTS ) or f in (self._libname, MARKER) ):
+                utils.delete_file( os.path.join( objdir, f ) )
+
+    def _store( self, key, library, objfiles, depfiles ):
+        project = None
+        for d in depfiles:
+            h = file_hash( d )
+            if ( h == None ):
+                return False
+            depfiles[d] = h
+            if ( d.startswith( self._prjdir + os.sep ) ):
+                project = self._prjdir
+
+        files = [ os.path.basename( library ) ]
+        for o in objfiles:
+            files.append( os.path.basename( o ) )
+            for ext in COMPANION_EXTS:
+                if ( os.path.isfile( os.path.splitext( o )[0] + ext ) ):
+                    files.append( os.path.basename( os.path.splitext( o )[0] + ext ) )
+
+        # Populate a temporary directory and then rename it, i.e. concurrent builds never see a partial entry
+        entry = self._entry_dir( key )
+        os.makedirs( os.path.dirname( entry ), exist_ok=True )
+        tmpdir = tempfile.mkdtemp( dir=os.path.dirname( entry ), prefix='.tmp' )
+        try:
+            objdir = os.path.dirname( library )
+            for f in files:
+                shutil.copyfile( os.path.join( objdir, f ), os.path.join( tmpdir, f ) )
+            manifest = { 'version': _STORE_VERSION, 'project': project, 'objects': [ os.path.basename( o ) for o in objfiles ], 'files': files, 'deps': depfiles }
+            with open( os.path.join( tmpdir, MANIFEST ), 'w' ) as fd:
+                json.dump( manifest, fd, indent=1 )
+            if ( os.path.isdir( entry ) ):
+                shutil.rmtree( entry, ignore_errors=True )
+            os.rename( tmpdir, entry )
+        except OSError as e:
+            self._printer.debug( f'# archive store: failed to store {library}: {e}' )
+            shutil.rmtree( tmpdir, ignore_errors=True )
+            return False
+        self._printer.debug( f'# archive store: stored {library} as {entry}' )
+        return True
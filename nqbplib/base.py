@@ -34,14 +34,11 @@ _BUILD_VARIANT_DIR_ - This symbol be used in the mytoolchain.py file to specify
 """
 
 #
-from itertools import filterfalse
-import logging
 import time
 import os
 import shutil
 import sys
 import subprocess
-import json
 
 #
 from . import utils
@@ -56,53 +53,171 @@ from .my_globals import NQBP_NAME_LIBDIRS
 from .my_globals import NQBP_WRKPKGS_DIRNAME
 
 
-# Structure for holding build-variant specific options
+# Linkers that can be selected via ToolChain.set_linker() (in order of
+# preference for 'auto') and their threading options
+FAST_LINKERS = { 'mold': lambda n: f'-Wl,--thread-count={n}' if n else '',
+                 'lld':  lambda n: f'-Wl,--threads={n}' if n else '',
+                 'gold': lambda n: f'-Wl,--threads -Wl,--thread-count={n}' if n else '-Wl,--threads' }
+
+# Archive update modes that can be selected via ToolChain.set_ar_mode()
+AR_MODES = ( 'thin', 'restat' )
+
+
+# Options that take their argument as a separate token, e.g. '-isystem dir'
+OPTIONS_WITH_ARG = ( '-I', '-D', '-U', '-isystem', '-iquote', '-idirafter', '-include', '-imacros',
+                     '-x', '-Xlinker', '-Xassembler', '-Xpreprocessor', '-Xclang', '-mllvm', '--param',
+                     '-target', '-arch', '-MF', '-MT', '-MQ', '-o', '-T', '-L', '-l',
+                     '/I', '/D', '/U', '/FI' )
+
+# Options where only the first occurrence matters, i.e. the include search order
+# (all other duplicated options are 'last one wins')
+FIRST_WINS_OPTIONS = ( '-I', '-isystem', '-iquote', '-idirafter', '-include', '-imacros', '/I', '/FI' )
+
+
+def tokenize_options( text ):
+    """ Splits a string of compiler/linker options into a list of tokens.
+        Quoted strings and ninja escaped spaces ('$ ') are kept as a single
+        token.
+    """
+    tokens = []
+    token  = ''
+    quote  = None
+    for c in text:
+        if ( quote ):
+            quote = None if c == quote else quote
+        elif ( c in '"\'' ):
+            quote = c
+        elif ( c.isspace() and not _ninja_escaped( token ) ):
+            if ( token ):
+                tokens.append( token )
+            token = ''
+            continue
+        token += c
+    if ( token ):
+        tokens.append( token )
+    return tokens
+
+def group_options( tokens ):
+    """ Groups a list of tokens into options, i.e. an option and its separate
+        argument (e.g. '-x c++') are a single group.  Returns a list of tuples
+    """
+    groups = []
+    idx    = 0
+    while ( idx < len(tokens) ):
+        if ( tokens[idx] in OPTIONS_WITH_ARG and idx + 1 < len(tokens) ):
+            groups.append( (tokens[idx], tokens[idx+1]) )
+            idx += 2
+        else:
+            groups.append( (tokens[idx],) )
+            idx += 1
+    return groups
+
+def dedupe_options( tokens ):
+    """ Removes duplicate options (without changing the meaning of the 
+        options).  The first occurrence of an include path/forced include
+        is kept (i.e. the search order is preserved), for all other options
+        the last occurrence is kept.  Tokens that are not options (or options
+        followed by an unknown argument) are never removed.
+    """
+    groups = group_options( tokens )
+    keep   = [ True ] * len(groups)
+    seen   = set()
+    for idx, g in enumerate( groups ):
+        if ( _first_wins( g ) ):
+            keep[idx] = g not in seen
+            seen.add( g )
+    seen = set()
+    for idx in range( len(groups)-1, -1, -1 ):
+        g = groups[idx]
+        if ( not _first_wins( g ) and _is_option_group( groups, idx ) ):
+            keep[idx] = g not in seen
+            seen.add( g )
+    return [ t for idx, g in enumerate( groups ) if keep[idx] for t in g ]
+
+def _first_wins( group ):
+    return group[0] in FIRST_WINS_OPTIONS or group[0].startswith( ('-I', '/I') )
+
+def _is_option_group( groups, idx ):
+    # A single token option that is followed by a non-option could have a (unknown) separate argument
+    g = groups[idx]
+    if ( not g[0].startswith( ('-', '/') ) ):
+        return False
+    if ( len(g) == 1 and idx + 1 < len(groups) and not groups[idx+1][0].startswith( ('-', '/') ) ):
+        return False
+    return True
+
+def _ninja_escaped( token ):
+    count = len(token) - len(token.rstrip( '$' ))
+    return count % 2 == 1
+
+
+# Text of a BuildValues field.  Concatenating options keeps them separate, i.e.
+# 'bv.cflags + "-Wall"' inserts the space between the last option and '-Wall'.
+class OptionsText( str ):
+    def __add__(self, other):
+        if ( self and isinstance( other, str ) and other and not other[0].isspace() ):
+            other = ' ' + other
+        return str.__add__( self, other )
+
+
+# Structure for holding build-variant specific options.  Each field is stored
+# as an ordered list of tokens (see tokenize_options()) but reads/writes as a
+# string, i.e. 'bv.cflags += " -DFOO"' works as expected.  The compiler option
+# fields are de-duplicated (see dedupe_options()), the link fields are not (the
+# order/repetition of libraries and objects is significant).
 class BuildValues:
+    FIELDS        = ( 'inc', 'asminc', 'cflags', 'c_only_flags', 'cppflags', 'asmflags', 'linkflags', 'linklibs', 'firstobjs', 'lastobjs' )
+    DEDUPE_FIELDS = ( 'inc', 'asminc', 'cflags', 'c_only_flags', 'cppflags', 'asmflags' )
+
     def __init__(self):
-        self.inc            = ''
-        self.asminc         = ''
-        self.cflags         = ''
-        self.c_only_flags   = ''
-        self.cppflags       = ''
-        self.asmflags       = ''
-        self.linkflags      = ''
-        self.linklibs       = ''
-        self.firstobjs      = ''
-        self.lastobjs       = ''
+        self._tokens        = dict( (f, []) for f in BuildValues.FIELDS )
+        self._text          = {}
         self.exclude_clangd = []
         self.include_clangd = []
 
+    inc          = property( lambda self: self._get( 'inc' ),          lambda self, value: self._set( 'inc', value ) )
+    asminc       = property( lambda self: self._get( 'asminc' ),       lambda self, value: self._set( 'asminc', value ) )
+    cflags       = property( lambda self: self._get( 'cflags' ),       lambda self, value: self._set( 'cflags', value ) )
+    c_only_flags = property( lambda self: self._get( 'c_only_flags' ), lambda self, value: self._set( 'c_only_flags', value ) )
+    cppflags     = property( lambda self: self._get( 'cppflags' ),     lambda self, value: self._set( 'cppflags', value ) )
+    asmflags     = property( lambda self: self._get( 'asmflags' ),     lambda self, value: self._set( 'asmflags', value ) )
+    linkflags    = property( lambda self: self._get( 'linkflags' ),    lambda self, value: self._set( 'linkflags', value ) )
+    linklibs     = property( lambda self: self._get( 'linklibs' ),     lambda self, value: self._set( 'linklibs', value ) )
+    firstobjs    = property( lambda self: self._get( 'firstobjs' ),    lambda self, value: self._set( 'firstobjs', value ) )
+    lastobjs     = property( lambda self: self._get( 'lastobjs' ),     lambda self, value: self._set( 'lastobjs', value ) )
+
+    def get_tokens(self, field):
+        """ Returns (a copy of) the list of tokens for 'field' """
+        return list( self._tokens[field] )
+
+    def set_tokens(self, field, tokens):
+        self._tokens[field] = dedupe_options( tokens ) if field in BuildValues.DEDUPE_FIELDS else list( tokens )
+        self._text.pop( field, None )
+
     def append(self,src):
-        self.inc            += ' ' + src.inc
-        self.asminc         += ' ' + src.asminc
-        self.cflags         += ' ' + src.cflags
-        self.c_only_flags   += ' ' + src.c_only_flags
-        self.cppflags       += ' ' + src.cppflags
-        self.asmflags       += ' ' + src.asmflags
-        self.linkflags      += ' ' + src.linkflags
-        self.linklibs       += ' ' + src.linklibs
-        self.firstobjs      += ' ' + src.firstobjs
-        self.lastobjs       += ' ' + src.lastobjs
+        for f in BuildValues.FIELDS:
+            self.set_tokens( f, self._tokens[f] + src._tokens[f] )
         self.exclude_clangd.extend( src.exclude_clangd )
         self.include_clangd.extend( src.include_clangd )
   
         
     def copy(self):
         new                = BuildValues()
-        new.inc            = self.inc
-        new.asminc         = self.asminc
-        new.cflags         = self.cflags
-        new.c_only_flags   = self.c_only_flags
-        new.cppflags       = self.cppflags
-        new.asmflags       = self.asmflags
-        new.linkflags      = self.linkflags
-        new.linklibs       = self.linklibs
-        new.firstobjs      = self.firstobjs
-        new.lastobjs       = self.lastobjs
+        new._tokens        = dict( (f, list(t)) for f, t in self._tokens.items() )
         new.exclude_clangd = self.exclude_clangd.copy()
         new.include_clangd = self.include_clangd.copy()
        
         return new
+
+    def _get(self, field):
+        text = self._text.get( field )
+        if ( text == None ):
+            text = OptionsText( ' '.join( self._tokens[field] ) )
+            self._text[field] = text
+        return text
+
+    def _set(self, field, value):
+        self.set_tokens( field, tokenize_options( value ) )
             
 
 #==============================================================================
@@ -116,7 +231,8 @@ class ToolChain:
         NQBP_PRJ_DIR( prjdir )
         
         # Public members
-        self.libdirs = []
+        self.libdirs       = []
+        self.libdirs_files = []     # The libdirs.b files (including nested files) read by read_libdirs()
         
         # Private members
         self._bld_variants               = build_variants
@@ -149,6 +265,38 @@ class ToolChain:
         self._echo_asm = True
         
         self._validate_cc_options = '-v'
+
+        # Compiler time profiling (--time-trace): 'gcc' (-ftime-report), 'clang' (-ftime-trace), or None (not supported)
+        self._time_trace_style   = 'gcc'
+        self._time_report_to_file = False
+
+        # Link time optimization. Enabled per build variant by setting the 'lto'
+        # key of the variant's dictionary (in mytoolchain.py) to one of the
+        # _lto_modes keys.  Each mode is a pair of (compile flags, link flags).
+        # The link flag '-flto=auto' runs the LTRANS jobs in parallel (using
+        # the jobserver when available).
+        self._lto_modes      = { 'full': ('-flto', '-flto=auto') }
+        self._lto_ar         = None     # Archiver for LTO objects. None: derived from self._ar, e.g. arm-none-eabi-ar -> arm-none-eabi-gcc-ar
+        self._lto_link_pool  = 1        # Max number of concurrent LTO links
+        self._lto            = None
+
+        # Linker selection (-fuse-ld=). See set_linker()
+        self._linker         = None
+        self._linker_threads = None
+        self._linker_flags   = ''
+
+        # Compiler launcher (e.g. ccache, sccache, distcc, icecc) that prefixes the compile/assemble commands. See set_launcher()
+        self._launcher = None
+        self.set_launcher( os.environ.get('NQBP_CC_LAUNCHER') )
+
+        # Split DWARF debug info for debug (-g) builds. See set_split_dwarf()
+        self._split_dwarf_supported = False
+        self._split_dwarf           = False
+        self._split_dwarf_active    = False
+
+        # Archive update mode (None: the archive is deleted and re-created). See set_ar_mode()
+        self._ar_mode   = None
+        self.set_ar_mode( os.environ.get('NQBP_AR_MODE') )
         
         self._clean_list     = []
         #self._clean_pkg_dirs = []
@@ -217,6 +365,72 @@ class ToolChain:
         
     def set_ninja_writer(self, writer):
         self._ninja_writer = writer
+
+    def set_linker(self, linker, threads=None):
+        """ Selects the linker that the compiler driver uses (-fuse-ld=...),
+            i.e. one of FAST_LINKERS, 'auto' (the fastest installed linker, 
+            else the compiler's default linker), or None (the compiler's 
+            default linker).  'threads' is the number of linker threads (None
+            uses the linker's default, e.g. all cores for mold/lld).
+        """
+        if ( linker != None and linker != 'auto' and linker not in FAST_LINKERS ):
+            sys.exit( f"ERROR: Unsupported linker '{linker}' (supported: auto, {', '.join(FAST_LINKERS.keys())})" )
+        self._linker         = linker
+        self._linker_threads = int(threads) if threads else None
+
+    def set_launcher(self, launcher):
+        """ Sets the compiler launcher, i.e. a command (e.g. 'ccache') that 
+            prefixes the compile and assemble commands.  None, '' or 'none' 
+            disables the launcher.
+        """
+        if ( launcher != None and launcher.strip().lower() in ('', 'none') ):
+            launcher = None
+        self._launcher = launcher.strip() if launcher != None else None
+
+    def get_launcher(self):
+        return self._launcher
+
+    def set_split_dwarf(self, enabled):
+        """ Enables split DWARF for debug builds, i.e. the compiler writes the
+            bulk of the debug info to a .dwo file next to each object file
+            (-gsplit-dwarf) instead of the linker having to copy it into the
+            executable.  A .gdb_index is added to the executable when a fast
+            linker is selected (--gdb-index requires gold, lld, or mold), i.e.
+            with the default (bfd) linker there is no index and GDB takes
+            longer to load the debug info.  Split DWARF is not used by LTO
+            build variants.  Only supported by the host GCC toolchains.
+        """
+        if ( enabled and not self._split_dwarf_supported ):
+            sys.exit( f"ERROR: Split DWARF is not supported by the {self._ccname} toolchain" )
+        self._split_dwarf = bool(enabled)
+
+    def set_ar_mode(self, mode):
+        """ Selects how the directory archives are updated. None (or 'full')
+            deletes and re-creates the archive.  'thin' creates thin archives,
+            i.e. the archive only references the object files instead of
+            containing copies of them (GNU ar 'T').  'restat' creates the archive
+            (from ALL of the directory's object files, in deterministic 'D'
+            mode) in a temporary file and only replaces the archive file when
+            its content changed (ninja 'restat'), i.e. the link is skipped
+            when the re-compiled object files are identical.  Note: the
+            'restat' mode does NOT avoid re-writing the archive, it only 
+            avoids the downstream link.  Only supported by GNU style 
+            archivers (ar, gcc-ar, llvm-ar), the restat mode also requires 
+            a POSIX shell (i.e. the default 'ar' rule).
+        """
+        if ( mode != None and mode.strip().lower() in ('', 'none', 'full') ):
+            mode = None
+        if ( mode != None and mode.strip().lower() not in AR_MODES ):
+            sys.exit( f"ERROR: Unsupported archive mode '{mode}' (supported: full, {', '.join(AR_MODES)})" )
+        self._ar_mode = mode.strip().lower() if mode != None else None
+
+    def get_ar_mode(self):
+        """ Returns the archive mode in effect, i.e. None when the archiver
+            does not support the selected mode
+        """
+        if ( self._ar_out != '' or not self._ar_options.isalpha() ):
+            return None
+        return self._ar_mode
         
 
     #--------------------------------------------------------------------------
@@ -374,6 +588,32 @@ class ToolChain:
         self._all_opts.firstobjs = utils.standardize_dir_sep( self._all_opts.firstobjs, self._os_sep  )
         self._all_opts.lastobjs = utils.standardize_dir_sep( self._all_opts.lastobjs, self._os_sep  )
 
+        # Enable the compiler's time profiling (if requested)
+        self._time_report_to_file = False
+        if ( arguments['--time-trace'] ):
+            self._all_opts.cflags    += ' ' + self._time_trace_flag()
+            self._time_report_to_file = self._time_trace_style == 'gcc'
+
+        # Linker selection (if any)
+        if ( self._linker_flags ):
+            self._all_opts.linkflags += ' ' + self._linker_flags
+
+        # Link time optimization (if enabled for the variant)
+        self._lto = self._select_lto_mode( bld.get( 'lto' ) )
+        if ( self._lto != None ):
+            cflags, linkflags         = self._lto_modes[self._lto]
+            self._all_opts.cflags    += ' ' + cflags
+            self._all_opts.linkflags += ' ' + linkflags
+
+        # Split DWARF (debug builds only). Note: The compiler ignores -gsplit-dwarf with LTO (no .dwo files), i.e. it is disabled explicitly
+        self._split_dwarf_active = self._split_dwarf and arguments['-g'] and self._lto == None
+        if ( self._split_dwarf and arguments['-g'] and self._lto != None ):
+            self._printer.debug( '# Split DWARF is disabled (not supported with LTO)' )
+        if ( self._split_dwarf_active ):
+            self._all_opts.cflags += ' -gsplit-dwarf'
+            if ( self._linker_flags ):
+                self._all_opts.linkflags += ' -Wl,--gdb-index'
+
         if ( arguments['--qry-opts'] ):
             self._printer.enable_debug()
             self._dump_options(  self._all_opts, True )
@@ -392,14 +632,24 @@ class ToolChain:
         self.libdirs  = []
         self.libnames = []
         if ( not arguments['--clean-all'] ):        # Skip if doing a --clean-all
-            inf = open( os.path.join( "..", NQBP_NAME_LIBDIRS()), 'r' )
-            utils.create_working_libdirs( self._printer, inf, arguments, self.libdirs, self.libnames, 'local', bld_var )  
-            inf.close()
+            self.libdirs, self.libnames = self.read_libdirs( arguments, bld_var )
 
             # Start the Ninja file
             self._start_ninja_file( bld_var, arguments );
 
 
+    #--------------------------------------------------------------------------
+    def read_libdirs( self, arguments, bld_var ):
+        """ Returns (libdirs, libnames) for the project's libdirs.b file """
+        libdirs  = []
+        libnames = []
+        fname    = os.path.join( "..", NQBP_NAME_LIBDIRS())
+        self.libdirs_files = [ os.path.abspath( fname ) ]
+        inf = open( fname, 'r' )
+        utils.create_working_libdirs( self._printer, inf, arguments, libdirs, libnames, 'local', bld_var, files=self.libdirs_files )  
+        inf.close()
+        return libdirs, libnames
+
     #--------------------------------------------------------------------------
     def ar( self, arguments, objfiles, relative_objpath ):
 
@@ -416,23 +666,97 @@ class ToolChain:
             outputs = outputname,
             rule = 'ar',
             inputs = objs,
-            variables = {"aropts":self._ar_options, "arout":self._ar_out} )
+            variables = {"aropts":self._ar_options + {'thin':'T', 'restat':'D'}.get( self.get_ar_mode(), '' ), "arout":self._ar_out} )
         
         self._ninja_writer.newline()
         return outputname
 
     #--------------------------------------------------------------------------
     def validate_cc( self ):
+        if ( self._launcher != None and shutil.which( self._launcher.split()[0] ) == None ):
+            self._printer.output( f"ERROR: Cannot find the compiler launcher: {self._launcher}" )
+            sys.exit(1)
+
         cc = self._cc + ' ' + self._validate_cc_options
         self._printer.debug( '# Validating the Compiler using:: {}'.format( cc ) )
+
+        # Skip spawning the compiler if it has already been validated (and has not changed since)
+        key    = self._validate_cc_cache_key()
+        cache  = utils.read_cache_file( 'validate_cc.json', {} ) if key != None else {}
+        cached = cache.get( key )
+        if ( cached != None ):
+            self._printer.debug( '# Compiler previously validated: {}'.format( key ) )
+            return ( cached[0].encode(), cached[1].encode() )
+
         p  = subprocess.Popen( cc, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE )
         r  = p.communicate()
         if ( p.returncode ):
             self._printer.output( "ERROR: Cannot validate toolchain ({}) - check your path/environment variable(s)".format( self._ccname ) )
             sys.exit(1)
       
+        if ( key != None ):
+            cache[key] = [ r[0].decode( errors='replace' ), r[1].decode( errors='replace' ) ]
+            utils.write_cache_file( 'validate_cc.json', cache )
         return r
 
+    def validate_linker( self ):
+        """ Validates (and for 'auto' selects) the linker that was chosen via
+            set_linker().  The result is cached the same way as validate_cc().
+        """
+        self._linker_flags = ''
+        if ( self._linker == None ):
+            return
+
+        for name in ( FAST_LINKERS.keys() if self._linker == 'auto' else [self._linker] ):
+            if ( self._linker == 'auto' and shutil.which( 'ld.' + name ) == None and shutil.which( name ) == None ):
+                continue
+            if ( self._linker_works( name ) ):
+                self._linker_flags = f'-fuse-ld={name} {FAST_LINKERS[name]( self._linker_threads )}'.strip()
+                self._printer.debug( f'# Linker: {self._linker_flags}' )
+                return
+            if ( self._linker != 'auto' ):
+                self._printer.output( f"ERROR: The '{name}' linker is not available for the {self._ccname} toolchain (-fuse-ld={name})" )
+                sys.exit(1)
+        self._printer.debug( '# Linker: no faster linker found, using the default linker' )
+
+    def _linker_works( self, name ):
+        cmd   = f'{self._ld} -fuse-ld={name} -Wl,--version'
+        key   = self._validate_cc_cache_key()
+        path  = shutil.which( 'ld.' + name ) or shutil.which( name )
+        if ( key != None and path != None ):
+            st  = os.stat( path )
+            key = f"{key}|{cmd}|{os.path.realpath(path)}|{st.st_mtime_ns}"
+        else:
+            key = None
+        cache = utils.read_cache_file( 'validate_cc.json', {} ) if key != None else {}
+        if ( key in cache ):
+            return True
+
+        self._printer.debug( f'# Validating the linker using: {cmd}' )
+        p = subprocess.Popen( cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE )
+        r = p.communicate()
+        if ( p.returncode ):
+            return False
+        if ( key != None ):
+            cache[key] = [ r[0].decode( errors='replace' ), r[1].decode( errors='replace' ) ]
+            utils.write_cache_file( 'validate_cc.json', cache )
+        return True
+
+    def _validate_cc_cache_key( self ):
+        """ Returns the key used to cache the validate_cc() results, i.e. the
+            resolved compiler path, its modification time/size, and the
+            validation options.  Returns None if the compiler cannot be
+            resolved (which disables caching).
+        """
+        ccpath = shutil.which( self._cc )
+        if ( ccpath == None ):
+            return None
+        try:
+            st = os.stat( ccpath )
+        except OSError:
+            return None
+        return f"{os.path.realpath(ccpath)}|{st.st_mtime_ns}|{st.st_size}|{self._validate_cc_options}"
+
     #--------------------------------------------------------------------------
     def cc( self, arguments, fullname, relative_objpath ):
     
@@ -468,12 +792,13 @@ class ToolChain:
         # Create output file name
         outputname = utils.standardize_dir_sep( os.path.join(relative_objpath, basename ) + '.' +  self._obj_ext, self._os_sep )
 
-        # Generate ninja build statement
+        # Generate ninja build statement (note: with split DWARF the compiler also generates a .dwo file)
         if ( is_cxx ):
             self._ninja_writer.build( 
                 outputs = outputname,
                 rule = 'compile',
                 inputs = full_fname,
+                implicit_outputs = os.path.splitext( outputname )[0] + '.dwo' if self._split_dwarf_active else None,
                 variables = {"ccopts":cc} )
         else:
             self._ninja_writer.build( 
@@ -534,7 +859,8 @@ class ToolChain:
             rule       = 'link',
             inputs     = final_link_inputs,
             implicit   = impl_list,
-            variables  = {"ldopts":ldopts, "ldout":self._link_output} )
+            variables  = {"ldopts":ldopts, "ldout":self._link_output},
+            pool       = 'lto_link_pool' if self._lto != None else None )
         self._ninja_writer.newline()
         
         return None
@@ -549,13 +875,56 @@ class ToolChain:
     # Private Methods
     #==========================================================================
     
+    #--------------------------------------------------------------------------
+    def _time_trace_flag( self ):
+        if ( self._time_trace_style == 'clang' ):
+            return '-ftime-trace'
+        if ( self._time_trace_style == 'gcc' and os.name != 'nt' ):   # The GCC report is captured via a shell redirect
+            return '-ftime-report'
+        self._printer.output( f"ERROR: The --time-trace option is not supported by the {self._ccname} toolchain (on this host)" )
+        sys.exit(1)
+
+    def _launch( self, command ):
+        # Note: The command is unchanged when there is no launcher (i.e. does not trigger a rebuild)
+        return command if self._launcher == None else '$launcher ' + command
+
+    def _time_report_command( self, command ):
+        """ GCC writes its -ftime-report to stderr, i.e. when enabled the 
+            report is captured in the file: <objfile>.ftr (the compiler's 
+            diagnostics are still passed through to stderr)
+        """
+        if ( not self._time_report_to_file ):
+            return command
+        return f"{command} 2> $out.ftr; rc=$$?; sed -n '/^Time variable/q;/^$$/!p' $out.ftr 1>&2; exit $$rc"
+
+    #--------------------------------------------------------------------------
+    def _select_lto_mode( self, mode ):
+        if ( not mode ):
+            return None
+        if ( mode == True ):
+            mode = 'full'
+        if ( mode not in self._lto_modes ):
+            supported = ', '.join( self._lto_modes.keys() ) if len(self._lto_modes) > 0 else 'none'
+            self._printer.output( f"ERROR: LTO mode '{mode}' is not supported by the {self._ccname} toolchain (supported modes: {supported})" )
+            sys.exit(1)
+        return mode
+
+    def _lto_archiver( self ):
+        if ( self._lto_ar != None ):
+            return self._lto_ar
+        path, name = os.path.split( self._ar )
+        root, ext  = os.path.splitext( name )
+        if ( root.endswith( 'ar' ) and not root.endswith( 'gcc-ar' ) ):
+            root = root[:-2] + 'gcc-ar'
+        return os.path.join( path, root + ext )
+
     #--------------------------------------------------------------------------
     def _translate_cc_for_clang(self, l):
         return l # Default is GCC compiler -->nothing needed
     
     def _create_clangd_file( self ):
         inclist = self._tokenize_includes( self._all_opts.inc )
-        optlist = self._tokenize_copts( self._all_opts.cflags + ' ' + self._all_opts.cppflags + self._all_opts.c_only_flags)
+        optlist = self._tokenize_copts( ' '.join( (self._all_opts.cflags, self._all_opts.cppflags, self._all_opts.c_only_flags) ) )
         ofile = os.path.join( NQBP_PKG_ROOT(), "compile_flags.txt" )
         try:
             with open( ofile, "w") as fd:
@@ -570,36 +939,23 @@ class ToolChain:
         self._printer.output(f"Succesfuly generated {ofile}")  
           
     def _tokenize_includes( self, inc ):
-        # Convert any -isystem to just -I
-        inc = inc.replace("-isystem ", "-I")
-
-        inclist = inc.strip().split(' ')
-        inclist = list(set(inclist))  # remove duplicates
-        exclude = ['', '-I.', '/I.', '-isystem', '-I', '/I']
-        for e in exclude:
-            try:
-                inclist.remove(e)
-            except:
-                pass
-
-        # Add leading '-I' to include paths that had spaces after the -I or used 'different' -I syntax
-        for i in range(len(inclist)):
-            if not inclist[i].startswith('-I'):
-                inclist[i] = '-I' + inclist[i]
+        # Convert the include options to '-I<path>' (preserving the search order)
+        inclist = []
+        for g in group_options( dedupe_options( tokenize_options( inc ) ) ):
+            if ( len(g) == 2 and g[0] in ( '-I', '/I', '-isystem', '-iquote', '-idirafter' ) ):
+                path = g[1]
+            elif ( g[0].startswith( ('-I', '/I') ) ):
+                path = g[0][2:]
+            else:
+                continue
+            if ( path not in ( '', '.' ) and '-I' + path not in inclist ):
+                inclist.append( '-I' + path )
 
         return inclist
 
     def _tokenize_copts( self, opts ):
-        # brute force tokenize the compiler args
-        optslist    = opts.strip().split(' ' + self._compiler_option_delimiter)
-        optslist[0] = optslist[0][1:] # Remove the cc delimter from  first item in the list to match the remaining options
-        optslist    = list(set(optslist)) # remove duplicates
-        
-        # Remove whitespace and restores the argument delimiter
-        l = []
-        for i in optslist[1:]:
-            e = self._compiler_option_delimiter + i.strip()
-            l.append(e)               
+        # One entry per option (i.e. an option and its separate argument are a single entry)
+        l = [ ' '.join( g ) for g in group_options( dedupe_options( tokenize_options( opts ) ) ) ]
 
         # Hook to 'convert' non-gcc-like args to something clang understand
         l = self._translate_cc_for_clang(l)
@@ -610,16 +966,11 @@ class ToolChain:
         # Remove toolchain specific options
         xlist = ['-']
         xlist.extend(self._all_opts.exclude_clangd)
-        for e in xlist:
-            try:
-                l.remove(e)
-            except:
-                pass
-            
-        return l
+        return [ o for o in l if o not in xlist ]
     
     #--------------------------------------------------------------------------
     def _create_vs_gdbentry(self):
+        import json
         vsdir   = os.path.join( NQBP_PKG_ROOT(), ".vscode" )
         launchf = os.path.join( vsdir, "launch.json" )
         
@@ -661,6 +1012,7 @@ class ToolChain:
             sys.exit(1)
         
     def _load_json_file( self, fname ):
+        import json
         with open( fname, "r") as fd:
             lines = fd.readlines()
         
@@ -737,14 +1089,19 @@ class ToolChain:
         self._ninja_writer.variable( 'cc', f"{self._cc}" )     
         self._ninja_writer.variable( 'ld', f"{self._ld }" )      
         self._ninja_writer.variable( 'asm', f"{self._asm}" )    
-        self._ninja_writer.variable( 'ar',  f"{self._ar}" )      
+        self._ninja_writer.variable( 'ar',  f"{self._ar if self._lto == None else self._lto_archiver()}" )      
         self._ninja_writer.variable( 'objcpy', f"{self._objcpy}" )
         self._ninja_writer.variable( 'objdmp', f"{self._objdmp}" )
         self._ninja_writer.variable( 'shell', f"{self._shell}" )
         self._ninja_writer.variable( 'rm', f"{self._rm}" )
         self._ninja_writer.variable( 'buildtime', str(self._build_time_utc) if arguments['--bldtime']  else "0" )
         self._ninja_writer.variable( 'objdmp_redirect', '>' )
+        if ( self._launcher != None ):
+            self._ninja_writer.variable( 'launcher', self._launcher )
         self._ninja_writer.newline()
+        if ( self._lto != None ):
+            self._ninja_writer.pool( 'lto_link_pool', self._lto_link_pool )
+            self._ninja_writer.newline()
         self._build_compile_rule()
         self._ninja_writer.newline()
         self._build_assemble_rule()
@@ -769,7 +1126,7 @@ class ToolChain:
     def _build_compile_rule( self ):
         self._ninja_writer.rule( 
             name = 'compile', 
-            command = f"$cc -MMD -MT $out -MF $out.d {self._cflag_symdef}BUILD_TIME_UTC=$buildtime $ccopts $in -o $out", 
+            command = self._time_report_command( self._launch( f"$cc -MMD -MT $out -MF $out.d {self._cflag_symdef}BUILD_TIME_UTC=$buildtime $ccopts $in -o $out" ) ), 
             description = "Compiling: $in", 
             depfile = "$out.d",
             deps = 'gcc' )
@@ -777,7 +1134,7 @@ class ToolChain:
     def _build_withrspfile_compile_rule( self ):
         self._ninja_writer.rule( 
             name = 'compile', 
-            command = f"$cc -MMD -MT $out -MF $out.d {self._cflag_symdef}BUILD_TIME_UTC=$buildtime @$out.rsp $in -o $out", 
+            command = self._time_report_command( self._launch( f"$cc -MMD -MT $out -MF $out.d {self._cflag_symdef}BUILD_TIME_UTC=$buildtime @$out.rsp $in -o $out" ) ), 
             rspfile = '$out.rsp',
             rspfile_content = '$ccopts',
             description = "Compiling: $in", 
@@ -787,7 +1144,7 @@ class ToolChain:
     def _build_assemble_rule( self ):
         self._ninja_writer.rule( 
             name = 'assemble', 
-            command = f"$asm -MMD -MT $out -MF $out.d {self._asmflag_symdef}BUILD_TIME_UTC=$buildtime $asmopts $in -o $out", 
+            command = self._launch( f"$asm -MMD -MT $out -MF $out.d {self._asmflag_symdef}BUILD_TIME_UTC=$buildtime $asmopts $in -o $out" ), 
             description = "Assembling: $in", 
             depfile = "$out.d",
             deps = 'gcc' )
@@ -795,7 +1152,7 @@ class ToolChain:
     def _build_withrspfile_assemble_rule( self ):
         self._ninja_writer.rule( 
             name = 'assemble', 
-            command = f"$asm -MMD -MT $out -MF $out.d {self._asmflag_symdef}BUILD_TIME_UTC=$buildtime @$out.rsp $in -o $out", 
+            command = self._launch( f"$asm -MMD -MT $out -MF $out.d {self._asmflag_symdef}BUILD_TIME_UTC=$buildtime @$out.rsp $in -o $out" ), 
             rspfile = '$out.rsp',
             rspfile_content = '$asmopts',
             description = "Assembling: $in", 
@@ -805,17 +1162,28 @@ class ToolChain:
     def _build_ar_rule( self ):
         self._ninja_writer.rule( 
             name = 'ar', 
-            command = "$rm $out && $ar $aropts ${arout}${out} $in", 
+            command = self._ar_command( "$in" ), 
+            restat = self.get_ar_mode() == 'restat',
             description = "Archiving Directory: $out" )
         
     def _build_withrspfile_ar_rule( self ):
         self._ninja_writer.rule( 
             name = 'ar', 
-            command = "$rm $out && $ar $aropts ${arout}${out} @$out.rsp", 
+            command = self._ar_command( "@$out.rsp" ), 
+            restat = self.get_ar_mode() == 'restat',
             rspfile = '$out.rsp',
             rspfile_content = '$in',
             description = "Archiving Directory: $out" )
 
+    def _ar_command( self, inputs ):
+        """ Returns the command for the (POSIX shell) 'ar' rule. The 
+            restat mode creates the archive in a temporary file and only 
+            replaces the archive when the temporary file differs
+        """
+        if ( self.get_ar_mode() != 'restat' ):
+            return f"$rm $out && $ar $aropts ${{arout}}${{out}} {inputs}"
+        return f"$rm $out.tmp && $ar $aropts ${{arout}}$out.tmp {inputs} && (cmp -s $out.tmp $out && $rm $out.tmp || mv -f $out.tmp $out)"
+
     def _build_arlibs_rule( self ):
         self._ninja_writer.rule( 
             name = 'arlibs', 
@@ -901,7 +1269,7 @@ class ToolChain:
         self._ninja_writer.variable( 'msvc_deps_prefix', 'Note: including file:' )
         self._ninja_writer.rule( 
             name = 'compile', 
-            command = f'$cc /showIncludes /D "BUILD_TIME_UTC=$buildtime" @$out.rsp $in /Fo: $out', 
+            command = self._launch( f'$cc /showIncludes /D "BUILD_TIME_UTC=$buildtime" @$out.rsp $in /Fo: $out' ), 
             description = "Compiling: $in", 
             rspfile = '$out.rsp',
             rspfile_content = '$ccopts',
@@ -972,7 +1340,7 @@ class ToolChain:
         for k,v in bld_variants.items():
             self._printer.debug( '#  VARIANT: ' + k )
             for sk,sv in v.items():
-                if ( sk != 'nop' ):
+                if ( isinstance( sv, BuildValues ) ):
                     self._printer.debug( '#    Options: '      + sk )
                     self._dump_options( sv )
                     
@@ -0,0 +1,268 @@
+#!/usr/bin/python3
+"""Header file dependency helpers (built from the ninja deps log)
+
+The ninja deps log (.ninja_deps) in each build variant directory records the
+header files that each object file depends on.  These helpers build a reverse
+index (header -> object files) for each project/variant and cache it in the
+NQBP_CACHE_ROOT directory so that queries like "what rebuilds if I touch X"
+do not require running ninja or re-reading unchanged deps logs.
+"""
+
+import os
+import sys
+import struct
+
+#
+from . import utils
+
+# Name of ninja's dependency log
+NINJA_DEPS_LOG = '.ninja_deps'
+
+# Name of the ninja build file
+NINJA_FILE = 'build.ninja'
+
+
+#-----------------------------------------------------------------------------
+def read_ninja_deps( fname ):
+    """ Parses a (binary) ninja deps log and returns a dictionary of
+        output -> list of dependencies.  The paths are exactly as recorded by
+        ninja (i.e. relative to the build directory or absolute).  Returns an
+        empty dictionary if the log does not exist.
+    """
+    try:
+        with open( fname, 'rb' ) as fd:
+            data = fd.read()
+    except OSError:
+        return {}
+
+    signature = b'# ninjadeps\n'
+    if ( not data.startswith( signature ) or len(data) < len(signature) + 4 ):
+        sys.exit( f"ERROR: Invalid ninja deps log: {fname}" )
+    version = struct.unpack_from( '<i', data, len(signature) )[0]
+    if ( version not in (3, 4) ):
+        sys.exit( f"ERROR: Unsupported ninja deps log version ({version}): {fname}" )
+    header_ints = 3 if version == 4 else 2      # out-id + mtime (version 4 uses a 64bit mtime)
+
+    paths = []
+    deps  = {}
+    idx   = len(signature) + 4
+    while ( idx + 4 <= len(data) ):
+        size    = struct.unpack_from( '<I', data, idx )[0]
+        is_deps = size & 0x80000000
+        size   &= 0x7FFFFFFF
+        idx    += 4
+        if ( idx + size > len(data) ):
+            break   # Truncated record (e.g. ninja was interrupted)
+
+        # Dependency record: out-id, mtime, dep-ids...
+        if ( is_deps ):
+            ids = struct.unpack_from( f'<{size // 4}i', data, idx )
+            if ( ids[0] < len(paths) ):
+                deps[ids[0]] = ids[header_ints:]
+
+        # Path record: path (zero padded to 4 bytes), checksum
+        else:
+            paths.append( data[idx:idx+size-4].rstrip(b'\0').decode( errors='replace' ) )
+        idx += size
+
+    result = {}
+    for out, ids in deps.items():
+        result[paths[out]] = [paths[i] for i in ids if i < len(paths)]
+    return result
+
+
+def read_build_edges( fname ):
+    """ Parses a ninja build file and returns a dictionary of output -> first
+        explicit input for each (non-phony) build edge, i.e. object file ->
+        source file for the compile edges.  The paths are unescaped, but
+        otherwise as written in the file.  Returns an empty dictionary if
+        the file does not exist.
+    """
+    result = {}
+    try:
+        with open( fname, 'r' ) as fd:
+            text = fd.read()
+    except OSError:
+        return result
+
+    for line in text.replace( '$\n', ' ' ).splitlines():
+        if ( not line.startswith( 'build ' ) ):
+            continue
+        outputs, rule_and_inputs = _split_unescaped( line[6:], ':', 1 )
+        tokens = [ t for t in _split_unescaped( rule_and_inputs, ' ' ) if t != '' ]
+        outs   = [ t for t in _split_unescaped( outputs, ' ' ) if t != '' ]
+        if ( len(tokens) < 2 or len(outs) == 0 or tokens[0] == 'phony' or tokens[1] in ('|', '||') ):
+            continue
+        result[_unescape( outs[0] )] = _unescape( tokens[1] )
+    return result
+
+#-----------------------------------------------------------------------------
+def build_index( vardir ):
+    """ Returns the reverse dependency index for a single build variant
+        directory, i.e. a dictionary with the following keys:
+            'sources': object -> translation unit (source file)
+            'headers': header -> list of objects that include it
+        All file names are absolute/normalized paths.  The translation unit
+        is taken from the object's build edge (the deps log of some compilers,
+        e.g. MSVC's /showIncludes, does not contain the source file).
+    """
+    vardir  = os.path.abspath( vardir )
+    edges   = { _normalize( vardir, o ): _normalize( vardir, i ) for o, i in read_build_edges( os.path.join( vardir, NINJA_FILE ) ).items() }
+    sources = {}
+    headers = {}
+    for obj, dlist in read_ninja_deps( os.path.join( vardir, NINJA_DEPS_LOG ) ).items():
+        obj  = _normalize( vardir, obj )
+        deps = [ _normalize( vardir, d ) for d in dlist ]
+        src  = edges.get( obj )
+        if ( src == None ):
+            if ( len(deps) == 0 ):
+                continue
+            src = deps[0]       # No build edge: assume GCC style deps, i.e. the source file is the first dependency
+        sources[obj] = src
+        for d in deps:
+            if ( d != src ):
+                headers.setdefault( d, [] ).append( obj )
+    return { 'sources': sources, 'headers': headers }
+
+def get_index( vardir, refresh=False ):
+    """ Same as build_index(), except the index is cached (and only rebuilt
+        when the deps log has changed)
+    """
+    vardir = os.path.abspath( vardir )
+    key    = _deps_log_key( vardir )
+    cfile  = os.path.join( 'deps', utils.hash_string( vardir ) + '.json' )
+    if ( not refresh ):
+        cached = utils.read_cache_file( cfile )
+        if ( cached != None and cached.get('vardir') == vardir and cached.get('key') == key ):
+            return cached['index']
+
+    index = build_index( vardir )
+    utils.write_cache_file( cfile, { 'vardir': vardir, 'key': key, 'index': index } )
+    return index
+
+def find_variant_dirs( root ):
+    """ Returns the list of build variant directories (i.e. directories that
+        contain a ninja deps log) found under 'root'
+    """
+    result = []
+    for dirpath, dirs, files in os.walk( root ):
+        # Do not descend into build outputs (other than to check for the deps log) or hidden directories
+        keep = []
+        for d in dirs:
+            if ( d.startswith('_') ):
+                if ( os.path.isfile( os.path.join( dirpath, d, NINJA_DEPS_LOG ) ) ):
+                    result.append( os.path.join( dirpath, d ) )
+            elif ( not d.startswith('.') ):
+                keep.append( d )
+        dirs[:] = keep
+    return sorted( result )
+
+def split_variant_dir( vardir ):
+    """ Returns (project directory, variant name) for a build variant directory """
+    prjdir, name = os.path.split( os.path.abspath( vardir ) )
+    return prjdir, name[1:]
+
+#-----------------------------------------------------------------------------
+def match_headers( index, fname ):
+    """ Returns the list of headers in 'index' that match 'fname'.  An exact
+        (absolute path) match is preferred, else any header whose path ends
+        with 'fname' (on a directory boundary) matches.
+    """
+    full = os.path.normpath( os.path.abspath( fname ) )
+    if ( full in index['headers'] ):
+        return [ full ]
+    suffix = os.sep + os.path.normpath( utils.standardize_dir_sep( fname ) ).lstrip( os.sep )
+    return [h for h in index['headers'] if h.endswith( suffix )]
+
+def rebuilds( vardirs, files, refresh=False ):
+    """ Returns the list of (project directory, variant, objects, sources)
+        that would be rebuilt if any of 'files' were modified
+    """
+    result = []
+    for vardir in vardirs:
+        index   = get_index( vardir, refresh )
+        objects = set()
+        for f in files:
+            for h in match_headers( index, f ):
+                objects.update( index['headers'][h] )
+
+            # Editing a translation unit itself rebuilds its object
+            full = os.path.normpath( os.path.abspath( f ) )
+            for obj, src in index['sources'].items():
+                if ( src == full or src.endswith( os.sep + os.path.normpath( f ).lstrip( os.sep ) ) ):
+                    objects.add( obj )
+
+        if ( len(objects) > 0 ):
+            prjdir, variant = split_variant_dir( vardir )
+            objects = sorted( objects )
+            result.append( (prjdir, variant, objects, [index['sources'][o] for o in objects]) )
+    return result
+
+#-----------------------------------------------------------------------------
+def compile_times( vardir ):
+    """ Returns a dictionary of object -> compile time (in milliseconds) from
+        the most recent .ninja_log entry of each object in 'vardir'
+    """
+    vardir = os.path.abspath( vardir )
+    times  = {}
+    for start, end, mtime, output in utils.read_ninja_log( os.path.join( vardir, '.ninja_log' ) ):
+        times[_normalize( vardir, output )] = end - start
+    return times
+
+def header_costs( vardir, pch_ratio=0.5 ):
+    """ Ranks the headers used by a build variant by their aggregate cost, i.e.
+        the sum of the compile times of the translation units that include
+        the header.  A header included by at least 'pch_ratio' of the 
+        translation units is flagged as a precompiled header candidate.
+        Returns a list (most expensive first) of dictionaries.
+    """
+    index = get_index( vardir )
+    times = compile_times( vardir )
+    ntus  = max( len(index['sources']), 1 )
+
+    results = []
+    for hdr, objs in index['headers'].items():
+        cost  = sum( times.get( o, 0 ) for o in objs )
+        ratio = len(objs) / ntus
+        results.append( { 'header':  hdr,
+                          'tus':     len(objs),
+                          'ratio':   round( ratio, 4 ),
+                          'cost_ms': cost,
+                          'avg_ms':  cost // len(objs),
+                          'pch':     ratio >= pch_ratio and len(objs) > 1 } )
+    results.sort( key=lambda r: (r['cost_ms'], r['tus']), reverse=True )
+    return results
+
+#-----------------------------------------------------------------------------
+def _normalize( vardir, path ):
+    return os.path.normpath( os.path.join( vardir, path ) )
+
+def _deps_log_key( vardir ):
+    key = []
+    for fname in ( NINJA_DEPS_LOG, NINJA_FILE ):
+        try:
+            st = os.stat( os.path.join( vardir, fname ) )
+            key.append( f"{st.st_mtime_ns}|{st.st_size}" )
+        except OSError:
+            key.append( '' )
+    return '|'.join( key ) if key[0] else None
+
+def _split_unescaped( text, sep, maxsplit=-1 ):
+    # Splits 'text' at the 'sep' characters that are not escaped by a '$'
+    parts = []
+    start = 0
+    idx   = 0
+    while ( idx < len(text) and maxsplit != 0 ):
+        if ( text[idx] == '$' ):
+            idx += 2
+            continue
+        if ( text[idx] == sep ):
+            parts.append( text[start:idx] )
+            start     = idx + 1
+            maxsplit -= 1
+        idx += 1
+    parts.append( text[start:] )
+    return parts
+
+def _unescape( path ):
+    return path.replace( '$ ', ' ' ).replace( '$:', ':' ).replace( '$$', '$' )
@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+"""Rebuild explanations (derived from ninja's '-d explain' output)
+
+When ninja is run with '-d explain' it writes one 'ninja explain: ...' line
+(to stderr) for every decision it makes while determining which edges are
+dirty.  The raw output is too verbose to be useful on a real project, so these
+helpers attribute each dirty edge to its root cause (i.e. a modified input
+file, a changed command line, a missing output, etc.) and summarize the causes
+by the number of edges they rebuilt.
+"""
+
+import os
+import sys
+import subprocess
+
+#
+from . import utils
+
+# Prefix of the lines that ninja outputs when '-d explain' is enabled
+EXPLAIN_PREFIX = 'ninja explain: '
+
+# Root cause kinds
+CAUSE_HEADER   = 'header'
+CAUSE_INPUT    = 'input'
+CAUSE_COMMAND  = 'command'
+CAUSE_MISSING  = 'missing'
+CAUSE_DEPS     = 'deps'
+CAUSE_UNKNOWN  = 'unknown'
+
+# File extensions that are reported as 'header' (instead of 'input') causes
+HEADER_EXTS = ( '.h', '.hh', '.hpp', '.hxx', '.h++', '.inc', '.inl', '.tcc', '.ipp' )
+
+
+#-----------------------------------------------------------------------------
+def run_ninja( cmd ):
+    """ Runs ninja (the command must include the '-d explain' option).  The
+        'ninja explain' lines are captured, all other output is passed through
+        to the console.  Returns (exit code, list of explain lines)
+    """
+    utils.print_verbose( cmd )
+    explain = []
+    p = subprocess.Popen( cmd, shell=True, stderr=subprocess.PIPE )
+    for line in p.stderr:
+        line = line.decode( errors='replace' )
+        if ( line.startswith( EXPLAIN_PREFIX ) ):
+            explain.append( line.rstrip() )
+        else:
+            sys.stderr.write( line )
+            sys.stderr.flush()
+    p.wait()
+    return (p.returncode, explain)
+
+#-----------------------------------------------------------------------------
+def parse( lines ):
+    """ Parses 'ninja explain' lines. Returns (dirty, reasons) where 'dirty' is
+        the list (in order) of dirty outputs, and 'reasons' is a dictionary of
+        output -> (kind, detail).  For the CAUSE_INPUT kind, 'detail' is the
+        input file that is newer than the output.
+    """
+    dirty   = []
+    seen    = set()
+    reasons = {}
+    for line in lines:
+        if ( line.startswith( EXPLAIN_PREFIX ) ):
+            line = line[len(EXPLAIN_PREFIX):]
+        output, reason = _parse_line( line )
+        if ( output == None ):
+            continue
+        if ( reason == None ):
+            if ( output not in reasons ):
+                reasons[output] = None
+            if ( output not in seen ):
+                seen.add( output )
+                dirty.append( output )
+        elif ( reasons.get( output ) == None ):
+            reasons[output] = reason
+    return dirty, reasons
+
+def read_build_inputs( fname='build.ninja' ):
+    """ Returns a dictionary of output -> list of (explicit and implicit)
+        inputs for the build statements in the ninja file 'fname'.  Paths are
+        normalized the same way ninja normalizes them in its explain output.
+    """
+    try:
+        with open( fname, 'r' ) as fd:
+            text = fd.read()
+    except OSError:
+        return {}
+
+    inputs = {}
+    for line in text.replace( '$\n', '' ).splitlines():
+        if ( not line.startswith( 'build ' ) ):
+            continue
+        outs, _, ins = _split_unescaped( line[len('build '):], ':' )
+        ins = _split_unescaped( ins, '||' )[0].replace( ' | ', ' ' )
+        ins = [_unescape( t ) for t in _split_words( ins )[1:]]
+        for o in _split_words( outs.replace( ' | ', ' ' ) ):
+            inputs[_unescape( o )] = ins
+    return inputs
+
+def summarize( lines, inputs=None, built=None ):
+    """ Attributes each dirty edge to its root cause.  An edge that is dirty
+        because one of its inputs is the (dirty) output of another edge
+        inherits that edge's root cause.  Ninja does not always explain edges
+        that are dirty only because of a dirty input, i.e. 'inputs' (see
+        read_build_inputs()) is used to find the dirty input and 'built' (the
+        outputs ninja actually built) supplies the unexplained edges.  Returns
+        a list (largest impact first) of dictionaries: 
+            { 'kind', 'cause', 'edges', 'outputs' }
+    """
+    dirty, reasons = parse( lines )
+    inputs = inputs if inputs != None else {}
+    for output in ( built if built != None else [] ):
+        output = os.path.normpath( output )
+        if ( output not in reasons ):
+            reasons[output] = None
+            dirty.append( output )
+    causes = {}
+    for output in dirty:
+        kind, cause = _root_cause( output, reasons, inputs, set() )
+        entry = causes.setdefault( (kind, cause), { 'kind': kind, 'cause': cause, 'edges': 0, 'outputs': [] } )
+        entry['edges'] += 1
+        entry['outputs'].append( output )
+
+    results = list( causes.values() )
+    results.sort( key=lambda c: (-c['edges'], c['kind'], c['cause']) )
+    return results
+
+#-----------------------------------------------------------------------------
+def _parse_line( line ):
+    # Dirty output (i.e. the edge will be executed)
+    if ( line.endswith( ' is dirty' ) ):
+        return line[:-len(' is dirty')], None
+
+    # An input is newer than the output
+    for prefix in ( 'output ', 'restat of output ', 'recorded mtime of ' ):
+        if ( line.startswith( prefix ) and ' older than most recent input ' in line ):
+            output, _, newer = line[len(prefix):].partition( ' older than most recent input ' )
+            newer = newer.rsplit( ' (', 1 )[0]
+            return output, (CAUSE_INPUT, newer)
+
+    if ( line.startswith( 'command line changed for ' ) ):
+        return line[len('command line changed for '):], (CAUSE_COMMAND, 'command line changed')
+    if ( line.startswith( 'command line not found in log for ' ) ):
+        return line[len('command line not found in log for '):], (CAUSE_COMMAND, 'not previously built (no .ninja_log entry)')
+    if ( line.startswith( 'output ' ) and line.endswith( " doesn't exist" ) ):
+        output = line[len('output '):-len(" doesn't exist")]
+        return output.split( ' of phony edge' )[0], (CAUSE_MISSING, 'output does not exist')
+    if ( line.startswith( "deps for '" ) and line.endswith( "' are missing" ) ):
+        return line[len("deps for '"):-len("' are missing")], (CAUSE_DEPS, 'dependency info is missing')
+    if ( line.endswith( ' has no in-edge and is missing' ) ):
+        return line[:-len(' has no in-edge and is missing')], (CAUSE_MISSING, 'source file does not exist')
+    return None, None
+
+def _root_cause( output, reasons, inputs, visited ):
+    visited.add( output )
+    reason = reasons.get( output )
+    if ( reason == None ):
+        for i in inputs.get( output, [] ):
+            if ( i in reasons and i not in visited ):
+                return _root_cause( i, reasons, inputs, visited )
+        return CAUSE_UNKNOWN, 'dirty input/order-only dependency'
+    kind, detail = reason
+    if ( kind != CAUSE_INPUT ):
+        return kind, detail
+
+    # Follow the chain of generated inputs (e.g. .o -> library.a -> a.out)
+    if ( detail in reasons and detail not in visited ):
+        return _root_cause( detail, reasons, inputs, visited )
+    if ( os.path.splitext( detail )[1].lower() in HEADER_EXTS ):
+        return CAUSE_HEADER, detail
+    return CAUSE_INPUT, detail
+
+def _split_unescaped( text, sep ):
+    idx = 0
+    while ( True ):
+        idx = text.find( sep, idx )
+        if ( idx < 0 ):
+            return text, '', ''
+        if ( _escaped( text, idx ) ):
+            idx += 1
+            continue
+        return text[:idx], sep, text[idx+len(sep):]
+
+def _split_words( text ):
+    words = []
+    word  = ''
+    for idx, c in enumerate( text ):
+        if ( c == ' ' and not _escaped( text, idx ) ):
+            if ( word ):
+                words.append( word )
+            word = ''
+        else:
+            word += c
+    if ( word ):
+        words.append( word )
+    return words
+
+def _escaped( text, idx ):
+    count = 0
+    while ( idx > 0 and text[idx-1] == '$' ):
+        count += 1
+        idx   -= 1
+    return count % 2 == 1
+
+def _unescape( path ):
+    path = path.replace( '$ ', ' ' ).replace( '$:', ':' ).replace( '$$', '$' )
+    return os.path.normpath( path ) if path else path
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+"""Duration history of builds/tests (used for scheduling decisions)
+
+The wall time of each job (e.g. a project+variant build by bob) is recorded
+in a JSON file in the NQBP_CACHE_ROOT directory.  The most recent samples are
+kept per job, and the median of the samples is the predicted duration of the
+job's next run.
+"""
+
+import heapq
+import statistics
+
+#
+from . import utils
+
+# Number of samples kept per job
+MAX_SAMPLES = 5
+
+
+#-----------------------------------------------------------------------------
+class History:
+    """ Duration history stored in the NQBP cache file 'fname' (relative to
+        NQBP_CACHE_ROOT)
+    """
+    def __init__( self, fname, max_samples=MAX_SAMPLES ):
+        self.fname        = fname
+        self.max_samples  = max_samples
+        self._samples     = utils.read_cache_file( fname, {} )
+        self._new         = {}
+
+    def samples( self, key ):
+        """ Returns the recorded durations (in seconds, oldest first) """
+        return self._samples.get( key, [] )
+
+    def predict( self, key ):
+        """ Returns the predicted duration (in seconds), or None when there
+            is no history for 'key'
+        """
+        samples = self.samples( key )
+        return statistics.median( samples ) if samples else None
+
+    def record( self, key, seconds ):
+        """ Adds a sample. The samples are written by save() """
+        self._new.setdefault( key, [] ).append( round( seconds, 3 ) )
+        self._samples[key] = ( self.samples( key ) + [round( seconds, 3 )] )[-self.max_samples:]
+
+    def save( self ):
+        """ Writes the new samples (merged with the current content of the
+            file, i.e. concurrent runs do not discard each other's samples)
+        """
+        if ( len(self._new) == 0 ):
+            return
+        current = utils.read_cache_file( self.fname, {} )
+        for key, samples in self._new.items():
+            current[key] = ( current.get( key, [] ) + samples )[-self.max_samples:]
+        utils.write_cache_file( self.fname, current )
+        self._samples = current
+        self._new     = {}
+
+#-----------------------------------------------------------------------------
+def estimate( history, keys ):
+    """ Returns the list of predicted durations for 'keys'.  Keys without
+        history are estimated as the median of the known predictions.
+        Returns None when none of the keys have history.
+    """
+    predicted = [ history.predict( k ) for k in keys ]
+    known     = [ p for p in predicted if p != None ]
+    if ( len(known) == 0 ):
+        return None
+    default = statistics.median( known )
+    return [ default if p == None else p for p in predicted ]
+
+def longest_first( items, durations ):
+    """ Returns 'items' sorted by their (predicted) durations, longest first
+        (LPT order).  The sort is stable, i.e. items with equal durations
+        retain their original order.
+    """
+    order = sorted( range(len(items)), key=lambda i: -durations[i] )
+    return [ items[i] for i in order ]
+
+def partition( keys, durations, bins ):
+    """ Partitions the items (identified by 'keys') into 'bins' bins with
+        balanced total durations (greedy: longest item first, into the least 
+        loaded bin).  The durations are rounded to two significant digits and
+        ties are broken by key, i.e. the result only depends on the keys and
+        (approximate) durations - not the order of the items - and small 
+        changes in the durations rarely move items between bins.  Returns a
+        list of bin indexes (one per item).
+    """
+    rounded = [ float( f"{d:.2g}" ) for d in durations ]
+    order   = sorted( range(len(keys)), key=lambda i: (-rounded[i], keys[i]) )
+    loads   = [ (0.0, b) for b in range(bins) ]
+    result  = [ None ] * len(keys)
+    for i in order:
+        load, b   = heapq.heappop( loads )
+        result[i] = b
+        heapq.heappush( loads, (load + rounded[i], b) )
+    return result
+
+def makespan( durations, workers ):
+    """ Returns the makespan of executing the durations (in order) with
+        'workers' parallel workers, i.e. each item is started on the first
+        free worker
+    """
+    free = [0.0] * max( min( workers, len(durations) ), 1 )
+    for d in durations:
+        heapq.heapreplace( free, free[0] + d )
+    return max( free )
@@ -0,0 +1,221 @@
+#!/usr/bin/python3
+"""GNU make compatible jobserver (a single pool of job tokens)
+
+When several builds run at the same time (e.g. 'bob -4', or a pre-processing
+script that launches a nested nqbp.py) each ninja instance would, by default,
+run #cpus+2 jobs, i.e. the machine is massively oversubscribed.  A jobserver
+is a pool of tokens shared by all of the builds: a process must hold a token
+(in addition to the one 'implicit' token it was started with) for each extra
+job it runs concurrently.
+
+The pool is advertised to child processes using the MAKEFLAGS environment
+variable (the same protocol as GNU make 4.4+), i.e. the server and clients
+also interoperate with make and ninja 1.13+ (which is a native client):
+
+    MAKEFLAGS=' -j<N> --jobserver-auth=fifo:<path>'     (named pipe)
+    MAKEFLAGS=' -j<N> --jobserver-auth=<R>,<W>'         (inherited pipe fds)
+
+The server also advertises the fair share of the pool per build (the number of
+tokens divided by the number of builds that the server's owner runs at the
+same time, NQBP_JOBSERVER_SHARE).  A client that cannot acquire tokens per job
+(i.e. ninja older than 1.13) acquires at most its share up front.
+
+Note: Only POSIX hosts are supported (the Windows flavor of the protocol uses
+a named semaphore), i.e. on Windows the builds are not coordinated.
+"""
+
+import os
+import re
+import shutil
+import select
+import subprocess
+import tempfile
+
+#
+from . import utils
+
+# Environment variable used to advertise the jobserver
+JOBSERVER_ENV = 'MAKEFLAGS'
+
+# Environment variable used to advertise the number of jobs per build
+SHARE_ENV = 'NQBP_JOBSERVER_SHARE'
+
+# Cache of the ninja versions (relative to NQBP_CACHE_ROOT)
+NINJA_CACHE_FILE = 'ninja_version.json'
+
+# Minimum ninja version that is a jobserver client
+NINJA_CLIENT_VERSION = (1, 13)
+
+# Token written to the pool (GNU make uses '+')
+TOKEN = b'+'
+
+_AUTH_REGEX = re.compile( r'--jobserver-(?:auth|fds)=(\S+)' )
+
+
+#-----------------------------------------------------------------------------
+class Server:
+    """ Creates a pool of 'jobs' tokens (the creating process owns one of the
+        tokens implicitly, as does each child that it starts, see the
+        'implicit' argument) and advertises the pool in the environment of
+        the current process (i.e. for all child processes)
+    """
+    def __init__( self, jobs, implicit=1 ):
+        self.jobs  = max( int(jobs), 1 )
+        self.path  = os.path.join( tempfile.mkdtemp( prefix='nqbp_jobserver_' ), 'fifo' )
+        os.mkfifo( self.path, 0o600 )
+
+        # Hold the FIFO open (read/write) for the life of the server so that clients never see EOF/block on open
+        self._fd = os.open( self.path, os.O_RDWR | os.O_NONBLOCK )
+        os.write( self._fd, TOKEN * max( self.jobs - implicit, 0 ) )
+
+        self._saved       = os.environ.get( JOBSERVER_ENV )
+        self._saved_share = os.environ.get( SHARE_ENV )
+        os.environ[JOBSERVER_ENV] = f"{self._saved + ' ' if self._saved else ''} -j{self.jobs} --jobserver-auth=fifo:{self.path}"
+        os.environ[SHARE_ENV]     = str( max( self.jobs // max( implicit, 1 ), 1 ) )
+
+    def close( self ):
+        """ Removes the pool (and restores the environment) """
+        if ( self._fd == None ):
+            return
+        os.close( self._fd )
+        self._fd = None
+        for name, value in ( (JOBSERVER_ENV, self._saved), (SHARE_ENV, self._saved_share) ):
+            if ( value == None ):
+                os.environ.pop( name, None )
+            else:
+                os.environ[name] = value
+        try:
+            os.remove( self.path )
+            os.rmdir( os.path.dirname( self.path ) )
+        except OSError:
+            pass
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *args ):
+        self.close()
+
+#-----------------------------------------------------------------------------
+class Client:
+    """ Connection to the jobserver advertised by a parent process """
+    def __init__( self, auth ):
+        self.auth   = auth
+        self.tokens = []
+        if ( auth.startswith( 'fifo:' ) ):
+            fd          = os.open( auth[5:], os.O_RDWR | os.O_NONBLOCK )
+            self._rfd   = fd
+            self._wfd   = fd
+            self._owned = True
+        else:
+            r, w        = auth.split( ',' )
+            self._rfd   = int(r)
+            self._wfd   = int(w)
+            self._owned = False
+            os.fstat( self._rfd )       # Raises OSError when the fds were not inherited
+            os.fstat( self._wfd )
+
+    def try_acquire( self, max_tokens ):
+        """ Acquires up to 'max_tokens' tokens without blocking. Returns the
+            number of tokens acquired.  Note: The flags of an inherited pipe
+            are shared with the parent (and all siblings), i.e. the pipe is
+            never made non-blocking - it is polled instead.  A sibling can
+            take the token between the poll and the read, in which case the
+            read waits for the next released token.
+        """
+        count = 0
+        while ( count < max_tokens and self._readable() ):
+            try:
+                token = os.read( self._rfd, 1 )
+            except (BlockingIOError, InterruptedError):
+                break
+            if ( not token ):
+                break
+            self.tokens.append( token )
+            count += 1
+        return count
+
+    def release( self ):
+        """ Returns all acquired tokens to the pool """
+        while ( self.tokens ):
+            os.write( self._wfd, self.tokens.pop() )
+
+    def close( self ):
+        self.release()
+        if ( self._owned ):
+            os.close( self._rfd )
+
+    def _readable( self ):
+        # The named pipe is opened non-blocking (a private file description), the inherited pipe is polled with a zero timeout
+        return self._owned or len( select.select( [self._rfd], [], [], 0 )[0] ) > 0
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *args ):
+        self.close()
+
+#-----------------------------------------------------------------------------
+def get_auth( env=None ):
+    """ Returns the '--jobserver-auth' value advertised in the environment
+        (or None when there is no jobserver)
+    """
+    flags = (env if env != None else os.environ).get( JOBSERVER_ENV, '' )
+    m     = None
+    for m in _AUTH_REGEX.finditer( flags ):
+        pass    # The last occurrence wins (same as make)
+    return m.group(1) if m else None
+
+def connect():
+    """ Returns a Client for the advertised jobserver, or None when there is
+        no (usable) jobserver
+    """
+    auth = get_auth()
+    if ( auth == None or os.name != 'posix' ):
+        return None
+    try:
+        return Client( auth )
+    except (OSError, ValueError):
+        return None
+
+def create( jobs, implicit=1 ):
+    """ Creates a jobserver with 'jobs' tokens, unless a jobserver is already
+        advertised (i.e. a parent process owns the pool) or the host is not
+        supported.  Returns the Server instance or None
+    """
+    if ( os.name != 'posix' or not hasattr( os, 'mkfifo' ) or get_auth() != None ):
+        return None
+    return Server( jobs, implicit )
+
+def fair_share():
+    """ Returns the advertised number of jobs per build (including the
+        implicit token), or None when not advertised
+    """
+    try:
+        return max( int( os.environ[SHARE_ENV] ), 1 )
+    except (KeyError, ValueError):
+        return None
+
+def ninja_is_client( ninja='ninja' ):
+    """ Returns True if the installed ninja is a jobserver client.  The result
+        is cached (by the resolved path and timestamp/size of ninja) in the
+        NQBP_CACHE_ROOT directory.
+    """
+    path = shutil.which( ninja )
+    if ( path == None ):
+        return False
+    try:
+        st  = os.stat( path )
+        key = f"{os.path.realpath(path)}|{st.st_mtime_ns}|{st.st_size}"
+    except OSError:
+        return False
+    cache = utils.read_cache_file( NINJA_CACHE_FILE, {} )
+    if ( key not in cache ):
+        try:
+            version = subprocess.run( [path, '--version'], capture_output=True, text=True ).stdout.strip()
+            parts   = tuple( int(v) for v in re.findall( r'\d+', version )[:2] )
+        except (OSError, ValueError):
+            return False
+        cache[key] = parts >= NINJA_CLIENT_VERSION
+        utils.write_cache_file( NINJA_CACHE_FILE, cache )
+    return cache[key]
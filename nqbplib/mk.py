@@ -12,21 +12,15 @@
 #=============================================================================
 
 #
-from json import tool
+# Note: Imports are kept to a minimum (and deferred when possible) because the
+#       start-up time of nqbp.py matters, e.g. IDEs invoke it many times a minute
 import sys   
 import os
-import logging
 import time
 
 #
-from .docopt.docopt import docopt
-from .base import ToolChain
 from .output import Printer
-from .ninja_synatx import Writer
-
-from . import base
 from . import utils
-import multiprocessing
 
     
 # Globals
@@ -74,6 +68,26 @@ Arguments:
   --def5 SYM5      Defines (as a compiler option) the preprocessor 'SYM5'.
   -z, --clean-all  Cleans ALL files for ALL build configurations and then exits
   --debug          Enables debug info internally to NQBP.
+  --explain        Runs ninja with '-d explain' and outputs a summary of why
+                   the edges were rebuilt, i.e. the changed input/header files,
+                   command line changes, missing outputs, etc. - ordered by the
+                   number of edges each cause rebuilt.
+  --time-trace     Enables the compiler's time profiling (-ftime-trace for
+                   clang, -ftime-report for GCC) and outputs a report of where
+                   the compile time was spent, i.e. front-end vs back-end, the
+                   most expensive headers, template instantiations, passes.
+                   Note: Toggling this option triggers a full rebuild.
+  --launcher CMD   Prefixes the compile and assemble commands with CMD, e.g.
+                   ccache, sccache, distcc, icecc (overrides the NQBP_CC_LAUNCHER
+                   environment variable and mytoolchain.py).  Use 'none' to 
+                   disable the launcher.
+  --events FILE    Writes a stream of build events (one JSON object per line)
+                   to FILE, e.g. timings for each phase of the build, the 
+                   edges executed by ninja, and the final build status. The
+                   NQBP_EVENTS_FILE environment variable is an alternative
+                   to the option.
+  --profile FILE   Captures a cProfile of the ninja file generation phase and
+                   writes the stats to FILE (use: python -m pstats FILE).
   --qry            Outputs the current project directory (does nothing else)
   --qry-and-clean  Combines '--qry' and '--clean-all' options into a single 
                    operation.
@@ -86,6 +100,11 @@ Arguments:
   --qry-opts       Displays all of the toolchain options (no build is performed) 
   --deps           Outputs the Header file dependencies. DOES NOT BUILD the 
                    projects.
+  --hdr-cost       Outputs a ranking of the header files by their aggregate 
+                   compile cost (i.e. number of including translation units 
+                   weighted by their compile times) and flags precompiled
+                   header candidates. Requires a previous build. DOES NOT 
+                   BUILD the project.
   --vs             VSCode: Generates a compiler_flags.txt file in the package 
                    root with the compiler arguments for intellisense (NOT 
                    building from within VSCode).
@@ -102,24 +121,87 @@ Arguments:
 ninja_fname = "build.ninja"
 
 #-----------------------------------------------------------------------------
-def build( argv, toolchain ):
-
+def build( argv, toolchain, prjdir=None, printer=None ):
+    """ Entry point for a project's nqbp.py script.  'toolchain' is either a
+        toolchain instance or a function that returns a toolchain instance.
+        When a function is passed, the toolchain is only created (and the
+        mytoolchain.py module only imported) if the selected options need it.
+        'argv' is the command line (argv[0] is the script name).  'printer'
+        is the Printer for the build's output (see also api.build()).
+    """
+    
     # ensure that I am executing in the project directory
-    os.chdir( NQBP_PRJ_DIR() )
+    if ( prjdir != None ):
+        NQBP_PRJ_DIR( prjdir )
+    if ( not callable(toolchain) ):
+        os.chdir( NQBP_PRJ_DIR() )
 
     # Append options from optional environment variable
-    rawinput = sys.argv[1:]
+    start_time = time.time()
+    rawinput = list( argv[1:] )
     NQBP_CMD_OPTIONS = os.environ.get('NQBP_CMD_OPTIONS')
     if ( NQBP_CMD_OPTIONS != None ):
         rawinput.extend( NQBP_CMD_OPTIONS.split(' '))
 
     # Process command line args...
-    arguments = docopt(usage, argv=rawinput, version=NQBP_VERSION() )
+    arguments = parse_arguments( rawinput )
+    parse_done = time.time()
+
+    # Create printer
+    if ( printer == None ):
+        printer = Printer();
+
+    # Options that do not require a toolchain
+    if ( arguments['--qry'] and not arguments['-c'] and NQBP_PRJ_DIR() != '' ):
+        printer.output( NQBP_PRJ_DIR() )
+        sys.exit()
+
+    # Create the toolchain (if not already created)
+    if ( callable(toolchain) ):
+        toolchain = toolchain()
+        os.chdir( NQBP_PRJ_DIR() )
+    toolchain_done = time.time()
 
-    # Create printer (and tell the toolchain about it)
-    printer = Printer();
+    # Tell the toolchain about the printer
     toolchain.set_printer( printer )
 
+    # Start the event stream (if requested). Note: the environment variable is removed, i.e. nested builds do not write to the stream
+    events = os.environ.pop( 'NQBP_EVENTS_FILE', None )
+    if ( arguments['--events'] ):
+        events = arguments['--events']
+    if ( events ):
+        printer.enable_events( events )
+    printer.event( 'build_start', project=NQBP_PRJ_DIR(), argv=rawinput, nqbp_version=NQBP_VERSION(), pid=os.getpid() )
+    printer.event( 'phase', phase='parse_arguments', start=round(start_time,6), elapsed=round(parse_done-start_time,6), status='ok' )
+    printer.event( 'phase', phase='create_toolchain', start=round(parse_done,6), elapsed=round(toolchain_done-parse_done,6), status='ok', toolchain=toolchain.get_ccname() )
+
+    # Record the build's inputs (if requested by the parent process, e.g. bob)
+    stamp = None
+    if ( 'NQBP_STAMP_FILE' in os.environ ):
+        from . import stamps
+        stamp = stamps.recorder( NQBP_PRJ_DIR() )
+
+    # Run the build and report the final status
+    try:
+        _build( printer, toolchain, arguments, stamp )
+    except SystemExit as e:
+        _build_end( printer, start_time, e.code )
+        raise
+    except BaseException as e:
+        _build_end( printer, start_time, f"{type(e).__name__}: {e}" )
+        raise
+    _build_end( printer, start_time, 0 )
+    if ( stamp != None and not arguments['-c'] ):
+        stamp.write( rawinput )
+
+def _build_end( printer, start_time, exit_code ):
+    status = 'ok' if not exit_code else 'failed'
+    rc     = exit_code if isinstance( exit_code, int ) else (0 if not exit_code else 1)
+    reason = exit_code if isinstance( exit_code, str ) else None
+    printer.event( 'build_end', status=status, rc=rc, reason=reason, elapsed=round(time.time()-start_time,6) )
+
+def _build( printer, toolchain, arguments, stamp=None ):
+
     # Does the specified variant exist
     if ( arguments['--try'] != None ):
         if ( not arguments['--try'] in toolchain.get_variants() ):
@@ -167,21 +249,132 @@ def build( argv, toolchain ):
         utils.pop_dir()
         sys.exit()
 
+    if ( arguments['--hdr-cost'] ):
+        header_cost_report( printer, "_" + arguments['-b'] )
+        sys.exit()
+
+    # Command line launcher setting overrides the environment/mytoolchain.py setting
+    if ( arguments['--launcher'] != None ):
+        toolchain.set_launcher( arguments['--launcher'] )
+
     # Validate Compiler toolchain is set properly (ONLY after non-build options have been processed, i.e. don't have to have an 'active' toolchain for non-build options to work)
-    toolchain.validate_cc()
+    with printer.phase( 'validate_cc' ):
+        toolchain.validate_cc()
+        toolchain.validate_linker()
             
-    # Start the selected build(s)
-    if ( arguments['--bld-all'] ):
-        for b in toolchain.get_variants():
-            if ( not b.startswith("_") ):
-                do_build( printer, toolchain, arguments, b )
-    else: 
-        do_build( printer, toolchain, arguments, arguments['-b'] )        
+    # Own the job token pool when there can be nested builds (e.g. a pre-processing script that runs nqbp.py) unless a parent process owns it
+    server = None
+    if ( not arguments['-1'] and os.name == 'posix' and '--jobserver-' not in os.environ.get('MAKEFLAGS','') and _want_jobserver() ):
+        from . import jobserver
+        server = jobserver.create( (os.cpu_count() or 1) + 2 )
+    try:
+        # Start the selected build(s)
+        if ( arguments['--bld-all'] ):
+            for b in toolchain.get_variants():
+                if ( not b.startswith("_") ):
+                    do_build( printer, toolchain, arguments, b, stamp )
+        else: 
+            do_build( printer, toolchain, arguments, arguments['-b'], stamp )        
+    finally:
+        if ( server != None ):
+            server.close()
             
            
 
+def _want_jobserver():
+    """ Returns True if a standalone build should create a job token pool.
+        NQBP_JOBSERVER=1/0 forces/disables the pool, by default the pool is
+        only created when the project has a pre-processing script (i.e. the
+        only place that a nested build can be started from)
+    """
+    setting = os.environ.get( 'NQBP_JOBSERVER' )
+    if ( setting != None and setting.strip() != '' ):
+        return setting.strip() != '0'
+    return NQBP_PRE_PROCESS_SCRIPT() != None
+
 #-----------------------------------------------------------------------------
-def do_build( printer, toolchain, arguments, variant ):
+def parse_arguments( rawinput ):
+    """ Parses the command line.  The common case (i.e. only simple options)
+        is parsed directly to avoid the cost of importing docopt and parsing
+        the usage string.  Everything else is handed off to docopt.
+    """
+    arguments = _fast_parse_arguments( rawinput )
+    if ( arguments == None ):
+        from .docopt.docopt import docopt
+        arguments = docopt(usage, argv=rawinput, version=NQBP_VERSION() )
+    return arguments
+
+# Option table for the fast path parser (parsed once from the usage string)
+_usage_option_table = None
+
+def _usage_options():
+    """ Returns a dictionary of option-name -> (docopt key, takes-a-value, 
+        default value) derived from the usage string.  This is a subset of
+        docopt's option parsing, i.e. it is ONLY used by the fast path parser.
+        The table is only built once per process.
+    """
+    global _usage_option_table
+    if ( _usage_option_table == None ):
+        _usage_option_table = _parse_usage_options( usage )
+    return _usage_option_table
+
+def _parse_usage_options( text ):
+    options = {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if ( line.startswith('-') ):
+            names, _, desc = line.partition('  ')
+            tokens = names.replace(',',' ').replace('=',' ').split()
+            keys   = [t for t in tokens if t.startswith('-')]
+            key    = ([k for k in keys if k.startswith('--')] + keys)[0]
+            current = [ key, keys, len(keys) != len(tokens), desc ]
+            for k in keys:
+                options[k] = current
+        elif ( current != None ):
+            current[3] += ' ' + line
+
+    result = {}
+    for name, (key, keys, hasvalue, desc) in options.items():
+        default = False
+        if ( hasvalue ):
+            default = None
+            idx = desc.lower().find('[default: ')
+            if ( idx >= 0 ):
+                default = desc[idx+10:].split(']',1)[0]
+        result[name] = (key, hasvalue, default)
+    return result
+
+def _fast_parse_arguments( rawinput ):
+    options   = _usage_options()
+    arguments = {}
+    for key, hasvalue, default in options.values():
+        arguments[key] = default
+
+    idx = 0
+    while( idx < len(rawinput) ):
+        token = rawinput[idx]
+        idx  += 1
+
+        # Let docopt handle anything 'non-trivial' (e.g. --help, combined/abbreviated options, errors)
+        opt = options.get( token )
+        if ( opt == None or opt[0] in ('--help', '--version') ):
+            return None
+        key, hasvalue, default = opt
+        if ( arguments[key] != default ):
+            return None
+        if ( not hasvalue ):
+            arguments[key] = True
+        elif ( idx < len(rawinput) and rawinput[idx] != '' and not rawinput[idx].startswith('-') ):
+            arguments[key] = rawinput[idx]
+            idx += 1
+        else:
+            return None
+
+    return arguments
+
+#-----------------------------------------------------------------------------
+def do_build( printer, toolchain, arguments, variant, stamp=None ):
 
     # Create the variant directory (aka the build output directory)
     vardir = '_' + variant
@@ -189,12 +382,17 @@ def do_build( printer, toolchain, arguments, variant ):
     utils.push_dir( vardir )
 
     # Create the Ninja writer and empty ninja build file
+    from .ninja_synatx import Writer
+    printer.event( 'variant_start', variant=variant )
+    generate_start = time.time()
+    profiler       = _start_profiler( arguments )
     with open(ninja_fname, 'w') as ninja_file:
         nwriter = Writer( ninja_file )
         toolchain.set_ninja_writer( nwriter )
 
         # Set the build variant (Note: The method constructs the libdirs.b directory list)
-        toolchain.pre_build( variant, arguments )
+        with printer.phase( 'libdirs', variant=variant ):
+            toolchain.pre_build( variant, arguments )
 
         # Output start banner
         if ( arguments['--qry-dirs'] == False 
@@ -227,41 +425,57 @@ def do_build( printer, toolchain, arguments, variant ):
             return
         
                             
+        # Prebuilt archives for the xpkgs directories (Note: compile_commands.json needs all of the compile edges)
+        store = None
+        if ( not arguments['--vsjson'] ):
+            from . import archstore
+            store = archstore.create( printer, toolchain, arguments )
+
         # Generate ninja content for each libdirs.b directory
         dbgOpt = 'debug' if arguments['-g'] else 'release'
         builtlibs = []
         for d in toolchain.libdirs:
-            builtlibs.append( build_single_directory( printer, arguments, toolchain, d[0], d[1], NQBP_PKG_ROOT(), NQBP_WORK_ROOT(), NQBP_WRKPKGS_DIRNAME(), NQBP_PRJ_DIR(), NQBP_PRE_PROCESS_SCRIPT(), variant, dbgOpt, NQBP_PRE_PROCESS_SCRIPT_ARGS() ) )
+            with printer.phase( 'generate_dir', dir=d[0][0] ):
+                builtlibs.append( build_single_directory( printer, arguments, toolchain, d[0], d[1], NQBP_PKG_ROOT(), NQBP_WORK_ROOT(), NQBP_WRKPKGS_DIRNAME(), NQBP_PRJ_DIR(), NQBP_PRE_PROCESS_SCRIPT(), variant, dbgOpt, NQBP_PRE_PROCESS_SCRIPT_ARGS(), store ) )
+        if ( store != None ):
+            printer.debug( f'# archive store: {store.hits} hit(s), {store.misses} miss(es)' )
 
         # Generate ninja content for the Build project dir
-        utils.run_pre_processing_script( printer, NQBP_PRJ_DIR(), NQBP_WORK_ROOT(), NQBP_PKG_ROOT(), NQBP_PRJ_DIR(), NQBP_PRE_PROCESS_SCRIPT(), NQBP_PRE_PROCESS_SCRIPT_ARGS(), variant, dbgOpt, verbose=arguments['-v'] )
-        files = utils.get_files_to_build( printer, toolchain, '..', NQBP_NAME_SOURCES() )
-        toolchain._ninja_writer.newline()
-        toolchain._ninja_writer.comment( "Project Directory:" )
-        toolchain._ninja_writer.newline()
-        objfiles = []
-        for f in files:
-            objfiles.append( toolchain.cc( arguments, '..' + os.sep + f, '.' ) )
+        with printer.phase( 'generate_dir', dir='.' ):
+            utils.run_pre_processing_script( printer, NQBP_PRJ_DIR(), NQBP_WORK_ROOT(), NQBP_PKG_ROOT(), NQBP_PRJ_DIR(), NQBP_PRE_PROCESS_SCRIPT(), NQBP_PRE_PROCESS_SCRIPT_ARGS(), variant, dbgOpt, verbose=arguments['-v'] )
+            files = utils.get_files_to_build( printer, toolchain, '..', NQBP_NAME_SOURCES() )
+            toolchain._ninja_writer.newline()
+            toolchain._ninja_writer.comment( "Project Directory:" )
+            toolchain._ninja_writer.newline()
+            objfiles = []
+            for f in files:
+                objfiles.append( toolchain.cc( arguments, '..' + os.sep + f, '.' ) )
         
         # Run pre-link. Note: The pre-link function has 'side effects' inside the toolchain instance
-        inf = open( os.path.join( "..", NQBP_NAME_LIBDIRS()), 'r' )
-        toolchain.pre_link( arguments, inf, 'local', variant, builtlibs )
-        inf.close()
+        with printer.phase( 'pre_link' ):
+            inf = open( os.path.join( "..", NQBP_NAME_LIBDIRS()), 'r' )
+            toolchain.pre_link( arguments, inf, 'local', variant, builtlibs )
+            inf.close()
         
         # Generate ninja content for the link
-        toolchain._ninja_writer.newline()
-        toolchain._ninja_writer.comment( "Linking:" )
-        toolchain._ninja_writer.newline()
-        linkout = toolchain.link( arguments, builtlibs, objfiles, 'local' )
-
-        # Finalize the ninja file
-        toolchain.finalize(  arguments, builtlibs, objfiles, 'local', linkout )
+        with printer.phase( 'generate_link' ):
+            toolchain._ninja_writer.newline()
+            toolchain._ninja_writer.comment( "Linking:" )
+            toolchain._ninja_writer.newline()
+            linkout = toolchain.link( arguments, builtlibs, objfiles, 'local' )
+
+            # Finalize the ninja file
+            toolchain.finalize(  arguments, builtlibs, objfiles, 'local', linkout )
         ninja_file.close()
+        _stop_profiler( printer, arguments, profiler, variant )
+        printer.phase_done( 'generate', generate_start, status='ok', variant=variant )
         
         if ( arguments['--vsjson'] ):
             ofile  = os.path.join(NQBP_PKG_ROOT(),'compile_commands.json')
             ncmd   = f"ninja -t compdb > {ofile}"
             utils.run_shell2( ncmd, True, "ERROR: Generation of the compile_command.sjon failed." )
+            if ( toolchain.get_launcher() != None ):
+                _strip_launcher_from_compdb( ofile, toolchain.get_launcher() )
             printer.output(f"File: {ofile} generated.")
             return
 
@@ -271,15 +485,221 @@ def do_build( printer, toolchain, arguments, variant ):
             ninja_opts = '-v'
         if ( arguments['-1'] ):
             ninja_opts = ninja_opts + ' -j 1'
+        if ( arguments['--explain'] ):
+            ninja_opts = ninja_opts + ' -d explain'
+        jobs_client = None
+        if ( not arguments['-1'] and '--jobserver-' in os.environ.get('MAKEFLAGS','') ):
+            jobs_client, jobs_opt = _join_jobserver( printer )
+            ninja_opts = ninja_opts + jobs_opt
         ncmd = f"ninja {ninja_opts} -d keepdepfile"
         printer.debug( '# ninja command = ' + ncmd )
 
-        utils.run_shell2( ncmd, True, "ERROR: Build failed." )
+        log_offset = utils.get_file_size( '.ninja_log' )
+        try:
+            with printer.phase( 'ninja', variant=variant ):
+                if ( arguments['--explain'] ):
+                    from . import explain
+                    rc, explain_lines = explain.run_ninja( ncmd )
+                else:
+                    rc, _ = utils.run_shell2( ncmd, True )
+        finally:
+            if ( jobs_client != None ):
+                jobs_client.close()
+        if ( arguments['--explain'] ):
+            explain_report( printer, explain_lines, [e[3] for e in utils.read_ninja_log( '.ninja_log', log_offset )] )
+        if ( printer.events_enabled() ):
+            _report_ninja_edges( printer, toolchain, log_offset )
+        if ( rc != 0 ):
+            sys.exit( "ERROR: Build failed." )
+        if ( store != None ):
+            stored = store.publish()
+            printer.event( 'archive_store', root=store.root, hits=store.hits, misses=store.misses, stored=stored )
+        if ( stamp != None ):
+            stamp.add_variant( toolchain, variant )
+        if ( arguments['--time-trace'] ):
+            time_trace_report( printer, toolchain, log_offset )
+        printer.event( 'variant_end', variant=variant, status='ok', output=os.path.abspath( toolchain.get_final_output_name() ) )
 
     # Output end banner
     end_banner(printer, toolchain)
     utils.pop_dir()
      
+#-----------------------------------------------------------------------------
+def _join_jobserver( printer ):
+    """ Participates in the jobserver advertised by a parent process (e.g.
+        bob, make, or an outer nqbp).  Ninja 1.13+ is a jobserver client, i.e.
+        no '-j' option is passed so that ninja acquires tokens per edge.  For
+        older versions of ninja the build's fair share of the pool (or, when
+        the parent does not advertise a share, as many tokens as ninja's 
+        default parallelism) is acquired up front and ninja's parallelism is
+        limited to the acquired tokens (plus the implicit token).  Returns
+        (client, ninja options) where client is None when no tokens are held.
+    """
+    from . import jobserver
+    if ( jobserver.ninja_is_client() ):
+        printer.debug( '# jobserver: ninja is a jobserver client' )
+        printer.event( 'jobserver', mode='ninja', auth=jobserver.get_auth() )
+        return None, ''
+
+    client = jobserver.connect()
+    if ( client == None ):
+        return None, ''
+    share  = jobserver.fair_share()
+    tokens = client.try_acquire( (share if share != None else (os.cpu_count() or 1) + 2) - 1 )
+    printer.debug( f'# jobserver: acquired {tokens} token(s)' )
+    printer.event( 'jobserver', mode='tokens', auth=client.auth, jobs=tokens+1 )
+    return client, f' -j {tokens+1}'
+
+#-----------------------------------------------------------------------------
+def _strip_launcher_from_compdb( fname, launcher ):
+    """ Removes the compiler launcher (e.g. ccache) from the commands in a
+        compile_commands.json file, i.e. tools (clangd, etc.) see the actual
+        compiler
+    """
+    import json
+    with open( fname, 'r' ) as fd:
+        entries = json.load( fd )
+    for e in entries:
+        if ( e.get('command','').startswith( launcher + ' ' ) ):
+            e['command'] = e['command'][len(launcher)+1:].lstrip()
+    with open( fname, 'w' ) as fd:
+        json.dump( entries, fd, indent=2 )
+
+def _start_profiler( arguments ):
+    if ( not arguments['--profile'] ):
+        return None
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def _stop_profiler( printer, arguments, profiler, variant ):
+    if ( profiler == None ):
+        return
+    profiler.disable()
+
+    # Note: the file name is relative to the project directory (and is per variant when building all variants)
+    fname = os.path.join( NQBP_PRJ_DIR(), arguments['--profile'] )
+    if ( arguments['--bld-all'] ):
+        fname = f"{fname}.{variant}"
+    profiler.dump_stats( fname )
+    printer.event( 'profile', variant=variant, file=fname )
+
+def _report_ninja_edges( printer, toolchain, log_offset ):
+    """ Emits the edges that ninja executed (from the .ninja_log). Objects and
+        archives are summarized, every other edge (i.e. the link and post-link
+        steps) is reported individually.
+    """
+    entries  = utils.read_ninja_log( '.ninja_log', log_offset )
+    objext   = '.' + toolchain._obj_ext
+    compiled = [e for e in entries if e[3].endswith( objext )]
+    archived = [e for e in entries if e[3].endswith( toolchain._ar_library_name )]
+    for start, end, mtime, output in entries:
+        if ( not output.endswith( objext ) and not output.endswith( toolchain._ar_library_name ) ):
+            printer.event( 'edge', output=output, start_ms=start, end_ms=end, elapsed_ms=end-start )
+    total, objects = _count_ninja_edges( objext )
+    printer.event( 'ninja_edges', edges=len(entries), total=total, objects=objects,
+                   compiled=len(compiled), compile_ms=sum( e[1]-e[0] for e in compiled ),
+                   archived=len(archived), archive_ms=sum( e[1]-e[0] for e in archived ),
+                   peak_parallel=utils.peak_concurrency( [ (e[0], e[1]) for e in entries ] ) )
+
+def _count_ninja_edges( objext ):
+    """ Returns the number of (non-phony) edges and the number of compile edges
+        (i.e. edges with an object file output) in the ninja file
+    """
+    total   = 0
+    objects = 0
+    with open( ninja_fname, 'r' ) as fd:
+        for line in fd:
+            if ( line.startswith( 'build ' ) ):
+                outputs, _, rule = line[6:].partition( ': ' )
+                if ( rule.startswith( 'phony' ) ):
+                    continue
+                total += 1
+                if ( outputs.split( ' | ' )[0].rstrip().endswith( objext ) ):
+                    objects += 1
+    return ( total, objects )
+
+def explain_report( printer, lines, built, max_rows=20 ):
+    from . import explain
+    causes = explain.summarize( lines, explain.read_build_inputs( ninja_fname ), built )
+    total  = sum( c['edges'] for c in causes )
+    printer.event( 'explain', edges=total, causes=[ { 'kind': c['kind'], 'cause': c['cause'], 'edges': c['edges'] } for c in causes ] )
+
+    printer.output( f"= Rebuild explanation: {total} dirty edge(s)" )
+    if ( total == 0 ):
+        return
+    printer.output( f"  {'Edges':>6}  {'Kind':<8} Cause" )
+    for c in causes[:max_rows]:
+        cause = c['cause']
+        if ( c['kind'] in ('header', 'input') ):
+            cause = os.path.abspath( cause )
+        if ( cause.startswith( NQBP_PKG_ROOT() + os.sep ) ):
+            cause = cause[len(NQBP_PKG_ROOT())+1:]
+        printer.output( f"  {c['edges']:6d}  {c['kind']:<8} {cause}" )
+        for o in c['outputs']:
+            printer.verbose( f"          {'':<8}   {o}" )
+    if ( len(causes) > max_rows ):
+        printer.output( f"  ... {len(causes)-max_rows} more cause(s)" )
+
+def time_trace_report( printer, toolchain, log_offset, max_rows=15 ):
+    # Note: Only the translation units compiled by this build are reported (the profiles of previous builds are stale)
+    from . import timetrace
+    compiled = [ e[3] for e in utils.read_ninja_log( '.ninja_log', log_offset ) ]
+    report   = timetrace.collect( '.', toolchain._time_trace_style, toolchain._obj_ext, compiled )
+    fname  = 'time_trace.json'
+    import json
+    with open( fname, 'w' ) as fd:
+        json.dump( report, fd, indent=1 )
+    printer.event( 'time_trace', file=os.path.abspath( fname ), translation_units=report['translation_units'], 
+                   frontend=report['frontend'], backend=report['backend'], total=report['total'] )
+
+    total = max( report['total'], 0.000001 )
+    printer.output( f"= Compile time profile: {report['translation_units']} translation units (compiled by this build), total {report['total']:.2f} sec" )
+    printer.output( f"  Front-end: {report['frontend']:8.2f} sec ({report['frontend']*100/total:3.0f}%)" )
+    printer.output( f"  Back-end:  {report['backend']:8.2f} sec ({report['backend']*100/total:3.0f}%)" )
+    _time_trace_table( printer, 'Slowest translation units', [ (u['total'], None, u['object']) for u in report['units'] ], max_rows )
+    _time_trace_table( printer, 'Most expensive headers', [ (e['seconds'], e['tus'], e['name']) for e in report['headers'] ], max_rows )
+    _time_trace_table( printer, 'Most expensive template instantiations', [ (e['seconds'], e['tus'], e['name']) for e in report['templates'] ], max_rows )
+    _time_trace_table( printer, 'Most expensive compiler passes', [ (e['seconds'], e['tus'], e['name']) for e in report['passes'] ], max_rows )
+    printer.output( f"= Full report: {os.path.abspath(fname)}" )
+
+def _time_trace_table( printer, title, rows, max_rows ):
+    if ( len(rows) == 0 ):
+        return
+    printer.output( f"  {title}:" )
+    printer.output( f"    {'Time(s)':>8} {'TUs':>5}  Name" )
+    for seconds, tus, name in rows[:max_rows]:
+        if ( name.startswith( NQBP_PKG_ROOT() + os.sep ) ):
+            name = name[len(NQBP_PKG_ROOT())+1:]
+        printer.output( "    {:8.2f} {:>5}  {}".format( seconds, '' if tus == None else tus, name ) )
+
+#-----------------------------------------------------------------------------
+def header_cost_report( printer, vardir, max_rows=40 ):
+    from . import deps
+    if ( not os.path.isfile( os.path.join( vardir, deps.NINJA_DEPS_LOG ) ) ):
+        sys.exit( f"ERROR: No dependency information - build the project first ({vardir})" )
+
+    # Save the full report (the console only shows the most expensive headers)
+    costs = deps.header_costs( vardir )
+    objs  = deps.get_index( vardir )['sources']
+    times = deps.compile_times( vardir )
+    ntus  = len( objs )
+    total = sum( times.get( o, 0 ) for o in objs )
+    fname = os.path.join( vardir, 'header_costs.json' )
+    import json
+    with open( fname, 'w' ) as fd:
+        json.dump( { 'translation_units': ntus, 'total_compile_ms': total, 'headers': costs }, fd, indent=1 )
+
+    printer.output( f"= Header cost ranking: {ntus} translation units, total compile time {total/1000:.1f} sec" )
+    printer.output( f"  {'Cost(s)':>8} {'TUs':>5} {'TU%':>5} {'Avg(ms)':>8} {'PCH':>4}  Header" )
+    for c in costs[:max_rows]:
+        hdr = c['header']
+        if ( hdr.startswith( NQBP_PKG_ROOT() + os.sep ) ):
+            hdr = hdr[len(NQBP_PKG_ROOT())+1:]
+        printer.output( "  {:8.2f} {:5d} {:5.0f} {:8d} {:>4}  {}".format( c['cost_ms']/1000, c['tus'], c['ratio']*100, c['avg_ms'], 'yes' if c['pch'] else '', hdr ) )
+    printer.output( f"= Full report: {os.path.abspath(fname)}" )
+
 #-----------------------------------------------------------------------------
 def pre_build_steps(printer, toolchain, arguments ):
 
@@ -329,7 +749,7 @@ def end_banner(printer, toolchain):
 
     
 #-----------------------------------------------------------------------------
-def build_single_directory( printer, arguments, toolchain, dir, entry, pkg_root, work_root, pkgs_dirname, prj_dirname, preprocess_script, variant, dbg_opt, preprocess_args ):
+def build_single_directory( printer, arguments, toolchain, dir, entry, pkg_root, work_root, pkgs_dirname, prj_dirname, preprocess_script, variant, dbg_opt, preprocess_args, store=None ):
    
     srcpath, display, dir = utils.derive_src_path( pkg_root, work_root, pkgs_dirname, entry, dir )
 
@@ -352,6 +772,17 @@ def build_single_directory( printer, arguments, toolchain, dir, entry, pkg_root,
     # Get/Construct the source file list and filter it (if needed) for the specified directory
     files = utils.get_and_filter_files_to_build( printer, toolchain, dir, srcpath, NQBP_NAME_SOURCES() )
     
+    # Link the prebuilt archive (if there is one) instead of compiling the directory
+    key = None
+    if ( store != None and entry == 'xpkg' and len(files) > 0 ):
+        key      = store.key( srcpath, files )
+        prebuilt = store.restore( key, dir[0] )
+        if ( prebuilt != None ):
+            toolchain._ninja_writer.newline()
+            toolchain._ninja_writer.comment( f"Directory: {srcpath} (prebuilt)" )
+            toolchain._ninja_writer.newline()
+            return prebuilt
+
     toolchain._ninja_writer.newline()
     toolchain._ninja_writer.comment( f"Directory: {srcpath}" )
     toolchain._ninja_writer.newline()
@@ -363,5 +794,7 @@ def build_single_directory( printer, arguments, toolchain, dir, entry, pkg_root,
 
     # build archive
     builtlib = toolchain.ar( arguments, objfiles, dir[0]  )
+    if ( key != None ):
+        store.add( key, dir[0], builtlib, objfiles )
     return (builtlib, objfiles)
         
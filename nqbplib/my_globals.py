@@ -2,7 +2,6 @@
 """ Global variables """
 
 import os
-import logging
     
 # Globals
 _NQBP_WORK_ROOT               = ''
@@ -12,8 +11,12 @@ _NQBP_XPKG_ROOT               = ''
 _NQBP_PRE_PROCESS_SCRIPT      = None
 _NQBP_PRE_PROCESS_SCRIPT_ARGS = ''
 
-# Initialize globals
-OUT = logging.getLogger( 'nqbp' )
+# Initialize globals (Note: the logger is created on demand to keep the start-up time of nqbp.py down)
+def __getattr__( name ):
+    if ( name == 'OUT' ):
+        import logging
+        return logging.getLogger( 'nqbp' )
+    raise AttributeError( f"module {__name__!r} has no attribute {name!r}" )
 
 #
 def NQBP_VERSION():
@@ -72,6 +75,16 @@ def NQBP_XPKGS_ROOT( newval=None):
 def NQBP_PKG_NAME():
     return NQBP_PKG_ROOT().replace( NQBP_WORK_ROOT(), "" )
 #
+def NQBP_CACHE_ROOT():
+    """ Directory for NQBP's persistent caches (e.g. validated compilers). Can
+        be overridden by setting the NQBP_CACHE_ROOT environment variable.
+    """
+    root = os.environ.get('NQBP_CACHE_ROOT')
+    if ( root == None ):
+        root = os.path.join( NQBP_WORK_ROOT(), '.nqbp' )
+    return root
+
+#
 def NQBP_PRE_PROCESS_SCRIPT( newval=None ):
     global _NQBP_PRE_PROCESS_SCRIPT
     if ( newval != None ):
@@ -2,12 +2,15 @@
 """Output class"""
 
 import os
+import time
 
 
 class Printer:
     def __init__(self ):
         self.verbose_on = False
         self.debug_on = False
+        self._events = None
+        self._listeners = []
 
     def output(self,line):
         print(line)
@@ -19,11 +22,71 @@ class Printer:
     def debug(self, line):
         if (self.debug_on):
             self.output(line)
-    
+
     def enable_debug(self):
         self.debug_on = True
-    
+
     def enable_verbose(self):
         self.verbose_on = True
-    
 
+    #--------------------------------------------------------------------------
+    def enable_events(self, fname):
+        """ Enables the structured event stream, i.e. one JSON object per line
+            written to 'fname'
+        """
+        try:
+            self._events = open( fname, 'w' )
+        except Exception as e:
+            self.output( f"ERROR: Unable to open the event stream file: {fname} [{e}]" )
+            raise SystemExit(1)
+
+    def add_event_listener(self, listener):
+        """ Enables the event stream with a callback, i.e. 'listener(record)'
+            is called with each event (a dictionary)
+        """
+        self._listeners.append( listener )
+
+    def events_enabled(self):
+        return self._events != None or len(self._listeners) > 0
+
+    def event(self, name, **fields):
+        """ Writes a single event to the event stream (does nothing if the
+            event stream has not been enabled)
+        """
+        if ( self.events_enabled() ):
+            record = { 'ts': round( time.time(), 6 ), 'event': name }
+            record.update( fields )
+            for listener in self._listeners:
+                listener( record )
+            if ( self._events != None ):
+                import json
+                self._events.write( json.dumps( record ) + '\n' )
+                self._events.flush()
+
+    def phase(self, name, **fields):
+        """ Returns a context manager that emits a 'phase' event (with the start
+            time and elapsed time) when the 'with' block completes
+        """
+        return _Phase( self, name, fields )
+
+    def phase_done(self, name, start, **fields):
+        """ Emits a 'phase' event for a phase that started at 'start' and has
+            just completed
+        """
+        self.event( 'phase', phase=name, start=round( start, 6 ), elapsed=round( time.time() - start, 6 ), **fields )
+
+
+class _Phase:
+    def __init__(self, printer, name, fields):
+        self._printer = printer
+        self._name    = name
+        self._fields  = fields
+
+    def __enter__(self):
+        self._start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        status = 'ok' if exc_type == None or (exc_type == SystemExit and not exc_value.code) else 'failed'
+        self._printer.phase_done( self._name, self._start, status=status, **self._fields )
+        return False
@@ -0,0 +1,310 @@
+#!/usr/bin/python3
+"""Raspberry Pi pico-sdk component resolver
+
+The pico-sdk describes each of its components (e.g. 'pico_time',
+'hardware_gpio') in the CMakeLists.txt file of the component's directory:
+the component's include directories, its LIB_xxx define, and the components it
+depends on (target_link_libraries).  These helpers read that metadata (once,
+the result is cached in the NQBP_CACHE_ROOT directory) and compute the
+transitive set of include paths and defines for the SDK directories that a
+project actually lists in its libdirs.b file, i.e. instead of every translation
+unit being compiled with the include paths/defines of ALL SDK components.
+
+Note: The CMake files are NOT evaluated, i.e. only the commands/macros listed
+      below are understood and conditional statements are ignored (which
+      errs on the side of adding an include path/define).
+"""
+
+import os
+import re
+
+#
+from . import base
+from . import utils
+from .my_globals import NQBP_PKG_ROOT
+from .my_globals import NQBP_WORK_ROOT
+from .my_globals import NQBP_WRKPKGS_DIRNAME
+
+# SDK source directories that contain components (the platform directory, e.g. 'rp2040', is added)
+COMPONENT_ROOTS = ( 'common', 'rp2_common' )
+
+# Paths of the SDK's 'well known' CMake variables (relative to the SDK root)
+SDK_PATH_VARIABLES = { 'PICO_SDK_PATH':          '',
+                       'PICO_TINYUSB_PATH':      os.path.join( 'lib', 'tinyusb' ),
+                       'PICO_CYW43_DRIVER_PATH': os.path.join( 'lib', 'cyw43-driver' ),
+                       'PICO_LWIP_PATH':         os.path.join( 'lib', 'lwip' ),
+                       'PICO_BTSTACK_PATH':      os.path.join( 'lib', 'btstack' ),
+                       'PICO_MBEDTLS_PATH':      os.path.join( 'lib', 'mbedtls' ) }
+
+# CMake keywords that are skipped in the argument lists
+_KEYWORDS = ( 'INTERFACE', 'PUBLIC', 'PRIVATE', 'SYSTEM', 'BEFORE', 'AFTER', 'NOFLAG' )
+
+_COMMAND_REGEX  = re.compile( r'^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*\(', re.MULTILINE )
+_VARIABLE_REGEX = re.compile( r'\$\{([A-Za-z0-9_]+)\}' )
+
+# Bump when the format of the cached metadata changes
+_CACHE_VERSION = 1
+
+
+#-----------------------------------------------------------------------------
+def get_components( sdk_root, platform, refresh=False ):
+    """ Returns the SDK component metadata for 'platform' (e.g. 'rp2040'), i.e.
+        a dictionary of target name -> { 'dir', 'inc', 'defines', 'deps' }.
+        The metadata is cached and only re-read when a CMakeLists.txt file has
+        changed.
+    """
+    sdk_root = os.path.abspath( sdk_root )
+    files    = _find_cmake_files( sdk_root, platform )
+    key      = utils.hash_string( '|'.join( f"{f}:{_stat_key(f)}" for f in files ) )
+    cfile    = os.path.join( 'picosdk', utils.hash_string( f"{sdk_root}|{platform}" ) + '.json' )
+    if ( not refresh ):
+        cached = utils.read_cache_file( cfile )
+        if ( cached != None and cached.get('version') == _CACHE_VERSION and cached.get('key') == key ):
+            return cached['targets']
+
+    targets = {}
+    for f in files:
+        _parse_cmake_file( f, sdk_root, platform, targets )
+    utils.write_cache_file( cfile, { 'version': _CACHE_VERSION, 'key': key, 'targets': targets } )
+    return targets
+
+def find_roots( components, sdk_root, dirs ):
+    """ Returns the list (in order) of the components that are defined in the
+        SDK directories 'dirs' (or one of their parent directories).
+        Directories outside of the SDK's source tree are ignored.
+    """
+    srcdir = os.path.join( os.path.abspath( sdk_root ), 'src' )
+    bydir  = {}
+    for name, t in components.items():
+        if ( t['dir'] != None ):
+            bydir.setdefault( t['dir'], [] ).append( name )
+
+    roots = []
+    for d in dirs:
+        d = os.path.normpath( os.path.abspath( d ) )
+        while ( d.startswith( srcdir + os.sep ) and d not in bydir ):
+            d = os.path.dirname( d )
+        names = bydir.get( d, [] )
+
+        # Prefer the 'implementation' targets (the _headers targets are pulled in via their dependencies)
+        impls = [n for n in names if not n.endswith( '_headers' )]
+        for n in sorted( impls if impls else names ):
+            if ( n not in roots ):
+                roots.append( n )
+    return roots
+
+def resolve( components, roots ):
+    """ Returns (include paths, defines) for the transitive closure of the
+        'roots' components.  The order is a depth first (pre-order) walk of
+        the dependencies, i.e. stable and the 'roots' include paths are first.
+    """
+    inc     = []
+    defines = []
+    visited = set()
+    pending = list( reversed( roots ) )
+    while ( pending ):
+        name = pending.pop()
+        if ( name in visited or name not in components ):
+            continue
+        visited.add( name )
+        t = components[name]
+        for i in t['inc']:
+            if ( i not in inc ):
+                inc.append( i )
+        for d in t['defines']:
+            if ( d not in defines ):
+                defines.append( d )
+        pending.extend( reversed( t['deps'] ) )
+    return inc, defines
+
+def static_includes( inc, sdk_root, platform ):
+    """ Returns the '-I' tokens in 'inc' that are include paths of SDK
+        components (i.e. the paths that resolve() computes)
+    """
+    roots  = [ os.path.normpath( os.path.join( sdk_root, 'src', r ) ) + os.sep for r in COMPONENT_ROOTS + ( platform, ) ]
+    result = []
+    for t in base.tokenize_options( inc ):
+        if ( t.startswith( '-I' ) and os.path.normpath( t[2:] ).startswith( tuple(roots) ) ):
+            result.append( t )
+    return result
+
+#-----------------------------------------------------------------------------
+def resolve_build_values( toolchain, arguments, bld_var, build_values, sdk_root, platform, static_inc, static_defines, extra=None ):
+    """ Replaces the static SDK include paths/defines in 'build_values' with
+        the include paths/defines of the SDK components referenced by the
+        project's libdirs.b file (plus the 'extra' list of component names).
+        The build values are returned unchanged if the SDK metadata can not
+        be found.
+    """
+    printer    = toolchain._printer
+    components = get_components( sdk_root, platform )
+    if ( len(components) == 0 ):
+        printer.output( f"WARNING: No pico-sdk component metadata found in: {sdk_root} (using the static include paths/defines)" )
+        return build_values
+
+    libdirs, _ = toolchain.read_libdirs( arguments, bld_var )
+    dirs       = [ utils.derive_src_path( NQBP_PKG_ROOT(), NQBP_WORK_ROOT(), NQBP_WRKPKGS_DIRNAME(), e, d )[0] for d, e in libdirs ]
+    roots      = find_roots( components, sdk_root, dirs ) + list( extra if extra else [] )
+    inc, defs  = resolve( components, roots )
+    printer.debug( f"# pico-sdk components: {len(roots)} referenced, {len(inc)} include paths (static: {len(static_inc)}), {len(defs)} defines (static: {len(static_defines)})" )
+    return apply( build_values, static_inc, static_defines, inc, defs )
+
+#-----------------------------------------------------------------------------
+def apply( build_values, static_inc, static_defines, inc, defines ):
+    """ Replaces the 'static_inc' include tokens and 'static_defines' define
+        tokens in 'build_values' (inc, asminc, cflags, and asmflags fields)
+        with the resolved include paths and defines.  The resolved values are
+        inserted at the position of the first static token.
+    """
+    inc_tokens = [ '-I' + i for i in inc ]
+    def_tokens = [ '-D' + d for d in defines ]
+    for field, static, resolved in ( ('inc', static_inc, inc_tokens), ('asminc', static_inc, inc_tokens),
+                                     ('cflags', static_defines, def_tokens), ('asmflags', static_defines, def_tokens) ):
+        static = set( static )
+        tokens = []
+        added  = False
+        for t in build_values.get_tokens( field ):
+            if ( t not in static ):
+                tokens.append( t )
+            elif ( not added ):
+                tokens.extend( resolved )
+                added = True
+        build_values.set_tokens( field, tokens )
+    return build_values
+
+#-----------------------------------------------------------------------------
+class ResolverMixin:
+    """ Adds the component resolver to a pico-sdk toolchain.  Must precede
+        base.ToolChain in the toolchain's base classes, and the toolchain's
+        constructor must call init_sdk_resolver() after its build values have
+        been set.
+    """
+    def init_sdk_resolver( self, sdk_root, platform, sdk_libopts ):
+        """ 'sdk_libopts' are the static LIB_xxx defines of ALL components """
+        self._sdk_root           = sdk_root
+        self._sdk_platform       = platform
+        self._sdk_static_inc     = static_includes( self._base_release.inc, sdk_root, platform )
+        self._sdk_static_defines = base.tokenize_options( sdk_libopts )
+        self._sdk_base_release   = None
+        self.set_sdk_resolver( os.environ.get('NQBP_PICO_SDK_RESOLVER','0') == '1' )
+
+    def set_sdk_resolver( self, enabled, components=None ):
+        """ When enabled, the pico-sdk include paths and LIB_xxx defines are 
+            derived from the SDK directories listed in the libdirs.b file (plus
+            the optional list of SDK component names, e.g. 'hardware_adc' for
+            a header only usage) instead of the static list of ALL components.
+        """
+        self._sdk_resolver   = enabled
+        self._sdk_components = components if components != None else []
+
+    def pre_build( self, bld_var, arguments ):
+        if ( self._sdk_resolver and not arguments['--clean-all'] ):
+            if ( self._sdk_base_release == None ):
+                self._sdk_base_release = self._base_release.copy()
+
+            # Note: The build variant dictionaries reference self._base_release, i.e. it must be updated in place
+            for f in base.BuildValues.FIELDS:
+                self._base_release.set_tokens( f, self._sdk_base_release.get_tokens( f ) )
+            resolve_build_values( self, arguments, bld_var, self._base_release, self._sdk_root, self._sdk_platform, 
+                                  self._sdk_static_inc, self._sdk_static_defines, self._sdk_components )
+        super().pre_build( bld_var, arguments )
+
+#-----------------------------------------------------------------------------
+def _find_cmake_files( sdk_root, platform ):
+    files = []
+    for root in COMPONENT_ROOTS + ( platform, ):
+        for dirpath, dirs, fnames in os.walk( os.path.join( sdk_root, 'src', root ) ):
+            dirs.sort()
+            if ( 'CMakeLists.txt' in fnames ):
+                files.append( os.path.join( dirpath, 'CMakeLists.txt' ) )
+    return files
+
+def _stat_key( fname ):
+    st = os.stat( fname )
+    return f"{st.st_mtime_ns}|{st.st_size}"
+
+def _parse_cmake_file( fname, sdk_root, platform, targets ):
+    with open( fname, 'r', errors='replace' ) as fd:
+        text = re.sub( r'(?m)#.*$', '', fd.read() )
+
+    cdir      = os.path.dirname( fname )
+    variables = { 'CMAKE_CURRENT_LIST_DIR': cdir, 'CMAKE_CURRENT_SOURCE_DIR': cdir, 'PICO_PLATFORM': platform }
+    for name, path in SDK_PATH_VARIABLES.items():
+        variables[name] = os.path.join( sdk_root, path ) if path else sdk_root
+
+    for cmd, args in _commands( text ):
+        args = [ _expand( a, variables ) for a in args ]
+        if ( len(args) == 0 or args[0] == None ):
+            continue
+        name = args[0]
+        rest = [ a for a in args[1:] if a != None and a not in _KEYWORDS ]
+
+        if ( cmd == 'set' and len(rest) == 1 and name not in variables ):
+            variables[name] = rest[0]
+        elif ( cmd in ( 'pico_add_library', 'pico_add_impl_library' ) ):
+            t = _target( targets, name, cdir, True )
+            if ( 'NOFLAG' not in args ):
+                _add( t['defines'], f"LIB_{name.upper()}=1" )
+            if ( cmd == 'pico_add_library' ):
+                _target( targets, name + '_headers', cdir, True )
+                _add( t['deps'], name + '_headers' )
+        elif ( cmd in ( 'pico_simple_hardware_target', 'pico_simple_hardware_headers_target',
+                        'pico_simple_hardware_headers_only_target', 'pico_simple_hardware_impl_target' ) ):
+            hdrs = _target( targets, f"hardware_{name}_headers", cdir, True )
+            _add( hdrs['inc'], os.path.join( cdir, 'include' ) )
+            for d in ( 'pico_base_headers', 'hardware_structs', 'hardware_claim_headers' ):
+                _add( hdrs['deps'], d )
+            if ( cmd != 'pico_simple_hardware_headers_target' ):
+                t = _target( targets, f"hardware_{name}", cdir, True )
+                _add( t['deps'], f"hardware_{name}_headers" )
+                if ( cmd != 'pico_simple_hardware_headers_only_target' ):
+                    _add( t['deps'], 'hardware_claim' )
+        elif ( cmd == 'add_library' ):
+            _target( targets, name, cdir, True )
+        elif ( cmd == 'target_include_directories' ):
+            t = _target( targets, name, cdir )
+            for i in rest:
+                _add( t['inc'], os.path.normpath( i if os.path.isabs( i ) else os.path.join( cdir, i ) ) )
+        elif ( cmd == 'target_compile_definitions' ):
+            t = _target( targets, name, cdir )
+            for d in rest:
+                _add( t['defines'], d )
+        elif ( cmd in ( 'target_link_libraries', 'pico_mirrored_target_link_libraries' ) ):
+            t = _target( targets, name, cdir )
+            for d in rest:
+                _add( t['deps'], d )
+            if ( cmd == 'pico_mirrored_target_link_libraries' ):
+                t = _target( targets, name + '_headers', cdir )
+                for d in rest:
+                    _add( t['deps'], d + '_headers' )
+
+def _commands( text ):
+    """ Returns a list of (command, argument list) """
+    result = []
+    for m in _COMMAND_REGEX.finditer( text ):
+        depth = 1
+        idx   = m.end()
+        while ( idx < len(text) and depth > 0 ):
+            depth += 1 if text[idx] == '(' else -1 if text[idx] == ')' else 0
+            idx   += 1
+        args = [ a.strip( '"' ) for a in re.findall( r'"[^"]*"|[^\s]+', text[m.end():idx-1] ) ]
+        result.append( (m.group(1).lower(), args) )
+    return result
+
+def _expand( arg, variables ):
+    # Generator expressions and unknown variables can not be evaluated
+    if ( '$<' in arg or '(' in arg or ')' in arg ):
+        return None
+    arg = _VARIABLE_REGEX.sub( lambda m: variables.get( m.group(1), '${' + m.group(1) + '}' ), arg )
+    return None if '${' in arg else arg
+
+def _target( targets, name, cdir, define=False ):
+    # The first definition of a target determines its directory (a target can be referenced before it is defined)
+    t = targets.setdefault( name, { 'dir': None, 'inc': [], 'defines': [], 'deps': [] } )
+    if ( define and t['dir'] == None ):
+        t['dir'] = cdir
+    return t
+
+def _add( lst, item ):
+    if ( item not in lst ):
+        lst.append( item )
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+"""Build stamps, i.e. a record of the inputs of a successful build
+
+When the NQBP_STAMP_FILE environment variable is set, nqbp.py writes a stamp
+file after a successful build.  The stamp records the signature (timestamp and
+size) of every input of the build:
+
+    - the project directory and each directory of the expanded libdirs.b
+      closure (i.e. the list of files in the directory, which detects new and
+      deleted source files)
+    - the libdirs.b files of the closure
+    - the header files that the object files depend on (ninja deps log)
+    - the compiler identity, the NQBP scripts, and the NQBP_xxx/PATH
+      environment variables (except the per-run variables, e.g. the
+      jobserver share and the event stream file)
+    - the build outputs (build.ninja and the final output of each variant)
+
+A build tool (e.g. bob) can skip running nqbp.py when the stamp is current,
+i.e. none of the inputs changed since the last successful build with the same
+options.
+"""
+
+import os
+import sys
+
+#
+from . import utils
+from . import deps
+from . import jobserver
+from .my_globals import NQBP_PKG_ROOT
+from .my_globals import NQBP_WORK_ROOT
+from .my_globals import NQBP_WRKPKGS_DIRNAME
+
+# Environment variable with the name of the stamp file to write
+STAMP_ENV = 'NQBP_STAMP_FILE'
+
+# Per-run plumbing variables (set by the parent process for each run), i.e. they do not affect the build's outputs
+RUN_ENV = ( STAMP_ENV, 'NQBP_EVENTS_FILE', 'NQBP_JOBSERVER', jobserver.SHARE_ENV )
+
+# Change when the stamp format changes
+_STAMP_VERSION = 1
+
+
+#-----------------------------------------------------------------------------
+class Recorder:
+    """ Collects the inputs of the variants built by a single nqbp.py
+        invocation.  add_variant() is called after each successful variant
+        build (with the build variant directory as the current directory)
+    """
+    def __init__( self, fname, prjdir ):
+        self.fname  = fname
+        self.files  = set()
+        self.dirs   = set( [prjdir] )
+        self.extra  = {}
+
+    def add_variant( self, toolchain, variant ):
+        # NQBP itself (and the toolchain)
+        self.dirs.add( os.path.dirname( os.path.abspath( __file__ ) ) )
+        module = sys.modules.get( type(toolchain).__module__ )
+        if ( getattr( module, '__file__', None ) ):
+            self.dirs.add( os.path.dirname( os.path.abspath( module.__file__ ) ) )
+
+        # The libdirs.b closure
+        self.files.update( os.path.abspath( f ) for f in toolchain.libdirs_files )
+        for d in toolchain.libdirs:
+            srcpath, _, _ = utils.derive_src_path( NQBP_PKG_ROOT(), NQBP_WORK_ROOT(), NQBP_WRKPKGS_DIRNAME(), d[1], d[0] )
+            self.dirs.add( os.path.abspath( srcpath ) )
+        for output, inputs in deps.read_ninja_deps( deps.NINJA_DEPS_LOG ).items():
+            self.files.update( os.path.abspath( i ) for i in inputs )
+        self.files.add( os.path.abspath( 'build.ninja' ) )
+        self.files.add( os.path.abspath( toolchain.get_final_output_name() ) )
+        self.extra[variant] = str( toolchain._validate_cc_cache_key() )
+
+    def write( self, argv ):
+        if ( len(self.extra) == 0 ):
+            return      # Nothing was built
+        stamp = { 'version': _STAMP_VERSION,
+                  'argv':    argv,
+                  'env':     environment(),
+                  'extra':   self.extra,
+                  'files':   { f: file_signature( f ) for f in sorted( self.files ) },
+                  'dirs':    { d: dir_signature( d ) for d in sorted( self.dirs ) } }
+        utils.write_cache_file( self.fname, stamp )
+
+#-----------------------------------------------------------------------------
+def recorder( prjdir ):
+    """ Returns a Recorder when a stamp file was requested, else None.  The
+        request is removed from the environment, i.e. nested builds (e.g.
+        from a pre-processing script) do not write the stamp
+    """
+    fname = os.environ.pop( STAMP_ENV, None )
+    return Recorder( os.path.abspath( fname ), prjdir ) if fname else None
+
+def is_current( fname ):
+    """ Returns True if the stamp file exists and none of the recorded inputs
+        have changed
+    """
+    stamp = utils.read_cache_file( os.path.abspath( fname ) )
+    if ( stamp == None or stamp.get( 'version' ) != _STAMP_VERSION or stamp.get( 'env' ) != environment() ):
+        return False
+    for f, sig in stamp['files'].items():
+        if ( file_signature( f ) != sig ):
+            return False
+    for d, sig in stamp['dirs'].items():
+        if ( dir_signature( d ) != sig ):
+            return False
+    return True
+
+def environment():
+    """ Returns the environment variables that can affect a build """
+    return { k: v for k, v in sorted( os.environ.items() ) if ( k.startswith( 'NQBP_' ) and k not in RUN_ENV ) or k == 'PATH' }
+
+def file_signature( fname ):
+    try:
+        st = os.stat( fname )
+        return [ st.st_mtime_ns, st.st_size ]
+    except OSError:
+        return None
+
+def dir_signature( dirname ):
+    """ Returns the hash of the names/signatures of the files in 'dirname'
+        (not recursive)
+    """
+    try:
+        entries = [ f"{e.name}|{e.stat().st_mtime_ns}|{e.stat().st_size}" for e in os.scandir( dirname ) if e.is_file() ]
+    except OSError:
+        return None
+    return utils.hash_string( '\n'.join( sorted( entries ) ) )
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+"""Compiler time profiling helpers (the --time-trace option)
+
+Aggregates the per translation unit compiler time profiles into a single
+report for a build variant directory:
+
+    clang   -ftime-trace writes a Chrome trace file (<objfile-base>.json) for
+            each translation unit.  Provides the time spent per header file
+            (inclusive), per template instantiation, and the front-end vs
+            back-end split.
+
+    gcc     -ftime-report writes a table of 'time variables' to stderr, which
+            the compile rule captures in <objfile>.ftr.  Provides the time
+            spent per compiler phase/pass (e.g. 'template instantiation') and
+            the front-end vs back-end split (GCC does not report per header).
+"""
+
+import os
+import json
+
+# GCC phases that make up the front-end (all other phases are back-end)
+GCC_FRONTEND_PHASES = ( 'phase setup', 'phase parsing', 'phase lang. deferred' )
+
+# Clang trace events
+CLANG_SOURCE_EVENT    = 'Source'
+CLANG_TEMPLATE_EVENTS = ( 'InstantiateClass', 'InstantiateFunction' )
+CLANG_FRONTEND_EVENT  = 'Frontend'
+CLANG_BACKEND_EVENT   = 'Backend'
+
+# Extension of the captured GCC report
+GCC_REPORT_EXT = '.ftr'
+
+
+#-----------------------------------------------------------------------------
+def parse_gcc_report( text ):
+    """ Parses the output of -ftime-report and returns a dictionary of
+        time-variable -> wall time (in seconds).  The 'TOTAL' entry is the
+        total time for the translation unit.
+    """
+    results = {}
+    started = False
+    for line in text.splitlines():
+        if ( line.startswith( 'Time variable' ) ):
+            started = True
+            continue
+        if ( not started or ':' not in line ):
+            continue
+        name, _, values = line.rpartition( ':' )
+        fields = values.replace( '(', ' ' ).replace( ')', ' ' ).replace( '%', ' ' ).split()
+
+        # Format is: usr (%) sys (%) wall (%) mem (%), i.e. the TOTAL line has no percentages
+        try:
+            wall = float( fields[2] if name.strip() == 'TOTAL' else fields[4] )
+        except (IndexError, ValueError):
+            continue
+        name = name.strip().lstrip( '|' )      # Nested time variables have a leading '|'
+        results[name] = results.get( name, 0.0 ) + wall
+    return results
+
+def parse_clang_trace( fname ):
+    """ Parses a -ftime-trace file and returns a dictionary with the keys:
+        'frontend', 'backend', 'total' (seconds), and 'headers', 'templates'
+        (dictionaries of name -> seconds)
+    """
+    with open( fname, 'r' ) as fd:
+        trace = json.load( fd )
+
+    result = { 'frontend': 0.0, 'backend': 0.0, 'total': 0.0, 'headers': {}, 'templates': {} }
+    for e in trace.get( 'traceEvents', [] ):
+        if ( e.get( 'ph' ) != 'X' ):
+            continue
+        name   = e.get( 'name', '' )
+        dur    = e.get( 'dur', 0 ) / 1000000.0
+        detail = e.get( 'args', {} ).get( 'detail' )
+        if ( name == CLANG_FRONTEND_EVENT ):
+            result['frontend'] += dur
+        elif ( name == CLANG_BACKEND_EVENT ):
+            result['backend'] += dur
+        elif ( name == 'ExecuteCompiler' ):
+            result['total'] += dur
+        elif ( name == CLANG_SOURCE_EVENT and detail ):
+            result['headers'][detail] = result['headers'].get( detail, 0.0 ) + dur
+        elif ( name in CLANG_TEMPLATE_EVENTS and detail ):
+            result['templates'][detail] = result['templates'].get( detail, 0.0 ) + dur
+    return result
+
+#-----------------------------------------------------------------------------
+def collect( vardir, style, obj_ext, objects=None ):
+    """ Aggregates the per translation unit profiles found in the build
+        variant directory 'vardir'.  When 'objects' is set (object file names
+        relative to 'vardir', e.g. the objects compiled by the current build)
+        only the profiles of those objects are included, i.e. profiles left
+        behind by previous builds are ignored.  Returns a dictionary with the
+        keys:
+            'style', 'translation_units', 'frontend', 'backend', 'total'
+            'units':     list of { 'object', 'frontend', 'backend', 'total' }
+            'headers':   list of { 'name', 'seconds', 'tus' }   (clang only)
+            'templates': list of { 'name', 'seconds', 'tus' }   (clang only)
+            'passes':    list of { 'name', 'seconds', 'tus' }   (gcc only)
+        Times are in seconds, and the lists are sorted most expensive first.
+    """
+    units   = []
+    buckets = { 'headers': {}, 'templates': {}, 'passes': {} }
+    if ( objects != None ):
+        objects = set( os.path.normpath( o ) for o in objects )
+    for obj, fname in _find_profiles( vardir, style, obj_ext ):
+        if ( objects != None and os.path.normpath( obj ) not in objects ):
+            continue
+        try:
+            if ( style == 'clang' ):
+                tu = parse_clang_trace( fname )
+                _accumulate( buckets['headers'], tu['headers'] )
+                _accumulate( buckets['templates'], tu['templates'] )
+                frontend, backend, total = tu['frontend'], tu['backend'], tu['total']
+            else:
+                with open( fname, 'r', errors='replace' ) as fd:
+                    tu = parse_gcc_report( fd.read() )
+                if ( len(tu) == 0 ):
+                    continue
+                total    = tu.pop( 'TOTAL', 0.0 )
+                frontend = sum( v for k, v in tu.items() if k in GCC_FRONTEND_PHASES )
+                backend  = sum( v for k, v in tu.items() if k.startswith( 'phase ' ) and k not in GCC_FRONTEND_PHASES )
+                _accumulate( buckets['passes'], { k: v for k, v in tu.items() if not k.startswith( 'phase ' ) } )
+        except (OSError, ValueError):
+            continue
+        units.append( { 'object': obj, 'frontend': round( frontend, 4 ), 'backend': round( backend, 4 ), 'total': round( total, 4 ) } )
+
+    units.sort( key=lambda u: u['total'], reverse=True )
+    result = { 'style':             style,
+               'translation_units': len(units),
+               'frontend':          round( sum( u['frontend'] for u in units ), 4 ),
+               'backend':           round( sum( u['backend'] for u in units ), 4 ),
+               'total':             round( sum( u['total'] for u in units ), 4 ),
+               'units':             units }
+    for key, bucket in buckets.items():
+        entries = [ { 'name': k, 'seconds': round( v[0], 4 ), 'tus': v[1] } for k, v in bucket.items() ]
+        entries.sort( key=lambda e: (e['seconds'], e['tus']), reverse=True )
+        result[key] = entries
+    return result
+
+#-----------------------------------------------------------------------------
+def _find_profiles( vardir, style, obj_ext ):
+    results = []
+    for dirpath, dirs, files in os.walk( vardir ):
+        for f in files:
+            if ( style == 'clang' ):
+                if ( f.endswith( '.json' ) and os.path.isfile( os.path.join( dirpath, f[:-5] + '.' + obj_ext ) ) ):
+                    results.append( (os.path.join( dirpath, f[:-5] + '.' + obj_ext ), os.path.join( dirpath, f )) )
+            elif ( f.endswith( '.' + obj_ext + GCC_REPORT_EXT ) ):
+                results.append( (os.path.join( dirpath, f[:-len(GCC_REPORT_EXT)] ), os.path.join( dirpath, f )) )
+    return [ (os.path.relpath( o, vardir ), p) for o, p in sorted( results ) ]
+
+def _accumulate( bucket, values ):
+    for k, v in values.items():
+        entry = bucket.setdefault( k, [0.0, 0] )
+        entry[0] += v
+        entry[1] += 1
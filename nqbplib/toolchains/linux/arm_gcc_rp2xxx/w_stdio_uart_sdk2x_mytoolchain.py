@@ -79,7 +79,8 @@ debug_release = BuildValues()       # Do NOT comment out this line
 
 release_opts = { 'user_base':base_release, 
                  'user_optimized':optimized_release, 
-                 'user_debug':debug_release
+                 'user_debug':debug_release,
+                 #'lto':'full'      # Enables link time optimization for the variant
                }
                
 
@@ -105,4 +106,5 @@ from nqbplib.toolchains.linux.arm_gcc_rp2xxx.w_stdio_uart_sdk2x import ToolChain
 def create():
     lscript  = 'STM32F413ZHTx_FLASH.ld'
     tc = ToolChain( FINAL_OUTPUT_NAME, prjdir, build_variants, NQBP_PKG_ROOT(), bsp_rel_root, "rp2350", "pico2_w", sdk_root, "pico", linkerscript )
+    #tc.set_sdk_resolver( True )    # Only uses the include paths/defines of the SDK components listed in libdirs.b
     return tc
@@ -77,7 +77,8 @@ debug_release = BuildValues()       # Do NOT comment out this line
 
 release_opts = { 'user_base':base_release, 
                  'user_optimized':optimzed_release, 
-                 'user_debug':debug_release
+                 'user_debug':debug_release,
+                 #'lto':'full'      # Enables link time optimization for the variant
                }
                
                
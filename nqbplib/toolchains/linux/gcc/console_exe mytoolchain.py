@@ -58,7 +58,8 @@ debug_release.cflags = '-D_MY_APP_DEBUG_SWITCH_'
 
 release_opts = { 'user_base':base_release, 
                  'user_optimized':optimzed_release, 
-                 'user_debug':debug_release
+                 'user_debug':debug_release,
+                 #'lto':'full'      # Enables link time optimization for the variant
                }
                
                
@@ -93,4 +94,5 @@ from nqbplib.toolchains.linux.gcc.console_exe import ToolChain
 # Function that instantiates an instance of the toolchain
 def create():
     tc = ToolChain( FINAL_OUTPUT_NAME, prjdir, build_variants, "release" )
+    #tc.set_launcher( 'ccache' )     # Optional compiler launcher (e.g. ccache, sccache, distcc, icecc)
     return tc 
@@ -29,6 +29,13 @@ class ToolChain( base.ToolChain ):
             self._ar       = os.path.join(gcc_bin, 'ar' )  
             self._objcpy   = os.path.join(gcc_bin, 'objcpy')
 
+        # Optional faster linker (mold, lld, gold, or auto) and number of linker threads
+        self.set_linker( os.environ.get('NQBP_GCC_LINKER'), os.environ.get('NQBP_GCC_LINKER_THREADS') )
+
+        # Optional split DWARF for debug builds (set the environment variable to '1' to enable)
+        self._split_dwarf_supported = True
+        self.set_split_dwarf( os.environ.get('NQBP_GCC_SPLIT_DWARF', '0') == '1' )
+
 
         #
         # Build Config/Variant: "xyz"
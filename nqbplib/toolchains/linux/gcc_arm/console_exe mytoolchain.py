@@ -58,7 +58,8 @@ debug_release.cflags = '-D_MY_APP_DEBUG_SWITCH_'
 
 release_opts = { 'user_base':base_release, 
                  'user_optimized':optimzed_release, 
-                 'user_debug':debug_release
+                 'user_debug':debug_release,
+                 #'lto':'full'      # Enables link time optimization for the variant
                }
                
                
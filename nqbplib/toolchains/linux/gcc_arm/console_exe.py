@@ -36,6 +36,13 @@ class ToolChain( base.ToolChain ):
             self._objcpy   = 'arm-linux-gnueabihf-objcpy'
 
 
+        # Optional faster linker (mold, lld, gold, or auto) and number of linker threads
+        self.set_linker( os.environ.get('NQBP_GCC-ARM_LINKER'), os.environ.get('NQBP_GCC-ARM_LINKER_THREADS') )
+
+        # Optional split DWARF for debug builds (set the environment variable to '1' to enable)
+        self._split_dwarf_supported = True
+        self.set_split_dwarf( os.environ.get('NQBP_GCC-ARM_SPLIT_DWARF', '0') == '1' )
+
 
         #
         # Build Config/Variant: "xyz"
@@ -15,9 +15,10 @@ import sys, os
 from nqbplib import base
 from nqbplib import utils
 from nqbplib import my_globals
+from nqbplib import picosdk
 
 
-class ToolChain( base.ToolChain ):
+class ToolChain( picosdk.ResolverMixin, base.ToolChain ):
 
     #--------------------------------------------------------------------------
     def __init__( self, exename, prjdir, build_variants, abs_repo_root, bsp_rel_path, 
@@ -171,7 +172,6 @@ class ToolChain( base.ToolChain ):
             ' -DLIB_PICO_TIME_ADAPTER=1' + \
             ' -DLIB_PICO_UNIQUE_ID=1' + \
             ' -DLIB_PICO_UTIL=1' + \
-            ' -DLIB_PICO_TIME_ADAPTER=1' + \
             ' -DLIB_PICO_STDIO_UART=1' + \
             ' -DLIB_PICO_STDIO_USB=0'
             
@@ -253,6 +253,9 @@ class ToolChain( base.ToolChain ):
         # Debug options, flags, etc.
         self._debug_release.cflags     = self._debug_release.cflags + r' -DDEBUG -DPICO_CMAKE_BUILD_TYPE=\"Debug\"'
         self._debug_release.linkflags  = self._debug_release.linkflags + ' -DDEBUG'
+
+        # pico-sdk component resolver (see picosdk.ResolverMixin.set_sdk_resolver())
+        self.init_sdk_resolver( abs_sdk_root, mcu_part_num, skd_libopts )
         
 
    #--------------------------------------------------------------------------
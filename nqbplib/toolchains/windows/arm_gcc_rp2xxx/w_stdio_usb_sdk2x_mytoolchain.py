@@ -111,4 +111,5 @@ from nqbplib.toolchains.windows.arm_gcc_rp2xxx.w_stdio_usb_sdk2x import ToolChai
 def create():
     lscript  = 'STM32F413ZHTx_FLASH.ld'
     tc = ToolChain( FINAL_OUTPUT_NAME, prjdir, build_variants, NQBP_PKG_ROOT(), bsp_rel_root, "rp2350", "pico2_w", sdk_root, "pico", linkerscript )
+    #tc.set_sdk_resolver( True )    # Only uses the include paths/defines of the SDK components listed in libdirs.b
     return tc
@@ -19,6 +19,9 @@ class ToolChain( base.ToolChain ):
         self._cc     = 'clang'
         self._ld     = 'clang'
         self._ar     = 'llvm-ar'
+        self._time_trace_style = 'clang'
+        self._lto_modes        = { 'full': ('-flto', '-flto'), 'thin': ('-flto=thin', '-flto=thin') }
+        self._lto_ar           = self._ar
         
         # more stuff to clean
         self._clean_list.extend( ['xml'] )
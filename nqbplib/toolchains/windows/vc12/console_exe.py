@@ -32,6 +32,8 @@ class ToolChain( base.ToolChain ):
         self._echo_asm = True
         
         self._validate_cc_options = ''
+        self._time_trace_style    = None
+        self._lto_modes           = {}
         
         self._cflag_symdef               = '/D '
         self._asmflag_symdef             = '/D '
@@ -2,11 +2,8 @@
 """Collection of helper functions"""
 
 import os
-import logging
 import sys
 import subprocess
-import pathlib
-import platform
 import collections
 import fnmatch
 import re
@@ -20,7 +17,7 @@ from .my_globals import NQBP_XPKGS_ROOT
 from .my_globals import NQBP_PRE_PROCESS_SCRIPT
 from .my_globals import NQBP_PRE_PROCESS_SCRIPT_ARGS
 from .my_globals import NQBP_WRKPKGS_DIRNAME
-from .my_globals import OUT
+from .my_globals import NQBP_CACHE_ROOT
 
 # Module globals
 _dirstack = []
@@ -77,6 +74,11 @@ def run_shell( printer, cmd, capture_output=True ):
 
     return p.returncode
 
+#
+def concatenate_commands( cmd1, cmd2 ):
+    """ Returns a shell command that runs 'cmd2' only if 'cmd1' succeeds """
+    return f"{cmd1} && {cmd2}"
+
 #
 def run_shell2( cmd, stdout=False, on_err_msg=None ):
     """ Alternate semantics use internal 'verbose' flag instead of a printer
@@ -144,7 +146,7 @@ def replace_environ_variable( printer, line, marker='$' ):
     return replace_environ_variable(printer,line,marker)
 
 #-----------------------------------------------------------------------------
-def create_working_libdirs( printer, inf, arguments, libdirs, libnames, local_external_flag, variant, parent=None ):
+def create_working_libdirs( printer, inf, arguments, libdirs, libnames, local_external_flag, variant, parent=None, files=None ):
 
     # process all entries in the file        
     for line in inf:
@@ -230,8 +232,10 @@ def create_working_libdirs( printer, inf, arguments, libdirs, libnames, local_ex
                 sys.exit(1)
                 
             printer.debug( "# Nested libdirs file: " + path+line )
+            if ( files != None ):
+                files.append( os.path.abspath( path+line ) )
             f = open( path+line, 'r' )
-            create_working_libdirs( printer, f, arguments, libdirs, libnames, entry, variant, newparent )
+            create_working_libdirs( printer, f, arguments, libdirs, libnames, entry, variant, newparent, files )
             f.close()
             continue               
 
@@ -276,7 +280,8 @@ def run_pre_processing_script( printer, current_dir, work_root, pkg_root, prj_di
             printer.output( "= Running Pre-Process script: " + preprocess_script )
             cmd = "{} {} {} {} {} {} {} {} {} {}".format( script, build_clean, verbose_opt, work_root, pkg_root, prj_dirname, current_dir, variant, debug_opt, preprocess_args)
             printer.debug( "# PreProcessing cmd = " + cmd )
-            run_shell2( cmd, stdout=True, on_err_msg="Running PreProcess Script Failed!")
+            with printer.phase( 'preprocess', script=script ):
+                run_shell2( cmd, stdout=True, on_err_msg="Running PreProcess Script Failed!")
 
 
 #
@@ -322,6 +327,7 @@ def run_clean_dir_pre_processing( dir, printer, variant, debug_opt ):
            
 # 
 def fix_absolute_root( filepath ):
+    import pathlib, platform
     print( "fix_root", filepath, len(pathlib.Path( filepath ).parts) )
     if ( platform.system() == 'Windows' ):
         p = pathlib.Path( filepath )
@@ -333,6 +339,80 @@ def fix_absolute_root( filepath ):
     print("   end: ", filepath )
     return filepath
 
+#-----------------------------------------------------------------------------
+def get_file_size( fname ):
+    """ Returns the size of 'fname' or zero if the file does not exist """
+    try:
+        return os.path.getsize( fname )
+    except OSError:
+        return 0
+
+def read_ninja_log( fname, offset=0 ):
+    """ Returns the entries of a ninja log file (.ninja_log) as list of
+        (start_ms, end_ms, mtime, output) tuples.  When 'offset' is non-zero
+        only the entries appended after 'offset' are returned.  Note: ninja
+        appends to the log, i.e. an output can appear more than once (the
+        last entry is the most recent).
+    """
+    entries = []
+    try:
+        with open( fname, 'r' ) as fd:
+            fd.seek( offset )
+            for line in fd:
+                if ( line.startswith('#') ):
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                if ( len(fields) < 4 ):
+                    continue
+                entries.append( (int(fields[0]), int(fields[1]), int(fields[2]), fields[3]) )
+    except (OSError, ValueError):
+        pass
+    return entries
+
+def peak_concurrency( intervals ):
+    """ Returns the maximum number of overlapping (start, end) intervals """
+    points = sorted( [ (i[0], 1) for i in intervals ] + [ (i[1], -1) for i in intervals ] )
+    peak   = 0
+    count  = 0
+    for t, delta in points:
+        count += delta
+        peak   = max( peak, count )
+    return peak
+
+def hash_string( text ):
+    """ Returns a short, stable hash (as hex string) of 'text' """
+    import hashlib
+    return hashlib.sha1( text.encode() ).hexdigest()[:16]
+
+#-----------------------------------------------------------------------------
+def read_cache_file( fname, default=None ):
+    """ Returns the JSON content of the NQBP cache file 'fname' (relative to
+        NQBP_CACHE_ROOT). A missing or corrupt cache file returns 'default'.
+    """
+    import json
+    try:
+        with open( os.path.join( NQBP_CACHE_ROOT(), fname ), 'r' ) as fd:
+            return json.load( fd )
+    except Exception:
+        return default
+
+def write_cache_file( fname, data ):
+    """ Writes 'data' as JSON to the NQBP cache file 'fname' (relative to
+        NQBP_CACHE_ROOT). The file is replaced atomically so that concurrent
+        builds never see a partial file. Failures are ignored, i.e. the cache
+        is an optimization only.
+    """
+    import json
+    try:
+        path = os.path.join( NQBP_CACHE_ROOT(), fname )
+        os.makedirs( os.path.dirname( path ), exist_ok=True )
+        tmp  = f"{path}.{os.getpid()}.tmp"
+        with open( tmp, 'w' ) as fd:
+            json.dump( data, fd, indent=1 )
+        os.replace( tmp, path )
+    except Exception:
+        pass
+
 #-----------------------------------------------------------------------------
 def create_subdirectory( printer, pardir, new_subdir ):
     dname  = os.path.abspath( standardize_dir_sep(pardir) + os.sep + new_subdir )
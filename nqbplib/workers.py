@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+"""Pool of concurrently executing shell commands (e.g. the builds of bob)
+
+Each job is a shell command that is executed in its own process group (i.e.
+cancelling a job also terminates the processes that the command started).
+The pool waits for completion events (no polling) and starts the next job as
+soon as a worker is free.  When a job fails the remaining jobs are cancelled
+(the in-flight jobs are terminated) unless 'keep_going' is set.  A job with
+a timeout is terminated (and fails) when it runs longer than its timeout.
+"""
+
+import os
+import sys
+import time
+import queue
+import signal
+import threading
+import subprocess
+
+# Job states
+PENDING   = 'pending'
+PASSED    = 'ok'
+FAILED    = 'failed'
+CANCELLED = 'cancelled'
+SKIPPED   = 'skipped'     # Not run by the pool, e.g. the job's output is up to date
+TIMEDOUT  = 'timeout'
+
+# Time (in seconds) a timed out job has to exit before it is killed
+KILL_GRACE = 5.0
+
+
+#-----------------------------------------------------------------------------
+class Job:
+    """ A shell command to execute.  After the pool has run, 'status' is one
+        of PASSED, FAILED, or CANCELLED (terminated or never started), and
+        'elapsed' is the wall time in seconds (None if never started).  When
+        'capture' is set, 'output' is the command's stdout/stderr.  'key'
+        identifies the job across runs (e.g. for its duration history) and
+        'estimate' is its predicted duration.  'env' is the environment for
+        the command (None inherits the current environment).  'timeout' is
+        the maximum run time in seconds (None is no limit); a job that times 
+        out has the status TIMEDOUT.
+    """
+    def __init__( self, name, cmd, cwd=None, capture=True, key=None, env=None, timeout=None ):
+        self.name       = name
+        self.cmd        = cmd
+        self.cwd        = cwd
+        self.capture    = capture
+        self.env        = env
+        self.timeout    = timeout
+        self.key        = name if key == None else key
+        self.estimate   = None
+        self.status     = PENDING
+        self.returncode = None
+        self.output     = ''
+        self.start      = None
+        self.elapsed    = None
+        self._proc      = None
+
+    def __repr__( self ):
+        return f"Job({self.name!r}, {self.status})"
+
+#-----------------------------------------------------------------------------
+def cpu_count():
+    return os.cpu_count() or 1
+
+def parse_workers( value, default=1 ):
+    """ Converts a '-j' argument (a number or 'auto') to a number of workers """
+    if ( value == None ):
+        return default
+    if ( str(value).lower() == 'auto' ):
+        return cpu_count()
+    try:
+        return max( int(value), 1 )
+    except ValueError:
+        sys.exit( f"ERROR: Invalid number of jobs: {value}" )
+
+def run( jobs, workers, keep_going=False, on_start=None, on_done=None, on_prepare=None ):
+    """ Executes the list of Jobs with at most 'workers' jobs at a time (in
+        list order).  'on_start(job)' and 'on_done(job)' are called (from the
+        calling thread) when a job starts/completes.  'on_prepare(job)' is
+        called right before the job's command is started (e.g. to create
+        the job's working directory).  Returns True if all of
+        the jobs passed.  A KeyboardInterrupt terminates the in-flight jobs
+        (and is re-raised).
+    """
+    events  = queue.Queue()
+    pending = list( jobs )
+    running = []
+    failed  = False
+    pending.reverse()
+    try:
+        while ( pending or running ):
+            # Start jobs
+            while ( pending and len(running) < workers and not ( failed and not keep_going ) ):
+                job = pending.pop()
+                if ( on_prepare ):
+                    on_prepare( job )
+                _start( job, events )
+                running.append( job )
+                if ( on_start ):
+                    on_start( job )
+
+            # Nothing left to start and nothing running
+            if ( not running ):
+                break
+
+            # Wait for a job to complete
+            job = events.get()
+            running.remove( job )
+            if ( job.status in (FAILED, TIMEDOUT) ):
+                failed = True
+            if ( on_done ):
+                on_done( job )
+
+            # Stop on the first failure
+            if ( failed and not keep_going ):
+                _cancel( running, events )
+                for j in running:
+                    if ( on_done ):
+                        on_done( j )
+                running = []
+
+    except KeyboardInterrupt:
+        _cancel( running, events )
+        raise
+
+    # Jobs that were never started are cancelled
+    for job in pending:
+        job.status = CANCELLED
+    return not failed
+
+def terminate( proc, grace=None ):
+    """ Terminates a process started by the pool, including all of its child
+        processes.  When 'grace' is set, the processes that are still running
+        after 'grace' seconds are killed.
+    """
+    try:
+        if ( os.name == 'posix' ):
+            os.killpg( proc.pid, signal.SIGTERM )
+        else:
+            subprocess.run( f"taskkill /F /T /PID {proc.pid}", shell=True, capture_output=True )
+    except OSError:
+        pass
+    if ( grace != None and os.name == 'posix' ):
+        try:
+            proc.wait( grace )
+        except subprocess.TimeoutExpired:
+            pass
+        try:
+            os.killpg( proc.pid, signal.SIGKILL )
+        except OSError:
+            pass
+
+#-----------------------------------------------------------------------------
+def _start( job, events ):
+    job.start = time.time()
+    kwargs    = { 'start_new_session': True } if os.name == 'posix' else { 'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP }
+    if ( job.capture ):
+        kwargs['stdout'] = subprocess.PIPE
+        kwargs['stderr'] = subprocess.STDOUT
+    job._proc = subprocess.Popen( job.cmd, shell=True, cwd=job.cwd, env=job.env, **kwargs )
+    threading.Thread( target=_wait, args=(job, events), daemon=True ).start()
+
+def _wait( job, events ):
+    try:
+        out = job._proc.communicate( timeout=job.timeout )[0]
+    except subprocess.TimeoutExpired:
+        job.status = TIMEDOUT
+        terminate( job._proc, KILL_GRACE )
+        out = job._proc.communicate()[0]
+    job.output     = out.decode( errors='replace' ) if out else ''
+    job.returncode = job._proc.returncode
+    job.elapsed    = time.time() - job.start
+    if ( job.status == PENDING ):
+        job.status = PASSED if job.returncode == 0 else FAILED
+    events.put( job )
+
+def _cancel( running, events ):
+    # Note: Each running job posts exactly one completion event
+    for job in running:
+        if ( job._proc.poll() == None ):
+            job.status = CANCELLED
+            terminate( job._proc )
+    for job in running:
+        events.get()
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+r"""
+
+Measures the fixed start-up cost of NQBP (i.e. how long nqbp.py takes when
+there is nothing to build).  Must be run from a project directory.
+===============================================================================
+usage: bench_startup [options] [--] [<build-opts>...]
+
+Arguments:
+    <build-opts>         Option(s) to be passed directly to the build script.
+                         Use '--' to separate them from the options below.
+
+Options:
+    -n N                 Number of times to run the build script. [Default: 10]
+    -x SCRIPT            Build script to run [Default: nqbp.py]
+    --script-prefix PRE  Prefix for the build script (e.g. --script-prefix python3)
+    --imports            Displays the most expensive module imports (uses
+                         python's -X importtime option).
+    --top N              Number of imports to display. [Default: 15]
+    -v                   Be verbose
+    -h, --help           Displays this information
+
+Examples:
+    ; Time 20 'no work to do' builds of the default variant
+    bench_startup.py -n 20
+
+    ; Time the --qry option and show where the import time goes
+    bench_startup.py --imports --script-prefix python3 -- --qry
+
+"""
+
+import sys
+import os
+import time
+import subprocess
+import statistics
+
+sys.path.append( os.path.dirname(__file__) + os.sep + ".." )
+
+from nqbplib import utils
+from nqbplib.docopt.docopt import docopt
+
+
+BENCH_VERSION = "1.0"
+
+#------------------------------------------------------------------------------
+def time_command( cmd ):
+    start = time.perf_counter()
+    p     = subprocess.Popen( cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE )
+    r     = p.communicate()
+    if ( p.returncode != 0 ):
+        exit( f"ERROR: Command failed ({cmd}): {r[0].decode()} {r[1].decode()}" )
+    return time.perf_counter() - start
+
+def import_times( cmd ):
+    env = dict( os.environ, PYTHONPROFILEIMPORTTIME='1' )
+    p   = subprocess.Popen( cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env )
+    r   = p.communicate()
+
+    # Format is: 'import time: self [us] | cumulative | imported package'
+    results = []
+    for line in r[1].decode().splitlines():
+        if ( not line.startswith('import time:') ):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if ( len(fields) != 3 or not fields[0].strip().isdigit() ):
+            continue
+        results.append( (int(fields[1]), int(fields[0]), fields[2].rstrip()) )
+    results.sort( reverse=True )
+    return results
+
+#------------------------------------------------------------------------------
+# BEGIN
+if __name__ == '__main__':
+
+    # Parse command line
+    args = docopt(__doc__, version=BENCH_VERSION, options_first=True )
+    utils.set_verbose_mode( args['-v'] )
+
+    prefix = args['--script-prefix'] if args['--script-prefix'] else ''
+    script = args['-x']
+    if ( os.path.isfile( script ) ):
+        script = os.path.join( '.', script )
+    cmd = f"{prefix} {script} " + " ".join( args['<build-opts>'] )
+
+    # Warm up (e.g. populate the file system cache, the validate_cc cache, the build directory, etc.)
+    utils.print_verbose( f"Warm up: {cmd}" )
+    time_command( cmd )
+
+    # Time the runs
+    samples = []
+    for n in range( int(args['-n']) ):
+        t = time_command( cmd )
+        utils.print_verbose( f"  run #{n+1}: {t*1000:.1f} ms" )
+        samples.append( t )
+
+    print( f"= Command: {cmd.strip()}" )
+    print( f"= Runs:    {len(samples)}" )
+    print( f"= Min:     {min(samples)*1000:8.1f} ms" )
+    print( f"= Median:  {statistics.median(samples)*1000:8.1f} ms" )
+    print( f"= Mean:    {statistics.mean(samples)*1000:8.1f} ms" )
+    print( f"= Max:     {max(samples)*1000:8.1f} ms" )
+
+    # Display the import costs
+    if ( args['--imports'] ):
+        print( "= Most expensive imports (cumulative / self, in ms):" )
+        for cumulative, selftime, name in import_times( cmd )[:int(args['--top'])]:
+            print( f"  {cumulative/1000:7.1f} {selftime/1000:7.1f}  {name}" )
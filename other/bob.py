@@ -32,6 +32,10 @@ Options:
     --file BLDLIST       A text file containing a list of projects to build.
                          The format of file is a list of 'build' commands. 
                          Blank lines and line starting with '#' are skipped.
+                         The builds of all entries are merged (duplicates
+                         are built once) and run as a single set of builds,
+                         i.e. the -j, --keep-going, --changed, --shard, etc.
+                         options of the command line apply to all entries.
     --xconfig SCRIPT     Name and full path to the compiler config script.  If 
                          no script is provided then it is assume no additional 
                          config/setup is required.
@@ -40,8 +44,51 @@ Options:
     --script-prefix PRE  Prefix for all script calls (typically only needed in a
                          a CI environment, e.g. --scrip-prefix python.exe)
     -x SCRIPT            Build using SCRIPT [Default: nqbp.py]
-    -2                   Run two builds at the same time
-    -4                   Run four builds at the same time
+    --jobserver N        Size of the pool of job tokens shared by ALL of the
+                         builds (including nested builds), i.e. the maximum 
+                         number of concurrent compile/link jobs. Use 0 to
+                         disable the shared pool. [Default: auto]
+    -j N                 Number of builds to run at the same time. Use 'auto' 
+                         for the number of CPUs. [Default: 1]
+    -2                   Run two builds at the same time (same as '-j 2')
+    -4                   Run four builds at the same time (same as '-j 4')
+    --keep-going         Continue building the remaining projects when a build
+                         fails (the failures are listed at the end).  By
+                         default the first failure cancels all of the builds.
+    --walk-order         Builds the projects in directory order.  By default
+                         the projects are built longest first, based on the 
+                         durations of previous builds (the build history is 
+                         kept in the NQBP_CACHE_ROOT directory).
+    --changed CHANGES    Only builds the selected projects that are affected by
+                         the changed files.  CHANGES is either a file that
+                         contains a list of file names (one per line) or a git 
+                         revision range (e.g. origin/main..HEAD).  A project 
+                         is affected when a changed file is in a directory of
+                         its libdirs.b closure or is one of its header files.
+                         The information is recorded by the project's last 
+                         successful build, i.e. projects that have not been 
+                         built (by bob) are always built.
+    --shard K/N          Builds the K'th (1..N) of N partitions of the selected
+                         projects, e.g. to distribute the builds across N 
+                         CI agents.  The partitions are balanced by the build 
+                         history (see --history) and are stable across runs.
+    --history FILE       Build history file.  All agents of a sharded build 
+                         must use the same (shared) history file to compute
+                         the same partitions.  The default is a file in the 
+                         NQBP_CACHE_ROOT directory.
+    --report FILE        Writes the build report as JSON to FILE.  The report
+                         contains the status, wall time, ninja edge counts 
+                         (compiled vs. up-to-date object files), archive store
+                         hit rate, and peak parallelism of each project and
+                         build variant (a summary table, slowest first, is 
+                         always output).  The default is a file in the 
+                         NQBP_CACHE_ROOT directory.
+    --force              Builds all of the selected projects.  By default a
+                         project is skipped when none of its inputs (the 
+                         directories/files of its libdirs.b closure, header 
+                         files, compiler, build options, etc.) have changed
+                         since its last successful build (requires the build 
+                         script to be nqbp.py).
     -v                   Be verbose 
     -h, --help           Display help for common options/usage
     
@@ -54,6 +101,17 @@ Examples:
     ; Builds the projects listed in the file 'mybuild.lst'
     bob.py --file mybuild.lst
 
+    ; Builds all projects under the current working directory, one build per
+    ; CPU, and reports all of the failed builds at the end
+    bob.py -j auto --keep-going here
+
+    ; Builds the projects affected by the commits on the current branch
+    bob.py --changed origin/main..HEAD here
+
+    ; Builds the second of four partitions of all projects (i.e. on the
+    ; second of four CI agents)
+    bob.py --shard 2/4 --history \ci\bob_history.json here
+
     ; Builds all 'mybuild' projects (with the '-s' option) under the current 
     ; working directory
     bob.py -x mybuild.bat here -s
@@ -62,19 +120,39 @@ Examples:
 
 import sys
 import os
-import subprocess
+import json
+import shlex
 import fnmatch
-from multiprocessing import Process
-import multiprocessing
-import time
+import subprocess
 
 sys.path.append( os.path.dirname(__file__) + os.sep + ".." )
 from nqbplib.docopt.docopt import docopt
 from nqbplib import utils
+from nqbplib import jobserver
+from nqbplib import workers
+from nqbplib import history
+from nqbplib import stamps
 from nqbplib.my_globals import NQBP_PKG_ROOT
+from nqbplib.my_globals import NQBP_WORK_ROOT
+from nqbplib.my_globals import NQBP_CACHE_ROOT
 
 BOB_VERSION = '1.0'
 
+# Build durations per project+build options (relative to NQBP_CACHE_ROOT)
+HISTORY_FILE = os.path.join( 'bob', 'history.json' )
+
+# Directory of the build stamps (relative to NQBP_CACHE_ROOT)
+STAMPS_DIR = os.path.join( 'bob', 'stamps' )
+
+# Index of the directories/files referenced by each stamp (relative to NQBP_CACHE_ROOT)
+INDEX_FILE = os.path.join( 'bob', 'index.json' )
+
+# Directory of the event streams of the builds (relative to NQBP_CACHE_ROOT)
+EVENTS_DIR = os.path.join( 'bob', 'events' )
+
+# Default build report file (relative to NQBP_CACHE_ROOT)
+REPORT_FILE = os.path.join( 'bob', 'report.json' )
+
 #------------------------------------------------------------------------------
 def _filter_prj_list( all_prj, pattern, pkgroot, exclude=None, exclude2=None, exclude3=None, p2=None, p3=None ):
     list = []
@@ -93,7 +171,7 @@ def _filter_prj_list( all_prj, pattern, pkgroot, exclude=None, exclude2=None, ex
 
     return list
     
-def _build_project( full_path_of_build_script, verbose, bldopts, config, xconfig, pkgroot, script_prefix ):
+def _build_job( full_path_of_build_script, verbose, bldopts, config, xconfig, pkgroot, script_prefix ):
     # reconcile config options
     cfg = None
     if ( config ):
@@ -101,16 +179,350 @@ def _build_project( full_path_of_build_script, verbose, bldopts, config, xconfig
     elif ( xconfig ):
         cfg = xconfig
     
-    # Build the project
-    utils.push_dir( os.path.dirname(full_path_of_build_script) )
-    cmd = f"{script_prefix} {full_path_of_build_script} "  + " ".join(bldopts)
-    print( "BUILDING: "+ cmd )
-    if ( config ):
-        cmd = utils.concatenate_commands( cfg, cmd )
-    utils.run_shell2( cmd, verbose, f"ERROR: Build failure ({cmd})" )
-    utils.pop_dir()
+    # Build the project (in the project directory). Note: the output is only captured when not verbose
+    cmd  = f"{script_prefix} {full_path_of_build_script} "  + " ".join(bldopts)
+    prj  = os.path.relpath( os.path.dirname(full_path_of_build_script), NQBP_WORK_ROOT() ).replace( os.sep, '/' )
+    key  = f"{prj} {os.path.basename(full_path_of_build_script)} {' '.join(bldopts)}".strip()
+    env  = dict( os.environ, **{ stamps.STAMP_ENV: _stamp_file( key ), 'NQBP_EVENTS_FILE': _events_file( key ) } )
+    return workers.Job( cmd, cmd if cfg == None else utils.concatenate_commands( cfg, cmd ), os.path.dirname(full_path_of_build_script), capture=not verbose, key=key, env=env )
+
+def _stamp_file( key ):
+    return os.path.join( NQBP_CACHE_ROOT(), STAMPS_DIR, utils.hash_string( key ) + '.json' )
+
+def _events_file( key ):
+    return os.path.join( NQBP_CACHE_ROOT(), EVENTS_DIR, utils.hash_string( key ) + '.jsonl' )
+
+def _num_workers( args ):
+    if ( args['-4'] ):
+        return 4
+    if ( args['-2'] ):
+        return 2
+    return workers.parse_workers( args['-j'] )
+
+def _jobserver_size( value ):
+    # Returns the number of tokens of the shared pool ('auto' is the number of CPUs, 0 disables the pool)
+    if ( value == 'auto' ):
+        return os.cpu_count() or 1
+    try:
+        jobs = int( value )
+    except ValueError:
+        jobs = -1
+    if ( jobs < 0 ):
+        exit( f"ERROR: Invalid jobserver size: {value} (expected a number >= 0 or 'auto')" )
+    return jobs
+
+def _job_started( job ):
+    print( "BUILDING: "+ job.name )
+
+def _job_done( job ):
+    if ( job.status == workers.FAILED ):
+        if ( job.output ):
+            print( job.output.rstrip() )
+        print( f"ERROR: Build failure ({job.name})" )
+
+def _changed_files( changes, ppath ):
+    """ Returns the set of changed files (absolute paths) from a file list or
+        a git revision range
+    """
+    if ( os.path.isfile( changes ) ):
+        with open( changes, 'r' ) as fd:
+            names = [ l.strip() for l in fd if l.strip() != '' and not l.startswith('#') ]
+        return set( os.path.abspath( utils.standardize_dir_sep( n ) ) for n in names )
+
+    r = subprocess.run( ['git', 'rev-parse', '--show-toplevel'], cwd=ppath, capture_output=True, text=True )
+    d = subprocess.run( ['git', 'diff', '--name-only', changes], cwd=ppath, capture_output=True, text=True )
+    if ( r.returncode != 0 or d.returncode != 0 ):
+        exit( f"ERROR: '{changes}' is not a file list or a valid git revision range ({(r.stderr or d.stderr).strip()})" )
+    top = r.stdout.strip()
+    return set( os.path.normpath( os.path.join( top, n ) ) for n in d.stdout.splitlines() if n.strip() != '' )
+
+def _stamp_index( jobs ):
+    """ Returns a dictionary of stamp file -> (dirs, files) for the jobs that 
+        have a build stamp.  The index is cached (per stamp timestamp) so that
+        the stamps are only parsed when they change
+    """
+    cached = utils.read_cache_file( INDEX_FILE, {} )
+    index  = {}
+    for j in jobs:
+        fname = _stamp_file( j.key )
+        sig   = stamps.file_signature( fname )
+        if ( sig == None ):
+            continue
+        entry = cached.get( fname )
+        if ( entry == None or entry['sig'] != sig ):
+            stamp = utils.read_cache_file( fname )
+            if ( stamp == None ):
+                continue
+            entry = { 'sig': sig, 'dirs': list( stamp['dirs'].keys() ), 'files': list( stamp['files'].keys() ) }
+        index[fname] = entry
+    if ( index != cached ):
+        utils.write_cache_file( INDEX_FILE, index )
+    return index
+
+def _affected_jobs( jobs, changed ):
+    """ Returns the jobs affected by the set of changed files """
+    index    = _stamp_index( jobs )
+    dirs     = set( os.path.dirname( f ) for f in changed )
+    affected = []
+    for j in jobs:
+        entry = index.get( _stamp_file( j.key ) )
+        if ( entry == None or not changed.isdisjoint( entry['files'] ) or not dirs.isdisjoint( entry['dirs'] ) ):
+            affected.append( j )
+    return affected
+
+def _parse_shard( shard ):
+    try:
+        k, n = [ int(v) for v in shard.split('/') ]
+    except ValueError:
+        k, n = 0, 0
+    if ( n < 1 or k < 1 or k > n ):
+        exit( f"ERROR: Invalid shard: {shard} (expected K/N, where 1 <= K <= N)" )
+    return k, n
+
+def _shard_jobs( jobs, shard, hist ):
+    """ Returns the jobs of the K'th of N partitions """
+    k, n      = _parse_shard( shard )
+    keys      = [ j.key for j in jobs ]
+    durations = history.estimate( hist, keys ) or [ 1.0 ] * len(jobs)
+    bins      = history.partition( keys, durations, n )
+    loads     = [ sum( d for d, b in zip( durations, bins ) if b == i ) for i in range(n) ]
+    selected  = [ j for j, b in zip( jobs, bins ) if b == k-1 ]
+    print( f"= Shard {k}/{n}: {len(selected)} of {len(jobs)} build(s), predicted shard times (sec): {', '.join( f'{l:.1f}' for l in loads )}" )
+    return selected
+
+def _run_jobs( args, jobs, changed=None ):
+    # Select my shard (Note: before any agent specific filtering, i.e. every agent partitions the same list)
+    hist = history.History( args['--history'] if args['--history'] else HISTORY_FILE )
+    if ( args['--shard'] ):
+        jobs = _shard_jobs( jobs, args['--shard'], hist )
+
+    # Only build the projects affected by the changed files
+    if ( changed != None ):
+        selected = _affected_jobs( jobs, changed )
+        print( f"= Changed: {len(changed)} file(s) affect {len(selected)} of {len(jobs)} build(s)" )
+        jobs = selected
+
+    # Skip the builds that are up to date. Note: a build invalidates its stamp until it succeeds
+    alljobs = jobs
+    jobs    = []
+    for j in alljobs:
+        if ( not args['--force'] and stamps.is_current( _stamp_file( j.key ) ) ):
+            j.status = workers.SKIPPED
+            print( "UP-TO-DATE: "+ j.name )
+        else:
+            utils.delete_file( _stamp_file( j.key ) )
+            jobs.append( j )
+    if ( len(jobs) < len(alljobs) ):
+        print( f"= Up-to-date: {len(alljobs)-len(jobs)} of {len(alljobs)} build(s) skipped" )
+
+    # Schedule the longest builds first (when there is history)
+    nworkers  = _num_workers( args )
+    durations = history.estimate( hist, [ j.key for j in jobs ] )
+    predicted = None
+    unknown   = len( [ j for j in jobs if hist.predict( j.key ) == None ] )
+    if ( durations != None and not args['--walk-order'] ):
+        for j, d in zip( jobs, durations ):
+            j.estimate = d
+        jobs      = history.longest_first( jobs, durations )
+        predicted = history.makespan( [ j.estimate for j in jobs ], nworkers )
+
+    # Run the builds (Note: each build writes its event stream for the build report)
+    os.makedirs( os.path.join( NQBP_CACHE_ROOT(), EVENTS_DIR ), exist_ok=True )
+    for j in jobs:
+        utils.delete_file( _events_file( j.key ) )
+    ok = workers.run( jobs, nworkers, args['--keep-going'], _job_started, _job_done )
+
+    # Update the history (only completed builds are representative)
+    for j in jobs:
+        if ( j.status == workers.PASSED ):
+            hist.record( j.key, j.elapsed )
+    hist.save()
+    _report_builds( args, alljobs, nworkers )
+    _report_makespan( jobs, predicted, unknown, nworkers )
+    if ( ok ):
+        return
+
+    # Summarize the failures
+    failed    = [ j for j in jobs if j.status == workers.FAILED ]
+    cancelled = [ j for j in jobs if j.status == workers.CANCELLED ]
+    print( f"= FAILED: {len(failed)} of {len(jobs)} build(s) failed" + ( f", {len(cancelled)} cancelled" if cancelled else '' ) )
+    for j in failed:
+        print( f"=   {j.name}" )
+    exit( 1 )
+
+
+def _report_builds( args, jobs, nworkers ):
+    # Writes the JSON build report and outputs the summary table (slowest first)
+    builds = [ _build_report( j ) for j in jobs ]
+    ran    = [ j for j in jobs if j.start != None and j.elapsed != None ]
+    report = { 'version':       1,
+               'workers':       nworkers,
+               'peak_parallel': utils.peak_concurrency( [ (j.start, j.start + j.elapsed) for j in ran ] ),
+               'builds':        builds }
+    if ( args['--report'] ):
+        # An explicitly requested report is NOT a cache file, i.e. failures are reported
+        try:
+            with open( args['--report'], 'w' ) as fd:
+                json.dump( report, fd, indent=1 )
+        except OSError as e:
+            print( f"ERROR: Unable to write the build report: {args['--report']} [{e}]" )
+    else:
+        utils.write_cache_file( REPORT_FILE, report )
+    if ( len(builds) == 0 ):
+        return
+
+    rows = []
+    for b in builds:
+        for v in ( b['variants'] or [ { 'variant': '', 'status': b['status'], 'elapsed': b['elapsed'] } ] ):
+            name = f"{b['project']} [{v['variant']}]" if v['variant'] else b['project']
+            rate = v.get( 'cache_hit_rate' )
+            rows.append( ( v['elapsed'] or 0.0, v['status'], _count( v.get( 'compiled' ) ), _count( v.get( 'up_to_date' ) ), 
+                           '-' if rate == None else f"{rate:.0%}", _count( v.get( 'peak_parallel' ) ), name ) )
+    rows.sort( key=lambda r: -r[0] )
+    print( "= Build report (slowest first):" )
+    print( f"=  {'Wall(s)':>8}  {'Status':<9}  {'Compiled':>8}  {'Up-to-date':>10}  {'Cache':>5}  {'Peak':>4}  Project [variant]" )
+    for r in rows:
+        print( f"=  {r[0]:8.1f}  {r[1]:<9}  {r[2]:>8}  {r[3]:>10}  {r[4]:>5}  {r[5]:>4}  {r[6]}" )
+    counts = {}
+    for b in builds:
+        counts[b['status']] = counts.get( b['status'], 0 ) + 1
+    print( f"= Builds: " + ", ".join( f"{n} {s}" for s, n in sorted( counts.items() ) ) + f"; peak parallelism: {report['peak_parallel']} build(s)" )
+
+def _build_report( job ):
+    # Returns the report entry for a build. The variant details are from the build's event stream (only nqbp.py builds write the stream)
+    entry = { 'project': job.key, 'command': job.name, 'status': job.status, 'elapsed': None if job.elapsed == None else round( job.elapsed, 3 ), 'variants': [] }
+    if ( job.start == None ):
+        return entry
+
+    variant = None
+    end     = job.start + ( job.elapsed or 0.0 )
+    for e in _read_events( _events_file( job.key ) ):
+        if ( e['event'] == 'variant_start' ):
+            variant = { 'variant': e['variant'], 'status': workers.FAILED if job.status == workers.PASSED else job.status, 'start': e['ts'], 'elapsed': None }
+            entry['variants'].append( variant )
+        elif ( variant == None ):
+            continue
+        elif ( e['event'] == 'ninja_edges' ):
+            variant.update( { k: e[k] for k in ( 'edges', 'total', 'objects', 'compiled', 'compile_ms', 'peak_parallel' ) if k in e } )
+        elif ( e['event'] == 'archive_store' ):
+            lookups = e['hits'] + e['misses']
+            variant.update( { 'cache_hits': e['hits'], 'cache_misses': e['misses'], 'cache_hit_rate': round( e['hits'] / lookups, 3 ) if lookups else None } )
+        elif ( e['event'] == 'variant_end' ):
+            variant.update( { 'status': workers.PASSED, 'elapsed': round( e['ts'] - variant['start'], 3 ), 'output': e['output'] } )
+            if ( 'objects' in variant ):
+                variant['up_to_date'] = max( variant['objects'] - variant['compiled'], 0 )   # Note: only meaningful when all of the edges completed
+            variant = None
+    if ( variant != None ):
+        variant['elapsed'] = round( end - variant['start'], 3 )
+    for v in entry['variants']:
+        del v['start']
+    return entry
+
+def _read_events( fname ):
+    events = []
+    try:
+        with open( fname, 'r' ) as fd:
+            for line in fd:
+                try:
+                    events.append( json.loads( line ) )
+                except ValueError:
+                    pass
+    except OSError:
+        pass
+    return events
 
+def _count( value ):
+    return '-' if value == None else str( value )
 
+def _report_makespan( jobs, predicted, unknown, nworkers ):
+    started = [ j for j in jobs if j.start != None and j.elapsed != None ]
+    if ( len(started) == 0 ):
+        return
+    actual = max( j.start + j.elapsed for j in started ) - min( j.start for j in started )
+    msg    = f"= Makespan: {actual:.1f} sec ({len(started)} build(s), {nworkers} at a time)"
+    if ( predicted != None ):
+        msg += f", predicted {predicted:.1f} sec" + ( f" ({unknown} build(s) without history)" if unknown else '' )
+    print( msg )
+
+#------------------------------------------------------------------------------
+def _select_jobs( args, ppath, script_prefix, walks ):
+    # Returns the build jobs for a 'here' or 'PATTERN' command ('walks' caches the workspace walks)
+    build_script = args['-x']
+    utils.set_pkg_and_wrkspace_roots( ppath )    
+    pkgroot = NQBP_PKG_ROOT()
+    if ( (ppath, build_script) not in walks ):
+        walks[(ppath, build_script)] = utils.walk_file_list( build_script, ppath )
+    all_prjs = walks[(ppath, build_script)]
+
+    # Only build the projects that match the pattern
+    pattern = args['PATTERN']
+    if ( args['here'] ):
+        pattern = '*'
+    
+    prjs = _filter_prj_list( all_prjs, pattern, pkgroot, args['--exclude'], args['--e2'], args['--e3'], args['--p2'], args['--p3'] )
+    return [ _build_job( p, args['-v'], args['<build-opts>'], args['--config'], args['--xconfig'], pkgroot, script_prefix ) for p in prjs ]
+
+def _read_build_list( args, ppath, script_prefix, walks ):
+    # Returns the (de-duplicated) build jobs of all entries in the build list file
+    try:
+        with open( args['--file'], 'r' ) as inf:
+            lines = inf.readlines()
+    except Exception as ex:
+        exit( "ERROR: Unable to open build list: {}".format(args['--file']) )
+
+    jobs = []
+    seen = set()
+    for line in lines:
+        # drop comments and blank lines
+        line = line.strip()
+        if ( line.startswith('#') ):
+            continue
+        if ( line == '' ):
+            continue
+           
+        # 'normalize' the file entries
+        line = utils.standardize_dir_sep( line )
+
+        # Parse the entry (Note: the -j, --keep-going, etc. options of the entry are ignored, i.e. the command line options apply to all entries)
+        try:
+            entry = docopt( __doc__, argv=shlex.split( line, posix=(os.name == 'posix') ), options_first=True, help=False )
+        except SystemExit:
+            exit( f"ERROR: Invalid build list entry: {line}" )
+        if ( entry['--file'] ):
+            exit( f"ERROR: Nested build lists are not supported: {line}" )
+
+        # A relative path is relative to the project directory path of the command line
+        eppath = ppath
+        if ( entry['--path'] ):
+            eppath = os.path.abspath( os.path.join( ppath, entry['--path'] ) )
+        eprefix = entry['--script-prefix'] if entry['--script-prefix'] != None else script_prefix
+        entry['-v'] = entry['-v'] or args['-v']
+
+        # Drop builds that are already in the list
+        for job in _select_jobs( entry, eppath, eprefix, walks ):
+            if ( (job.key, job.cmd) not in seen ):
+                seen.add( (job.key, job.cmd) )
+                jobs.append( job )
+    return jobs
+
+def _main( args, ppath, build_script, script_prefix ):
+    # Get the changed files (Note: a file list is relative to the original cwd)
+    changed = _changed_files( args['--changed'], ppath ) if args['--changed'] else None
+
+    # Get the projects to build
+    utils.push_dir( ppath )
+    walks = {}
+    if ( args['--file'] ):
+        jobs = _read_build_list( args, ppath, script_prefix, walks )
+    else:
+        jobs = _select_jobs( args, ppath, script_prefix, walks )
+
+    # Build all of the projects with a single pool of workers
+    _run_jobs( args, jobs, changed )
+
+    # restore original cwd
+    utils.pop_dir()
+    
 
 
 #------------------------------------------------------------------------------
@@ -128,7 +540,7 @@ if __name__ == '__main__':
     
     # Project dir path is explicit set
     if ( args['--path'] ):
-        ppath = args['--path']
+        ppath = os.path.abspath( args['--path'] )
 
     
     # Set which build engine to use
@@ -137,88 +549,16 @@ if __name__ == '__main__':
     if script_prefix is None:
         script_prefix = ''
 
-    # Get superset of projects to build
-    utils.push_dir( ppath )
-    utils.set_pkg_and_wrkspace_roots( ppath )    
-    pkgroot = NQBP_PKG_ROOT()
-    all_prjs = utils.walk_file_list( build_script, ppath )
-
-    # Get project list from a file
-    if ( args['--file'] ):
-        try:
-            inf = open( args['--file'], 'r' )
-
-            # process all entries in the file        
-            for line in inf:
-               
-                # drop comments and blank lines
-                line = line.strip()
-                if ( line.startswith('#') ):
-                    continue
-                if ( line == '' ):
-                    continue
-           
-                # 'normalize' the file entries
-                line = utils.standardize_dir_sep( line.strip() )
-        
-                # Process 'add' entries
-                cmd = f"{script_prefix} bob.py " + line
-                utils.run_shell( cmd, args['-v'], "ERROR: Build from File failed." )
-    
-            inf.close()
-        
-        except Exception as ex:
-            exit( "ERROR: Unable to open build list: {}".format(args['--file']) )
-        
-    
-
-    # The project list is from the command line
-    else:
-        # Only build the projects that match the pattern
-        pattern = args['PATTERN']
-        if ( args['here'] ):
-            pattern = '*'
-    
-        jobs = _filter_prj_list( all_prjs, pattern, pkgroot, args['--exclude'], args['--e2'], args['--e3'], args['--p2'], args['--p3'] )
-       
-        # Run the Jobs serially
-        if ( not args['-2'] and not args['-4'] ):
-            for p in jobs:
-                _build_project(p, args['-v'], args['<build-opts>'], args['--config'], args['--xconfig'], pkgroot, script_prefix )
-
-        # Run the Jobs in PARALLEL
-        else:
-            max     = len(jobs)
-            index   = 0
-            busy    = 0
-            cpus    = 2 if args['-2'] else 4
-            handles = []
-            for h in range(0,cpus):
-                handles.append( None )
-
-            # Process 'n' directories at a time
-            while( index < max or busy > 0 ):
-                # Start multiple processes
-                for i in range(0, cpus):
-                    if ( handles[i] == None and index < max ):
-                        j         = jobs[index]
-                        index     += 1
-                        busy      += 1
-                        handles[i] = Process(target=_build_project, args=(j, args['-v'], args['<build-opts>'], args['--config'], args['--xconfig'], pkgroot, script_prefix) )
-                        handles[i].start()
-
-                # Poll for processes being done
-                for i in range(0, cpus):
-                    if ( handles[i] != None and not handles[i].is_alive() ):
-                        if ( handles[i].exitcode != 0 ):
-                            exit( handles[i].exitcode )
-                        handles[i] = None
-                        busy      -= 1
-
-                # sleep for 10ms before polling to see if a process has completed
-                if ( busy >= cpus ):
-                    time.sleep( 0.010 )
-
-    # restore original cwd
-    utils.pop_dir()
-    
+    # Create the job token pool that is shared by all builds (the builds are started with an implicit token each)
+    nworkers = _num_workers( args )
+    jobs     = _jobserver_size( args['--jobserver'] )
+    server   = jobserver.create( max(jobs,nworkers), nworkers ) if jobs > 0 else None
+    if ( server != None ):
+        utils.print_verbose( f"Jobserver: {server.jobs} tokens ({os.environ[jobserver.JOBSERVER_ENV].strip()})" )
+    try:
+        _main( args, ppath, build_script, script_prefix )
+    except KeyboardInterrupt:
+        exit( "ERROR: Cancelled - the in-flight builds were terminated" )
+    finally:
+        if ( server != None ):
+            server.close()
@@ -39,8 +39,30 @@ Options:
     --d2 DIR             A second directory condition that will be AND'd with 
                          with the --dir option when restricting the directory
                          search.                    
-    --loop N             Repeat the test 'N' times.  [default: 1] 
-    -t,--turbo           Runs the tests in parallel
+    --loop N             Repeat the test 'N' times.  [default: 1] When combined
+                         with the '--turbo' option, the runs are executed in
+                         parallel, each in its own scratch working directory
+                         (kept when the run fails), all of the runs are 
+                         executed (i.e. a failure does not stop the remaining
+                         runs), and the pass/fail counts of each test are 
+                         reported.
+    -t,--turbo           Runs the tests in parallel (one test per CPU).  The
+                         tests are started longest first, based on the 
+                         durations of previous runs (the test history is kept
+                         in the NQBP_CACHE_ROOT directory, i.e. there is no
+                         history when neither NQBP_WORK_ROOT nor the history
+                         file option is set).
+    --timeout LIMIT      Terminates (and fails) a test that runs longer than 
+                         LIMIT.  LIMIT is either a number of seconds (e.g. 
+                         300) or a multiple of the test's median duration of 
+                         previous runs (e.g. 4x).  A multiple can be combined
+                         with a limit in seconds for tests without history 
+                         (e.g. 4x,600).  Note: a multiple is never less than 
+                         10 seconds.
+    --history FILE       Test history file.  The default is a file in the 
+                         NQBP_CACHE_ROOT directory.
+    --slowest N          Number of tests listed in the summary of the slowest
+                         tests. [Default: 10]
     --script-prefix PRE  Prefix for all script calls (typically only needed in a
                          a CI environment, e.g. --scrip-prefix python.exe)
     -v                   Be verbose 
@@ -51,41 +73,173 @@ Examples:
     ; 5 times in row
     chuck.py --match a.exe --loop 5
 
+    ; Runs the 'a.out' executables under the 'flaky' directory 200 times in
+    ; parallel and reports how often each test failed
+    chuck.py --match a.out --dir flaky -t --loop 200
+
     ; Runs all a.exe built with the vc12 compiler
     chuck.py --match a.exe --dir vc12
 
+    ; Runs all 'a.out' executables in parallel and fails any test that takes
+    ; more than 5 times longer than usual (or 10 minutes when the test has
+    ; no history)
+    chuck.py --match a.out -t --timeout 5x,600
+
       
 """
 
 import sys
 import os
+import shutil
 import fnmatch
-from multiprocessing import Process
-import multiprocessing
-import time
+import tempfile
 
 sys.path.append( os.path.dirname(__file__) + os.sep + ".." )
 
 from nqbplib import utils
+from nqbplib import workers
+from nqbplib import history
 from nqbplib.docopt.docopt import docopt
+from nqbplib.my_globals import NQBP_WORK_ROOT
 
 
 CHUCK_VERSION = "1.0"
 
+# Test durations per test executable+arguments (relative to NQBP_CACHE_ROOT)
+HISTORY_FILE = os.path.join( 'chuck', 'history.json' )
+
+# Minimum timeout (in seconds) when the timeout is a multiple of the test's history
+MIN_TIMEOUT = 10.0
+
 #------------------------------------------------------------------------------
-        
-        
-#------------------------------------------------------------------------------
-#
-def execute_test( target, ppath, args, arg_string, script_prefix ):
-    utils.push_dir( os.path.split(target)[0] )
+def test_job( target, ppath, iteration, arg_string, script_prefix, verbose, scratch=False ):
     reldir = target.replace(ppath,'')[1:]
     exe    = os.path.basename(target)
     cmd    = f"{script_prefix} .{os.path.sep}{exe} {arg_string}"
-    for n in range( int(args['--loop']) ):
-        print( "= EXECUTING (#{}): {} {}".format( n+1, reldir, arg_string ) )
-        result = utils.run_shell2( cmd, args['-v'], "** ERROR: Test failed (#{} {} {} )**".format(n+1, reldir, arg_string) )
-    utils.pop_dir
+    name   = f"{reldir} {arg_string}".strip()
+    job    = workers.Job( name, cmd, os.path.split(target)[0], capture=not verbose, key=name.replace( os.sep, '/' ) )
+    job.iteration   = iteration
+    job.use_scratch = scratch
+    job.scratch     = None
+
+    # Run in a scratch directory (i.e. concurrent runs of the test do not share files). The directory is created by test_prepare()
+    if ( scratch ):
+        job.cmd = f"{script_prefix} {os.path.abspath(target)} {arg_string}"
+    return job
+
+def parse_timeout( value ):
+    # Returns (seconds, factor), e.g. '300' -> (300,None), '4x' -> (None,4), '4x,600' -> (600,4)
+    seconds = None
+    factor  = None
+    try:
+        for token in value.lower().split(','):
+            token = token.strip()
+            if ( token.endswith('x') ):
+                factor = float( token[:-1] )
+            else:
+                seconds = float( token )
+    except ValueError:
+        exit( f"ERROR: Invalid timeout: {value}" )
+    return ( seconds, factor )
+
+def test_history( args ):
+    # Returns the test History, or None when there is no place to keep it (i.e. never write the history into the test tree)
+    if ( args['--history'] ):
+        return history.History( args['--history'] )
+    if ( os.environ.get('NQBP_WORK_ROOT') ):
+        return history.History( HISTORY_FILE )
+    return None
+
+def test_timeout( job, hist, seconds, factor ):
+    median = hist.predict( job.key ) if hist != None else None
+    if ( factor != None and median != None ):
+        return max( factor * median, MIN_TIMEOUT )
+    return seconds
+
+def test_prepare( job ):
+    if ( job.use_scratch ):
+        job.scratch = tempfile.mkdtemp( prefix='chuck-' )
+        job.cwd     = job.scratch
+
+def test_started( job ):
+    print( "= EXECUTING (#{}): {}".format( job.iteration, job.name ) )
+
+def test_done( job ):
+    if ( job.status in (workers.FAILED, workers.TIMEDOUT) ):
+        if ( job.output ):
+            print( job.output.rstrip() )
+        if ( job.status == workers.TIMEDOUT ):
+            print( "** ERROR: Test timed out after {:.1f} sec (#{} {} )**".format( job.timeout, job.iteration, job.name ) )
+        else:
+            print( "** ERROR: Test failed (#{} {} )**".format( job.iteration, job.name ) )
+        if ( job.scratch ):
+            print( f"** Working directory: {job.scratch}" )
+
+def run_tests( args, tests, ppath, arg_string, script_prefix ):
+    # Create a job per test run (the repeated runs of a test are run in parallel when in turbo mode)
+    loops    = int(args['--loop'])
+    nworkers = workers.cpu_count() if args['--turbo'] else 1
+    scratch  = args['--turbo'] and loops > 1
+    jobs     = []
+    try:
+        for t in tests:
+            for n in range( loops ):
+                jobs.append( test_job( t, ppath, n+1, arg_string, script_prefix, args['-v'], scratch ) )
+
+        # Set the timeouts
+        hist = test_history( args )
+        if ( args['--timeout'] ):
+            seconds, factor = parse_timeout( args['--timeout'] )
+            for j in jobs:
+                j.timeout = test_timeout( j, hist, seconds, factor )
+
+        # Run the longest tests first when running in parallel
+        if ( nworkers > 1 and hist != None ):
+            durations = history.estimate( hist, [ j.key for j in jobs ] )
+            if ( durations != None ):
+                jobs = history.longest_first( jobs, durations )
+        ok = workers.run( jobs, nworkers, scratch, test_started, test_done, test_prepare )
+
+        # Update the history (only passed runs are representative)
+        if ( hist != None ):
+            for j in jobs:
+                if ( j.status == workers.PASSED ):
+                    hist.record( j.key, j.elapsed )
+            hist.save()
+        report_slowest( jobs, int( args['--slowest'] ) )
+        if ( loops > 1 ):
+            report_counts( jobs )
+        if ( not ok ):
+            failed    = [ j for j in jobs if j.status in (workers.FAILED, workers.TIMEDOUT) ]
+            cancelled = [ j for j in jobs if j.status == workers.CANCELLED ]
+            print( f"= FAILED: {len(failed)} of {len(jobs)} test run(s) failed" + ( f", {len(cancelled)} cancelled" if cancelled else '' ) )
+            exit( 1 )
+
+    # Remove the scratch directories (the directories of failed runs are kept for inspection)
+    finally:
+        for j in jobs:
+            if ( j.scratch and j.status not in (workers.FAILED, workers.TIMEDOUT) ):
+                shutil.rmtree( j.scratch, ignore_errors=True )
+
+def report_counts( jobs ):
+    counts = {}
+    for j in jobs:
+        c = counts.setdefault( j.name, {} )
+        c[j.status] = c.get( j.status, 0 ) + 1
+    print( "= Test results (most failures first):" )
+    for name, c in sorted( counts.items(), key=lambda i: ( -i[1].get( workers.FAILED, 0 ) - i[1].get( workers.TIMEDOUT, 0 ), i[0] ) ):
+        msg = f"=   {c.get( workers.PASSED, 0 ):5d} passed  {c.get( workers.FAILED, 0 ):5d} failed  {c.get( workers.TIMEDOUT, 0 ):5d} timed out"
+        if ( c.get( workers.CANCELLED ) ):
+            msg += f"  {c[workers.CANCELLED]:5d} cancelled"
+        print( f"{msg}  {name}" )
+
+def report_slowest( jobs, count ):
+    ran = sorted( [ j for j in jobs if j.elapsed != None ], key=lambda j: -j.elapsed )
+    if ( count <= 0 or len(ran) == 0 ):
+        return
+    print( f"= Slowest test(s):" )
+    for j in ran[:count]:
+        print( f"=   {j.elapsed:8.2f} sec  {j.status:<9}  {j.name} (#{j.iteration})" )
 
 #------------------------------------------------------------------------------
 # BEGIN
@@ -107,9 +261,17 @@ if __name__ == '__main__':
     if ( args['--path'] ):
         ppath = args['--path']
     
+    # The history file is relative to the invocation directory (not to the NQBP_CACHE_ROOT)
+    if ( args['--history'] ):
+        args['--history'] = os.path.abspath( args['--history'] )
+
     # Set the current directory
     utils.push_dir( ppath )
     
+    # The test history is kept in the NQBP_CACHE_ROOT directory (Note: the workspace root is optional for chuck)
+    if ( os.environ.get('NQBP_WORK_ROOT') ):
+        NQBP_WORK_ROOT( os.environ.get('NQBP_WORK_ROOT') )
+    
     
     # Trap --file options
     if ( args['--file'] ):
@@ -167,44 +329,11 @@ if __name__ == '__main__':
         # Build arg string
         arg_string = ' '.join( args['<testargs>'] )
         
-        # Run the tests SEQUENTIALLY
-        if ( not args['--turbo'] ):
-            for t in tests:
-                execute_test( t, ppath, args, arg_string, script_prefix )
-        
-        # Run the tests in PARALLEL
-        else:
-            max     = len(tests)
-            index   = 0
-            busy    = 0
-            cpus    = multiprocessing.cpu_count()
-            handles = []
-            for h in range(0,cpus):
-                handles.append( None )
-
-            # Process 'n' directories at a time
-            while( index < max or busy > 0 ):
-                # Start multiple processes
-                for i in range(0, cpus):
-                    if ( handles[i] == None and index < max ):
-                        d         = tests[index]
-                        index     += 1
-                        busy      += 1
-                        handles[i] = Process(target=execute_test, args=(d, ppath, args, arg_string, script_prefix) )
-                        handles[i].start()
-
-                # Poll for processes being done
-                for i in range(0, cpus):
-                    if ( handles[i] != None and not handles[i].is_alive() ):
-                        if ( handles[i].exitcode != 0 ):
-                            exit( handles[i].exitcode )
-                        handles[i] = None
-                        busy      -= 1
-
-                # sleep for 10ms before polling to see if a process has completed
-                if ( busy >= cpus ):
-                    time.sleep( 0.010 )
-
+        # Run the tests
+        try:
+            run_tests( args, tests, ppath, arg_string, script_prefix )
+        except KeyboardInterrupt:
+            exit( "ERROR: Cancelled - the running test(s) were terminated" )
 
         print( "= ALL Test(s) passed." )
  
@@ -42,11 +42,6 @@ DBG       = '-g' if sys.argv[8] == "debug" else ""
 if VERBOSE == 'verbose':
     print("Arguments:", sys.argv)
 
-try:
-    os.remove( "_delete_me_catch2.log" )
-except:
-    pass
-
 # Build directory
 xpackage_root  = os.environ.get('NQBP_XPKGS_ROOT')
 blddir = os.path.join( PKG_ROOT, "projects", xpackage_root.split(os.sep)[-1], "catch2", "lib", BUILDTYPE )
@@ -54,20 +49,27 @@ if not os.path.exists( blddir ):
     sys.exit( "Unsupported/invalid Catch2 Library build project: {blddir}" )
 
 # Clean command
-ncmd = ""
+options = []
+variant = None
 if CLEAN == 'clean':
-    ncmd = f'nqbp.py -z > _delete_me_catch2.log 2>&1'
+    options = ['-z']
 
 # Build command
 else:
-    ncmd = f'nqbp.py -b {VARIANT} {DBG} > _delete_me_catch2.log 2>&1'
+    variant = VARIANT
+    if ( DBG ):
+        options = [DBG]
 
-# Build the Catch2 library
-original_cwd = os.getcwd() 
-os.chdir( blddir)
-catch2_root = os.getcwd()
+# Build the Catch2 library (in-process, i.e. without spawning the library project's nqbp.py)
+from nqbplib import api
 if VERBOSE == 'verbose':
-    print( f"Building Catch2 library: {ncmd}" )
-rc = os.system( ncmd )
-os.chdir( original_cwd )
-sys.exit( rc )
+    print( f"Building Catch2 library: {blddir} {variant} {' '.join(options)}" )
+result = api.build( blddir, variant, options )
+try:
+    with open( os.path.join( blddir, "_delete_me_catch2.log" ), 'w' ) as fd:
+        fd.write( result.output )
+except OSError:
+    pass
+if ( not result.ok ):
+    print( result.reason )
+sys.exit( 0 if result.ok else 1 )
@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+r"""
+
+Reports which translation units and projects rebuild if a file is modified.
+===============================================================================
+usage: whatrebuilds [options] <file>...
+
+Arguments:
+    <file>               Header (or source) file(s) to be modified.  A partial
+                         path (e.g. src/Cpl/Io/Output.h) matches any file whose
+                         path ends with it.
+
+Options:
+    --path DIR           Root directory to search for built projects, i.e.
+                         build variant directories that contain a ninja deps
+                         log.  If no path is specified, the current working
+                         directory is used.
+    --tus                Lists the translation units that would be recompiled
+    --json               Outputs the results as JSON
+    --max N              Returns a non-zero exit code if more than N translation
+                         units (across all projects) would be recompiled.
+    --refresh            Ignores the cached dependency index, i.e. re-reads all
+                         of the ninja deps logs.
+    -v                   Be verbose
+    -h, --help           Displays this information
+
+Notes:
+    o The results are only as current as the last build of each project, i.e.
+      the index is derived from the ninja deps logs of the built projects.
+    o The index is cached in the NQBP_CACHE_ROOT directory and is only
+      refreshed for projects that have been re-built since the last query.
+    o The NQBP environment variables are optional (e.g. when run from a git
+      hook).  When NQBP_WORK_ROOT is not set, the root of the git repository
+      that contains the search path is used as the workspace root.
+
+Examples:
+    ; What would rebuild (in the current package) if Api.h is edited
+    whatrebuilds.py --path projects src/Kit/System/Api.h
+
+    ; Pre-commit check: fail if the staged changes recompile more than 500 TUs
+    whatrebuilds.py --max 500 $(git diff --cached --name-only)
+
+"""
+
+import sys
+import os
+import time
+import subprocess
+
+sys.path.append( os.path.dirname(__file__) + os.sep + ".." )
+
+from nqbplib import utils
+from nqbplib import deps
+from nqbplib.docopt.docopt import docopt
+from nqbplib.my_globals import NQBP_WORK_ROOT
+
+
+WHATREBUILDS_VERSION = "1.0"
+
+#------------------------------------------------------------------------------
+def workspace_root( ppath ):
+    # The NQBP environment is optional, i.e. default to the root of the git repository (or the search path)
+    root = os.environ.get('NQBP_WORK_ROOT')
+    if ( root ):
+        return root
+    try:
+        r = subprocess.run( ['git', 'rev-parse', '--show-toplevel'], cwd=ppath, capture_output=True, text=True )
+        if ( r.returncode == 0 and r.stdout.strip() != '' ):
+            return os.path.abspath( r.stdout.strip() )
+    except OSError:
+        pass
+    return ppath
+
+#------------------------------------------------------------------------------
+# BEGIN
+if __name__ == '__main__':
+
+    # Parse command line
+    args = docopt(__doc__, version=WHATREBUILDS_VERSION )
+    utils.set_verbose_mode( args['-v'] )
+
+    # Default the root path to the current working directory
+    ppath = os.getcwd()
+    if ( args['--path'] ):
+        ppath = os.path.abspath( args['--path'] )
+    NQBP_WORK_ROOT( utils.standardize_dir_sep( workspace_root( ppath ) ) )
+
+    # Query the index
+    start   = time.time()
+    vardirs = deps.find_variant_dirs( ppath )
+    utils.print_verbose( f"= Searched {len(vardirs)} build variant directories ({time.time()-start:.3f} sec)" )
+    results = deps.rebuilds( vardirs, args['<file>'], args['--refresh'] )
+    utils.print_verbose( f"= Query completed ({time.time()-start:.3f} sec)" )
+    total   = sum( len(r[2]) for r in results )
+
+    # JSON output
+    if ( args['--json'] ):
+        import json
+        out = { 'files': args['<file>'], 'total': total, 'projects': [] }
+        for prjdir, variant, objects, sources in results:
+            out['projects'].append( { 'project': prjdir, 'variant': variant, 'count': len(objects), 'objects': objects, 'sources': sources } )
+        print( json.dumps( out, indent=2 ) )
+
+    # Text output
+    else:
+        print( f"= {total} translation unit(s) in {len(results)} project variant(s) would be recompiled" )
+        for prjdir, variant, objects, sources in sorted( results, key=lambda r: len(r[2]), reverse=True ):
+            print( f"  {len(objects):6}  {variant:<12} {os.path.relpath( prjdir, ppath )}" )
+            if ( args['--tus'] ):
+                for s in sources:
+                    print( f"            {s}" )
+
+    # Enforce the maximum allowed recompile count
+    if ( args['--max'] and total > int(args['--max']) ):
+        exit( f"ERROR: {total} translation units would be recompiled (maximum allowed is {args['--max']})" )
@@ -0,0 +1,21 @@
+""" pytest configuration for the NQBP unit tests """
+
+import os
+import sys
+
+import pytest
+
+# Make the nqbplib and other packages importable without installing NQBP
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) ) )
+
+# The workspace is a test bed for building projects - it does not contain unit tests
+collect_ignore = [ 'workspace1' ]
+
+
+#-----------------------------------------------------------------------------
+@pytest.fixture
+def cache_root( tmp_path, monkeypatch ):
+    """ Redirects the NQBP caches (NQBP_CACHE_ROOT) to a temporary directory """
+    root = tmp_path / 'cache'
+    monkeypatch.setenv( 'NQBP_CACHE_ROOT', str(root) )
+    return root
@@ -0,0 +1,172 @@
+""" Unit tests for the toolchain base class helpers (nqbplib/base.py) """
+
+import io
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from nqbplib import base
+from nqbplib import my_globals
+from nqbplib.base import BuildValues
+from nqbplib.ninja_synatx import Writer
+
+
+#-----------------------------------------------------------------------------
+@pytest.mark.parametrize( 'text,tokens', [
+    ( '',                                   [] ),
+    ( '  -O2   -Wall\t-g\n',                [ '-O2', '-Wall', '-g' ] ),
+    ( '-DNAME="a b" -I"my dir"',            [ '-DNAME="a b"', '-I"my dir"' ] ),
+    ( "-DMSG='x y'",                        [ "-DMSG='x y'" ] ),
+    ( '-Imy$ dir -DX',                      [ '-Imy$ dir', '-DX' ] ),
+    ( '-Ia$$ -DX',                          [ '-Ia$$', '-DX' ] ),
+] )
+def test_tokenize_options( text, tokens ):
+    assert base.tokenize_options( text ) == tokens
+
+def test_group_options():
+    tokens = [ '-x', 'c++', '-O2', '-I', 'inc', '-isystem', 'sys', '-Wall', '-D' ]
+    assert base.group_options( tokens ) == [ ('-x', 'c++'), ('-O2',), ('-I', 'inc'), ('-isystem', 'sys'), ('-Wall',), ('-D',) ]
+
+@pytest.mark.parametrize( 'tokens,expected', [
+    # Include paths: the first occurrence is kept (the search order is preserved)
+    ( [ '-Ia', '-Ib', '-Ia' ],                          [ '-Ia', '-Ib' ] ),
+    ( [ '-I', 'a', '-Ib', '-I', 'a' ],                  [ '-I', 'a', '-Ib' ] ),
+    ( [ '-isystem', 'a', '-isystem', 'b', '-isystem', 'a' ], [ '-isystem', 'a', '-isystem', 'b' ] ),
+    ( [ '-include', 'f.h', '-DX', '-include', 'f.h' ],  [ '-include', 'f.h', '-DX' ] ),
+    ( [ '/Ia', '/Ib', '/Ia' ],                          [ '/Ia', '/Ib' ] ),
+    # Everything else: the last occurrence is kept
+    ( [ '-O2', '-g', '-O2' ],                           [ '-g', '-O2' ] ),
+    ( [ '-O0', '-O2', '-O0' ],                          [ '-O2', '-O0' ] ),
+    ( [ '-DX', '-UX', '-DX' ],                          [ '-UX', '-DX' ] ),
+    ( [ '-x', 'c', '-x', 'c++', '-x', 'c' ],            [ '-x', 'c++', '-x', 'c' ] ),
+    # Different arguments are different options
+    ( [ '-DX=1', '-DX=2' ],                             [ '-DX=1', '-DX=2' ] ),
+    # Non-options, and options followed by an unknown argument, are never removed
+    ( [ 'a.o', 'a.o' ],                                 [ 'a.o', 'a.o' ] ),
+    ( [ '-Wl,-Map', 'x.map', '-Wl,-Map', 'x.map' ],     [ '-Wl,-Map', 'x.map', '-Wl,-Map', 'x.map' ] ),
+] )
+def test_dedupe_options( tokens, expected ):
+    assert base.dedupe_options( tokens ) == expected
+
+
+#-----------------------------------------------------------------------------
+def test_options_text_concatenation():
+    text = base.OptionsText( '-O2' )
+    assert text + '-Wall' == '-O2 -Wall'
+    assert text + ' -Wall' == '-O2 -Wall'
+    assert text + '' == '-O2'
+    assert base.OptionsText( '' ) + '-Wall' == '-Wall'
+    assert type( text + '-Wall' ) == str
+
+def test_build_values_fields():
+    bv = BuildValues()
+    for f in BuildValues.FIELDS:
+        assert getattr( bv, f ) == ''
+
+def test_build_values_append_and_dedupe():
+    bv = BuildValues()
+    bv.cflags  = '-O2 -Wall'
+    bv.cflags += '-g'
+    bv.cflags += ' -O2'
+    assert bv.cflags == '-Wall -g -O2'
+    assert bv.get_tokens( 'cflags' ) == [ '-Wall', '-g', '-O2' ]
+    bv.inc  = '-Ia -Ib'
+    bv.inc += '-Ia'
+    assert bv.inc == '-Ia -Ib'
+
+def test_build_values_no_trailing_space():
+    bv = BuildValues()
+    bv.cppflags = ' -std=c++17  '
+    assert bv.cppflags == '-std=c++17'
+
+def test_build_values_link_fields_keep_duplicates():
+    bv = BuildValues()
+    bv.linklibs = '-la -lb -la'
+    bv.firstobjs = 'x.o x.o'
+    assert bv.linklibs == '-la -lb -la'
+    assert bv.firstobjs == 'x.o x.o'
+
+def test_build_values_merge_and_copy():
+    a = BuildValues()
+    b = BuildValues()
+    a.cflags = '-O2 -Ia'
+    b.cflags = '-Ia -O2 -g'
+    b.exclude_clangd.append( '-fx' )
+    c = a.copy()
+    a.append( b )
+    assert a.cflags == '-Ia -O2 -g'
+    assert a.exclude_clangd == [ '-fx' ]
+    assert c.cflags == '-O2 -Ia'
+    c.cflags += '-DC'
+    assert a.cflags == '-Ia -O2 -g'
+
+
+#-----------------------------------------------------------------------------
+@pytest.fixture
+def toolchain( tmp_path, monkeypatch ):
+    monkeypatch.delenv( 'NQBP_AR_MODE', raising=False )
+    monkeypatch.setattr( my_globals, '_NQBP_PRJ_DIR', my_globals._NQBP_PRJ_DIR )
+    return base.ToolChain( 'a.out', str(tmp_path), { 'release': {} }, 'release' )
+
+def _ninja_text( toolchain, method, *args ):
+    out = io.StringIO()
+    toolchain.set_ninja_writer( Writer( out ) )
+    getattr( toolchain, method )( *args )
+    return out.getvalue()
+
+@pytest.mark.parametrize( 'mode,expected', [
+    ( None, None ), ( '', None ), ( 'full', None ), ( 'None', None ),
+    ( 'thin', 'thin' ), ( ' Restat ', 'restat' ),
+] )
+def test_set_ar_mode( toolchain, mode, expected ):
+    toolchain.set_ar_mode( mode )
+    assert toolchain.get_ar_mode() == expected
+
+@pytest.mark.parametrize( 'mode', [ 'incremental', 'bogus' ] )
+def test_set_ar_mode_unsupported( toolchain, mode ):
+    with pytest.raises( SystemExit ):
+        toolchain.set_ar_mode( mode )
+
+def test_ar_mode_from_environment( tmp_path, monkeypatch ):
+    monkeypatch.setenv( 'NQBP_AR_MODE', 'thin' )
+    monkeypatch.setattr( my_globals, '_NQBP_PRJ_DIR', my_globals._NQBP_PRJ_DIR )
+    assert base.ToolChain( 'a.out', str(tmp_path), { 'release': {} }, 'release' ).get_ar_mode() == 'thin'
+
+def test_ar_mode_requires_a_gnu_style_archiver( toolchain ):
+    toolchain.set_ar_mode( 'restat' )
+    toolchain._ar_out = '/OUT:'     # e.g. MSVC's lib.exe
+    assert toolchain.get_ar_mode() == None
+
+@pytest.mark.parametrize( 'mode,aropts', [ ( None, 'crs' ), ( 'thin', 'crsT' ), ( 'restat', 'crsD' ) ] )
+def test_ar_options( toolchain, mode, aropts ):
+    toolchain.set_ar_mode( mode )
+    text = _ninja_text( toolchain, 'ar', None, [ 'a.o', 'b.o' ], 'src' )
+    assert f"aropts = {aropts}\n" in text
+
+@pytest.mark.parametrize( 'mode,restat', [ ( None, False ), ( 'thin', False ), ( 'restat', True ) ] )
+def test_ar_rule( toolchain, mode, restat ):
+    toolchain.set_ar_mode( mode )
+    text = _ninja_text( toolchain, '_build_ar_rule' )
+    assert ( 'restat = 1' in text ) == restat
+    assert ( '$out.tmp' in text ) == restat
+
+@pytest.mark.skipif( shutil.which( 'ar' ) == None or shutil.which( 'cmp' ) == None or os.name != 'posix', reason='requires GNU ar and a POSIX shell' )
+def test_restat_archive_is_only_replaced_when_changed( toolchain, tmp_path ):
+    toolchain.set_ar_mode( 'restat' )
+    command = toolchain._ar_command( 'a.o b.o' )
+    command = command.replace( '$rm', 'rm -f' ).replace( '$aropts', 'crsD' ).replace( '$ar', 'ar' )
+    command = command.replace( '${arout}', '' ).replace( '$out', 'lib.a' )
+    def archive():
+        subprocess.run( command, shell=True, cwd=tmp_path, check=True )
+        return os.stat( tmp_path / 'lib.a' ).st_ino
+
+    (tmp_path / 'a.o').write_bytes( b'a' )
+    (tmp_path / 'b.o').write_bytes( b'b' )
+    first = archive()
+    assert archive() == first                       # Identical content: the archive is left in place
+    assert not (tmp_path / 'lib.a.tmp').exists()
+    (tmp_path / 'b.o').write_bytes( b'c' )
+    assert archive() != first                       # Changed content: the archive is replaced
+    assert not (tmp_path / 'lib.a.tmp').exists()
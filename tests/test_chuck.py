@@ -0,0 +1,96 @@
+""" Unit tests for the test runner script (other/chuck.py) """
+
+import os
+import sys
+
+import pytest
+
+from nqbplib import history
+from nqbplib.docopt.docopt import docopt
+from other import chuck
+
+
+#-----------------------------------------------------------------------------
+@pytest.mark.parametrize( 'value,expected', [
+    ( '300',        ( 300.0, None ) ),
+    ( '2.5',        ( 2.5, None ) ),
+    ( '4x',         ( None, 4.0 ) ),
+    ( '1.5X',       ( None, 1.5 ) ),
+    ( '4x,600',     ( 600.0, 4.0 ) ),
+    ( ' 600 , 4x ', ( 600.0, 4.0 ) ),
+] )
+def test_parse_timeout( value, expected ):
+    assert chuck.parse_timeout( value ) == expected
+
+@pytest.mark.parametrize( 'value', [ '', 'x', 'abc', '4x,', '10s' ] )
+def test_parse_timeout_invalid( value ):
+    with pytest.raises( SystemExit ):
+        chuck.parse_timeout( value )
+
+
+#-----------------------------------------------------------------------------
+@pytest.fixture
+def hist( cache_root ):
+    h = history.History( 'history.json' )
+    for s in ( 2, 3, 100 ):
+        h.record( 'slow/a.out', s )
+    h.record( 'fast/a.out', 0.1 )
+    return h
+
+def _job( key ):
+    return chuck.test_job( os.path.join( '/prj', key, 'a.out' ), '/prj', 1, '', '', False )
+
+@pytest.mark.parametrize( 'key,seconds,factor,expected', [
+    ( 'slow',  None, 4.0,  12.0 ),                  # A multiple of the median
+    ( 'fast',  None, 4.0,  chuck.MIN_TIMEOUT ),     # ...that is never less than the minimum
+    ( 'new',   600,  4.0,  600 ),                   # No history: the limit in seconds
+    ( 'new',   None, 4.0,  None ),
+    ( 'slow',  600,  None, 600 ),
+] )
+def test_timeout( hist, key, seconds, factor, expected ):
+    assert chuck.test_timeout( _job( key ), hist, seconds, factor ) == expected
+
+def test_timeout_without_history():
+    assert chuck.test_timeout( _job( 'slow' ), None, 30, 4.0 ) == 30
+
+def test_job_key_is_portable():
+    job = chuck.test_job( os.path.join( '/prj', 'tests', 'unit', 'a.out' ), '/prj', 2, '-v', '', False )
+    assert job.key == 'tests/unit/a.out -v'
+    assert job.iteration == 2
+    assert job.cwd == os.path.join( '/prj', 'tests', 'unit' )
+
+
+#-----------------------------------------------------------------------------
+def _test_exe( dirname, body ):
+    os.makedirs( dirname )
+    fname = os.path.join( dirname, 'a.out' )
+    with open( fname, 'w' ) as fd:
+        fd.write( f"#!/bin/sh\n{body}\n" )
+    os.chmod( fname, 0o755 )
+    return fname
+
+def _args( argv ):
+    return docopt( chuck.__doc__, argv=[ '--match', 'a.out' ] + argv, options_first=True )
+
+@pytest.mark.skipif( os.name != 'posix', reason='the test executables are shell scripts' )
+def test_run_tests_records_the_history( tmp_path, capsys ):
+    tests = [ _test_exe( str(tmp_path / 'one'), 'exit 0' ), _test_exe( str(tmp_path / 'two'), 'exit 0' ) ]
+    fname = str(tmp_path / 'history.json')
+    chuck.run_tests( _args( [ '-t', '--history', fname, '--slowest', '1' ] ), tests, str(tmp_path), '', '' )
+    hist = history.History( fname )
+    assert len( hist.samples( 'one/a.out' ) ) == 1
+    assert len( hist.samples( 'two/a.out' ) ) == 1
+    out = capsys.readouterr().out
+    assert '= Slowest test(s):' in out
+    assert len( [ l for l in out.splitlines() if l.endswith( '(#1)' ) ] ) == 1
+
+@pytest.mark.skipif( os.name != 'posix', reason='the test executables are shell scripts' )
+def test_run_tests_timeout( tmp_path, capsys ):
+    tests = [ _test_exe( str(tmp_path / 'hang'), 'sleep 30' ) ]
+    fname = str(tmp_path / 'history.json')
+    with pytest.raises( SystemExit ) as e:
+        chuck.run_tests( _args( [ '--timeout', '0.5', '--history', fname ] ), tests, str(tmp_path), '', '' )
+    assert e.value.code == 1
+    out = capsys.readouterr().out
+    assert 'Test timed out after 0.5 sec' in out
+    assert history.History( fname ).samples( 'hang/a.out' ) == []      # Only passed runs are recorded
@@ -0,0 +1,151 @@
+""" Unit tests for the ninja deps log parser and the reverse dependency
+    index (nqbplib/deps.py)
+"""
+
+import os
+import struct
+
+import pytest
+
+from nqbplib import deps
+
+
+#-----------------------------------------------------------------------------
+def _deps_log( version, records ):
+    """ Returns the content of a binary ninja deps log.  'records' is a list
+        of output -> list of dependencies (in the order they are recorded)
+    """
+    data  = b'# ninjadeps\n' + struct.pack( '<i', version )
+    ids   = {}
+    def path_id( path ):
+        nonlocal data
+        if ( path not in ids ):
+            raw   = path.encode()
+            raw  += b'\0' * ( (4 - len(raw) % 4) % 4 )
+            data += struct.pack( '<I', len(raw) + 4 ) + raw + struct.pack( '<I', ~len(ids) & 0xFFFFFFFF )
+            ids[path] = len(ids)
+        return ids[path]
+
+    for out, dlist in records:
+        dep_ids = [ path_id( d ) for d in dlist ]
+        out_id  = path_id( out )
+        mtime   = [ 1234, 0 ] if version == 4 else [ 1234 ]
+        values  = [ out_id ] + mtime + dep_ids
+        data   += struct.pack( '<I', (4 * len(values)) | 0x80000000 ) + struct.pack( f'<{len(values)}i', *values )
+    return data
+
+RECORDS = [ ( 'src/a.o', [ '../src/a.cpp', '../inc/a.h', '/usr/include/stdio.h' ] ),
+            ( 'src/b.o', [ '../src/b.cpp', '../inc/a.h' ] ) ]
+
+@pytest.mark.parametrize( 'version', [ 3, 4 ] )
+def test_read_ninja_deps( tmp_path, version ):
+    fname = tmp_path / '.ninja_deps'
+    fname.write_bytes( _deps_log( version, RECORDS ) )
+    assert deps.read_ninja_deps( str(fname) ) == dict( RECORDS )
+
+def test_read_ninja_deps_last_record_wins( tmp_path ):
+    fname = tmp_path / '.ninja_deps'
+    fname.write_bytes( _deps_log( 4, RECORDS + [ ( 'src/a.o', [ '../src/a.cpp' ] ) ] ) )
+    assert deps.read_ninja_deps( str(fname) )['src/a.o'] == [ '../src/a.cpp' ]
+
+def test_read_ninja_deps_truncated( tmp_path ):
+    fname = tmp_path / '.ninja_deps'
+    data  = _deps_log( 4, RECORDS )
+    fname.write_bytes( data[:-6] )
+    assert deps.read_ninja_deps( str(fname) ) == dict( RECORDS[:1] )
+
+def test_read_ninja_deps_missing( tmp_path ):
+    assert deps.read_ninja_deps( str(tmp_path / '.ninja_deps') ) == {}
+
+def test_read_ninja_deps_bad_signature( tmp_path ):
+    fname = tmp_path / '.ninja_deps'
+    fname.write_bytes( b'# ninja log v5\n' )
+    with pytest.raises( SystemExit ):
+        deps.read_ninja_deps( str(fname) )
+
+def test_read_ninja_deps_bad_version( tmp_path ):
+    fname = tmp_path / '.ninja_deps'
+    fname.write_bytes( _deps_log( 2, RECORDS ) )
+    with pytest.raises( SystemExit ):
+        deps.read_ninja_deps( str(fname) )
+
+
+#-----------------------------------------------------------------------------
+BUILD_NINJA = """rule cc
+  command = gcc -c $in -o $out
+
+build src/a.o: cc ../src/a.cpp | ../gen/hdr.h
+build src/my$ file.o: cc ../src/my$ file.cpp
+build src/b.o $
+    src/b.d: cc $
+    ../src/b.cpp
+build src/c.o: cc || order_only
+build all: phony src/a.o
+"""
+
+def test_read_build_edges( tmp_path ):
+    fname = tmp_path / 'build.ninja'
+    fname.write_text( BUILD_NINJA )
+    assert deps.read_build_edges( str(fname) ) == { 'src/a.o':       '../src/a.cpp',
+                                                     'src/my file.o': '../src/my file.cpp',
+                                                     'src/b.o':       '../src/b.cpp' }
+
+def test_read_build_edges_missing( tmp_path ):
+    assert deps.read_build_edges( str(tmp_path / 'build.ninja') ) == {}
+
+@pytest.mark.parametrize( 'text,sep,maxsplit,expected', [
+    ( 'a b c',        ' ', -1, [ 'a', 'b', 'c' ] ),
+    ( 'a$ b c',       ' ', -1, [ 'a$ b', 'c' ] ),
+    ( 'x$:y: cc in',  ':', 1,  [ 'x$:y', ' cc in' ] ),
+    ( 'a:b:c',        ':', 1,  [ 'a', 'b:c' ] ),
+    ( 'a$$ b',        ' ', -1, [ 'a$$', 'b' ] ),
+] )
+def test_split_unescaped( text, sep, maxsplit, expected ):
+    assert deps._split_unescaped( text, sep, maxsplit ) == expected
+
+def test_unescape():
+    assert deps._unescape( 'my$ file$:x$$y' ) == 'my file:x$y'
+
+
+#-----------------------------------------------------------------------------
+@pytest.fixture
+def vardir( tmp_path ):
+    vardir = tmp_path / 'prj' / '_posix64'
+    vardir.mkdir( parents=True )
+    (vardir / 'build.ninja').write_text( "build src/a.o: cc ../src/a.cpp\nbuild src/b.o: cc ../src/b.cpp\n" )
+    (vardir / '.ninja_deps').write_bytes( _deps_log( 4, RECORDS ) )
+    (vardir / '.ninja_log').write_text( "# ninja log v5\n0\t300\t1\tsrc/a.o\t0\n0\t100\t1\tsrc/b.o\t0\n" )
+    return str(vardir)
+
+def test_build_index( vardir ):
+    index = deps.build_index( vardir )
+    prj   = os.path.dirname( vardir )
+    a_obj = os.path.join( vardir, 'src', 'a.o' )
+    b_obj = os.path.join( vardir, 'src', 'b.o' )
+    assert index['sources'] == { a_obj: os.path.join( prj, 'src', 'a.cpp' ), b_obj: os.path.join( prj, 'src', 'b.cpp' ) }
+    assert sorted( index['headers'][os.path.join( prj, 'inc', 'a.h' )] ) == [ a_obj, b_obj ]
+    assert index['headers']['/usr/include/stdio.h'] == [ a_obj ]
+    assert deps.split_variant_dir( vardir ) == ( prj, 'posix64' )
+
+def test_get_index_is_cached( vardir, cache_root ):
+    first = deps.get_index( vardir )
+    assert any( cache_root.joinpath( 'deps' ).iterdir() )
+    assert deps.get_index( vardir ) == first
+
+def test_rebuilds( vardir, cache_root ):
+    result = deps.rebuilds( [ vardir ], [ 'inc/a.h' ] )
+    assert len(result) == 1
+    prjdir, variant, objects, sources = result[0]
+    assert variant == 'posix64'
+    assert [ os.path.basename(o) for o in objects ] == [ 'a.o', 'b.o' ]
+    assert deps.rebuilds( [ vardir ], [ 'stdio.h' ] )[0][2] == [ os.path.join( vardir, 'src', 'a.o' ) ]
+    assert deps.rebuilds( [ vardir ], [ 'nosuch.h' ] ) == []
+
+def test_header_costs( vardir, cache_root ):
+    costs = { c['header']: c for c in deps.header_costs( vardir ) }
+    hdr   = costs[os.path.join( os.path.dirname( vardir ), 'inc', 'a.h' )]
+    assert hdr['tus'] == 2
+    assert hdr['cost_ms'] == 400
+    assert hdr['pch'] == True
+    assert costs['/usr/include/stdio.h']['pch'] == False
+    assert deps.header_costs( vardir )[0]['header'] == hdr['header']
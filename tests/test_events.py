@@ -0,0 +1,101 @@
+""" Unit tests for the build event stream (nqbplib/output.py) and the ninja
+    log reader (nqbplib/utils.py)
+"""
+
+import json
+
+import pytest
+
+from nqbplib.output import Printer
+from nqbplib import utils
+
+
+#-----------------------------------------------------------------------------
+def _listen( printer ):
+    records = []
+    printer.add_event_listener( records.append )
+    return records
+
+def test_events_disabled_by_default():
+    printer = Printer()
+    assert printer.events_enabled() == False
+    printer.event( 'build_start' )  # Must be a no-op
+
+def test_event_listener_receives_records():
+    printer = Printer()
+    records = _listen( printer )
+    assert printer.events_enabled()
+    printer.event( 'variant_start', variant='posix64' )
+    assert len(records) == 1
+    assert records[0]['event'] == 'variant_start'
+    assert records[0]['variant'] == 'posix64'
+    assert isinstance( records[0]['ts'], float )
+
+def test_events_file_is_json_lines( tmp_path ):
+    fname   = tmp_path / 'events.jsonl'
+    printer = Printer()
+    printer.enable_events( str(fname) )
+    printer.event( 'build_start', argv=['-g'] )
+    printer.event( 'build_end', status='ok' )
+    lines = fname.read_text().splitlines()
+    assert [ json.loads(l)['event'] for l in lines ] == [ 'build_start', 'build_end' ]
+    assert json.loads(lines[0])['argv'] == ['-g']
+
+def test_enable_events_bad_file( tmp_path ):
+    printer = Printer()
+    printer.output = lambda line: None
+    with pytest.raises( SystemExit ):
+        printer.enable_events( str(tmp_path / 'nosuch' / 'events.jsonl') )
+
+def test_phase_ok():
+    printer = Printer()
+    records = _listen( printer )
+    with printer.phase( 'libdirs', variant='posix64' ):
+        pass
+    assert len(records) == 1
+    r = records[0]
+    assert r['event'] == 'phase'
+    assert r['phase'] == 'libdirs'
+    assert r['status'] == 'ok'
+    assert r['variant'] == 'posix64'
+    assert r['elapsed'] >= 0
+
+def test_phase_failed_on_exception():
+    printer = Printer()
+    records = _listen( printer )
+    with pytest.raises( ValueError ):
+        with printer.phase( 'generate' ):
+            raise ValueError( 'boom' )
+    assert records[0]['status'] == 'failed'
+
+@pytest.mark.parametrize( 'code,status', [ (0, 'ok'), (None, 'ok'), (1, 'failed'), ('ERROR: x', 'failed') ] )
+def test_phase_status_on_exit( code, status ):
+    printer = Printer()
+    records = _listen( printer )
+    with pytest.raises( SystemExit ):
+        with printer.phase( 'ninja' ):
+            raise SystemExit( code )
+    assert records[0]['status'] == status
+
+
+#-----------------------------------------------------------------------------
+NINJA_LOG = "# ninja log v5\n" \
+            "0\t10\t100\tsrc/a.o\tabc\n" \
+            "5\t20\t101\tsrc/b.o\tdef\n"
+
+def test_read_ninja_log( tmp_path ):
+    fname = tmp_path / '.ninja_log'
+    fname.write_text( NINJA_LOG )
+    assert utils.read_ninja_log( str(fname) ) == [ (0, 10, 100, 'src/a.o'), (5, 20, 101, 'src/b.o') ]
+
+def test_read_ninja_log_after_offset( tmp_path ):
+    fname = tmp_path / '.ninja_log'
+    fname.write_text( NINJA_LOG )
+    offset = utils.get_file_size( str(fname) )
+    with open( fname, 'a' ) as fd:
+        fd.write( "0\t7\t102\tsrc/a.o\tghi\n" )
+    assert utils.read_ninja_log( str(fname), offset ) == [ (0, 7, 102, 'src/a.o') ]
+
+def test_read_ninja_log_missing_file( tmp_path ):
+    assert utils.read_ninja_log( str(tmp_path / '.ninja_log') ) == []
+    assert utils.get_file_size( str(tmp_path / '.ninja_log') ) == 0
@@ -0,0 +1,102 @@
+""" Unit tests for the ninja '-d explain' summary (nqbplib/explain.py) """
+
+import pytest
+
+from nqbplib import explain
+
+
+#-----------------------------------------------------------------------------
+# A header change that rebuilds two objects, the library and the executable
+HEADER_CHANGE = [
+    "ninja explain: output src/a.o older than most recent input ../src/a.h (1700000002 vs 1700000001)",
+    "ninja explain: src/a.o is dirty",
+    "ninja explain: output src/b.o older than most recent input ../src/a.h (1700000002 vs 1700000001)",
+    "ninja explain: src/b.o is dirty",
+    "ninja explain: output src/library.a older than most recent input src/a.o (1700000003 vs 1700000001)",
+    "ninja explain: src/library.a is dirty",
+    "ninja explain: a.out is dirty",
+]
+
+def test_parse():
+    dirty, reasons = explain.parse( HEADER_CHANGE )
+    assert dirty == [ 'src/a.o', 'src/b.o', 'src/library.a', 'a.out' ]
+    assert reasons['src/a.o'] == ( explain.CAUSE_INPUT, '../src/a.h' )
+    assert reasons['src/library.a'] == ( explain.CAUSE_INPUT, 'src/a.o' )
+    assert reasons['a.out'] == None
+
+def test_parse_first_reason_wins():
+    dirty, reasons = explain.parse( [ "command line changed for x.o",
+                                      "output x.o older than most recent input x.c (2 vs 1)",
+                                      "x.o is dirty", "x.o is dirty" ] )
+    assert dirty == [ 'x.o' ]
+    assert reasons['x.o'] == ( explain.CAUSE_COMMAND, 'command line changed' )
+
+@pytest.mark.parametrize( 'line,output,reason', [
+    ( "restat of output lib.a older than most recent input a.o (2 vs 1)", 'lib.a',   ( explain.CAUSE_INPUT, 'a.o' ) ),
+    ( "recorded mtime of x.o older than most recent input x.c (2 vs 1)",  'x.o',     ( explain.CAUSE_INPUT, 'x.c' ) ),
+    ( "command line not found in log for x.o",                           'x.o',     ( explain.CAUSE_COMMAND, 'not previously built (no .ninja_log entry)' ) ),
+    ( "output x.o doesn't exist",                                        'x.o',     ( explain.CAUSE_MISSING, 'output does not exist' ) ),
+    ( "output all of phony edge with no inputs doesn't exist",           'all',     ( explain.CAUSE_MISSING, 'output does not exist' ) ),
+    ( "deps for 'x.o' are missing",                                      'x.o',     ( explain.CAUSE_DEPS, 'dependency info is missing' ) ),
+    ( "../src/gone.h has no in-edge and is missing",                     '../src/gone.h', ( explain.CAUSE_MISSING, 'source file does not exist' ) ),
+] )
+def test_parse_reasons( line, output, reason ):
+    dirty, reasons = explain.parse( [ explain.EXPLAIN_PREFIX + line ] )
+    assert dirty == []
+    assert reasons == { output: reason }
+
+def test_parse_ignores_other_lines():
+    assert explain.parse( [ "ninja: warning: something", "[1/2] CXX a.o" ] ) == ( [], {} )
+
+
+#-----------------------------------------------------------------------------
+def test_summarize_follows_generated_inputs():
+    inputs  = { 'a.out': [ 'src/library.a' ] }
+    results = explain.summarize( HEADER_CHANGE, inputs )
+    assert len(results) == 1
+    assert results[0]['kind'] == explain.CAUSE_HEADER
+    assert results[0]['cause'] == '../src/a.h'
+    assert results[0]['edges'] == 4
+    assert results[0]['outputs'] == [ 'src/a.o', 'src/b.o', 'src/library.a', 'a.out' ]
+
+def test_summarize_largest_impact_first():
+    lines = [ "output a.o older than most recent input a.c (2 vs 1)", "a.o is dirty",
+              "command line changed for b.o", "b.o is dirty",
+              "command line changed for c.o", "c.o is dirty" ]
+    results = explain.summarize( lines )
+    assert [ (r['kind'], r['edges']) for r in results ] == [ (explain.CAUSE_COMMAND, 2), (explain.CAUSE_INPUT, 1) ]
+
+def test_summarize_unexplained_built_edges():
+    lines   = [ "output a.o older than most recent input a.c (2 vs 1)", "a.o is dirty" ]
+    results = explain.summarize( lines, { 'a.out': [ 'a.o' ], 'x.o': [ 'x.c' ] }, built=[ 'a.o', './a.out', 'x.o' ] )
+    by_kind = { r['kind']: r for r in results }
+    assert by_kind[explain.CAUSE_INPUT]['outputs'] == [ 'a.o', 'a.out' ]
+    assert by_kind[explain.CAUSE_UNKNOWN]['outputs'] == [ 'x.o' ]
+
+def test_summarize_nothing_to_do():
+    assert explain.summarize( [] ) == []
+
+
+#-----------------------------------------------------------------------------
+BUILD_NINJA = """rule cc
+  command = gcc -c $in -o $out
+
+build src/a.o: cc ../src/a.cpp | ../gen/hdr.h || order_only
+build src/my$ file.o: cc ../src/my$ file.cpp
+build lib.a: ar src/a.o $
+    src/my$ file.o
+build a.out | a.map: link lib.a
+"""
+
+def test_read_build_inputs( tmp_path ):
+    fname = tmp_path / 'build.ninja'
+    fname.write_text( BUILD_NINJA )
+    inputs = explain.read_build_inputs( str(fname) )
+    assert inputs['src/a.o'] == [ '../src/a.cpp', '../gen/hdr.h' ]
+    assert inputs['src/my file.o'] == [ '../src/my file.cpp' ]
+    assert inputs['lib.a'] == [ 'src/a.o', 'src/my file.o' ]
+    assert inputs['a.out'] == [ 'lib.a' ]
+    assert inputs['a.map'] == [ 'lib.a' ]
+
+def test_read_build_inputs_missing( tmp_path ):
+    assert explain.read_build_inputs( str(tmp_path / 'build.ninja') ) == {}
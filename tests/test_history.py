@@ -0,0 +1,89 @@
+""" Unit tests for the duration history and the scheduling helpers
+    (nqbplib/history.py)
+"""
+
+import pytest
+
+from nqbplib import history
+from nqbplib import utils
+
+
+#-----------------------------------------------------------------------------
+def test_predict_is_the_median( cache_root ):
+    h = history.History( 'history.json' )
+    assert h.predict( 'a' ) == None
+    for s in ( 10, 2, 3 ):
+        h.record( 'a', s )
+    assert h.samples( 'a' ) == [ 10, 2, 3 ]
+    assert h.predict( 'a' ) == 3
+
+def test_max_samples( cache_root ):
+    h = history.History( 'history.json', max_samples=2 )
+    for s in ( 1, 2, 3 ):
+        h.record( 'a', s )
+    h.save()
+    assert h.samples( 'a' ) == [ 2, 3 ]
+    assert history.History( 'history.json', max_samples=2 ).samples( 'a' ) == [ 2, 3 ]
+
+def test_save_merges_concurrent_runs( cache_root ):
+    first  = history.History( 'history.json' )
+    second = history.History( 'history.json' )
+    first.record( 'a', 1.0 )
+    second.record( 'a', 2.0 )
+    second.record( 'b', 5.0 )
+    first.save()
+    second.save()
+    assert utils.read_cache_file( 'history.json' ) == { 'a': [ 1.0, 2.0 ], 'b': [ 5.0 ] }
+
+def test_save_without_samples( cache_root ):
+    history.History( 'history.json' ).save()
+    assert not ( cache_root / 'history.json' ).exists()
+
+
+#-----------------------------------------------------------------------------
+def _history( cache_root, samples ):
+    utils.write_cache_file( 'history.json', samples )
+    return history.History( 'history.json' )
+
+def test_estimate( cache_root ):
+    h = _history( cache_root, { 'a': [ 10 ], 'b': [ 2 ], 'c': [ 4 ] } )
+    assert history.estimate( h, [ 'a', 'x', 'b' ] ) == [ 10, 6, 2 ]
+    assert history.estimate( h, [ 'x', 'y' ] ) == None
+
+def test_longest_first_is_stable():
+    assert history.longest_first( [ 'a', 'b', 'c', 'd' ], [ 1, 5, 1, 3 ] ) == [ 'b', 'd', 'a', 'c' ]
+    assert history.longest_first( [], [] ) == []
+
+
+#-----------------------------------------------------------------------------
+def test_partition_balances_the_bins():
+    keys      = [ 'a', 'b', 'c', 'd', 'e' ]
+    durations = [ 7, 5, 4, 3, 1 ]
+    bins      = history.partition( keys, durations, 2 )
+    loads     = [ sum( d for d, b in zip( durations, bins ) if b == n ) for n in range(2) ]
+    assert loads == [ 10, 10 ]
+
+def test_partition_ignores_the_item_order():
+    keys      = [ 'a', 'b', 'c', 'd', 'e', 'f' ]
+    durations = [ 3, 3, 3, 1, 2, 2 ]
+    bins      = dict( zip( keys, history.partition( keys, durations, 3 ) ) )
+    reverse   = dict( zip( keys[::-1], history.partition( keys[::-1], durations[::-1], 3 ) ) )
+    assert bins == reverse
+
+def test_partition_is_stable_for_small_changes():
+    keys = [ 'a', 'b', 'c', 'd' ]
+    assert history.partition( keys, [ 100, 50, 40, 10 ], 2 ) == history.partition( keys, [ 101, 50.4, 39.8, 10 ], 2 )
+
+def test_partition_more_bins_than_items():
+    bins = history.partition( [ 'a', 'b' ], [ 1, 2 ], 4 )
+    assert sorted( bins ) == [ 0, 1 ]
+
+@pytest.mark.parametrize( 'durations,workers,expected', [
+    ( [ 4, 3, 2, 1 ], 1, 10 ),
+    ( [ 4, 3, 2, 1 ], 2, 5 ),
+    ( [ 1, 1, 1, 4 ], 2, 5 ),        # Longest last: worse than longest first
+    ( [ 4, 1, 1, 1 ], 2, 4 ),
+    ( [ 5 ], 8, 5 ),
+] )
+def test_makespan( durations, workers, expected ):
+    assert history.makespan( durations, workers ) == expected
@@ -0,0 +1,109 @@
+""" Unit tests for the jobserver (nqbplib/jobserver.py) """
+
+import os
+import stat
+
+import pytest
+
+from nqbplib import jobserver
+
+pytestmark = pytest.mark.skipif( os.name != 'posix', reason='the jobserver is only supported on POSIX hosts' )
+
+
+#-----------------------------------------------------------------------------
+@pytest.fixture( autouse=True )
+def no_jobserver( monkeypatch ):
+    monkeypatch.delenv( jobserver.JOBSERVER_ENV, raising=False )
+    monkeypatch.delenv( jobserver.SHARE_ENV, raising=False )
+
+def test_server_advertises_the_pool():
+    with jobserver.Server( 4, implicit=2 ) as server:
+        assert jobserver.get_auth() == 'fifo:' + server.path
+        assert ' -j4 ' in os.environ[jobserver.JOBSERVER_ENV]
+        assert jobserver.fair_share() == 2
+        assert stat.S_ISFIFO( os.stat( server.path ).st_mode )
+        path = server.path
+    assert jobserver.get_auth() == None
+    assert jobserver.fair_share() == None
+    assert not os.path.exists( path )
+
+def test_server_restores_the_environment( monkeypatch ):
+    monkeypatch.setenv( jobserver.JOBSERVER_ENV, ' -k' )
+    with jobserver.Server( 2 ):
+        assert os.environ[jobserver.JOBSERVER_ENV].startswith( ' -k ' )
+    assert os.environ[jobserver.JOBSERVER_ENV] == ' -k'
+
+def test_fifo_client():
+    with jobserver.Server( 3 ) as server:
+        with jobserver.connect() as client:
+            assert client.try_acquire( 5 ) == 2         # One of the three tokens is implicit
+            assert client.try_acquire( 1 ) == 0
+            client.release()
+            assert client.try_acquire( 1 ) == 1
+        with jobserver.Client( 'fifo:' + server.path ) as other:
+            assert other.try_acquire( 5 ) == 2           # Closing the first client returned its tokens
+
+def test_pipe_client():
+    r, w = os.pipe()
+    try:
+        os.write( w, jobserver.TOKEN * 2 )
+        client = jobserver.Client( f"{r},{w}" )
+        assert client.try_acquire( 1 ) == 1
+        assert client.try_acquire( 5 ) == 1
+        assert client.try_acquire( 1 ) == 0             # An empty pool must not block
+        assert os.get_blocking( r )                     # The shared (inherited) pipe is never made non-blocking
+        client.close()
+        assert os.read( r, 10 ) == jobserver.TOKEN * 2
+        os.fstat( r )                                   # The inherited fds are not closed by the client
+    finally:
+        os.close( r )
+        os.close( w )
+
+def test_pipe_client_not_inherited():
+    r, w = os.pipe()
+    os.close( r )
+    os.close( w )
+    with pytest.raises( OSError ):
+        jobserver.Client( f"{r},{w}" )
+
+#-----------------------------------------------------------------------------
+@pytest.mark.parametrize( 'flags,auth', [
+    ( '',                                                   None ),
+    ( ' -j8',                                               None ),
+    ( ' -j8 --jobserver-auth=fifo:/tmp/x/fifo',             'fifo:/tmp/x/fifo' ),
+    ( ' -j8 --jobserver-auth=3,4',                          '3,4' ),
+    ( ' -j8 --jobserver-fds=3,4',                           '3,4' ),
+    ( ' --jobserver-auth=3,4 -j2 --jobserver-auth=fifo:/f', 'fifo:/f' ),
+] )
+def test_get_auth( flags, auth ):
+    assert jobserver.get_auth( { jobserver.JOBSERVER_ENV: flags } ) == auth
+
+def test_connect_without_a_jobserver():
+    assert jobserver.connect() == None
+
+def test_connect_to_a_bad_jobserver( monkeypatch ):
+    monkeypatch.setenv( jobserver.JOBSERVER_ENV, ' -j2 --jobserver-auth=bogus' )
+    assert jobserver.connect() == None
+
+def test_create_defers_to_an_existing_pool():
+    with jobserver.create( 2 ) as server:
+        assert server != None
+        assert jobserver.create( 2 ) == None
+
+@pytest.mark.parametrize( 'value,share', [ ( '3', 3 ), ( '0', 1 ), ( 'x', None ) ] )
+def test_fair_share( monkeypatch, value, share ):
+    monkeypatch.setenv( jobserver.SHARE_ENV, value )
+    assert jobserver.fair_share() == share
+
+#-----------------------------------------------------------------------------
+@pytest.mark.parametrize( 'version,client', [ ( '1.13.1', True ), ( '1.10.1', False ), ( '2.0.0', True ) ] )
+def test_ninja_is_client( tmp_path, cache_root, version, client ):
+    ninja = tmp_path / 'ninja'
+    ninja.write_text( f"#!/bin/sh\necho {version}\n" )
+    ninja.chmod( 0o755 )
+    assert jobserver.ninja_is_client( str(ninja) ) == client
+    assert ( cache_root / jobserver.NINJA_CACHE_FILE ).is_file()
+    assert jobserver.ninja_is_client( str(ninja) ) == client
+
+def test_ninja_is_client_not_installed( tmp_path ):
+    assert jobserver.ninja_is_client( str(tmp_path / 'ninja') ) == False
@@ -0,0 +1,80 @@
+""" Unit tests for the command line parsing in nqbplib/mk.py """
+
+import pytest
+
+from nqbplib import mk
+from nqbplib.my_globals import NQBP_VERSION
+from nqbplib.docopt.docopt import docopt
+
+
+#-----------------------------------------------------------------------------
+# Command lines that the fast path parser handles itself
+ACCEPTED = [
+    [],
+    ['-g'],
+    ['-c', '-g', '-1', '-v'],
+    ['-b', 'posix64'],
+    ['-g', '-b', 'posix64'],
+    ['--try', 'cpp11'],
+    ['--bld-all', '--bldtime'],
+    ['-g', '-1', '--bldnum', '5'],
+    ['--def1', 'FOO', '--def5', 'BAR=1'],
+    ['-z'],
+    ['--clean-all'],
+    ['--qry'],
+    ['--qry-and-clean'],
+    ['--qry-blds'],
+    ['--qry-dirs2', '-b', 'posix64'],
+    ['--deps', '--debug'],
+    ['--explain', '--time-trace'],
+    ['--launcher', 'ccache'],
+    ['--events', 'events.jsonl', '--profile', 'gen.prof'],
+    ['--vs'],
+    ['--vsjson', '-g'],
+    ['--vsgdb'],
+    ['--hdr-cost'],
+]
+
+# Command lines that are handed off to docopt
+DEFERRED = [
+    [''],
+    ['-h'],
+    ['--help'],
+    ['--version'],
+    ['-gv'],
+    ['-bposix64'],
+    ['--bldnum=5'],
+    ['--qry-b'],
+    ['--nosuch'],
+    ['-g', '-g'],
+    ['-b', 'a', '-b', 'b'],
+    ['-b'],
+    ['-b', '-g'],
+    ['target'],
+]
+
+@pytest.mark.parametrize( 'argv', ACCEPTED, ids=lambda a: ' '.join(a) or '<none>' )
+def test_fast_parse_matches_docopt( argv ):
+    fast = mk._fast_parse_arguments( argv )
+    assert fast != None
+    assert fast == dict( docopt( mk.usage, argv=argv, version=NQBP_VERSION() ) )
+
+@pytest.mark.parametrize( 'argv', DEFERRED, ids=lambda a: ' '.join(a) )
+def test_fast_parse_defers_to_docopt( argv ):
+    assert mk._fast_parse_arguments( argv ) == None
+
+def test_parse_arguments_falls_back_to_docopt():
+    args = mk.parse_arguments( ['-gv', '-b', 'posix64'] )
+    assert args['-g'] == True
+    assert args['-v'] == True
+    assert args['-b'] == 'posix64'
+
+def test_usage_options_parsed_once():
+    assert mk._usage_options() is mk._usage_options()
+
+def test_usage_options_defaults():
+    options = mk._usage_options()
+    assert options['-z'] == ('--clean-all', False, False)
+    assert options['--clean-all'] == ('--clean-all', False, False)
+    assert options['-b'] == ('-b', True, None)
+    assert options['--bldnum'] == ('--bldnum', True, '0')
@@ -0,0 +1,97 @@
+""" Unit tests for the build stamps (nqbplib/stamps.py) """
+
+import os
+
+import pytest
+
+from nqbplib import stamps
+from nqbplib import jobserver
+
+
+#-----------------------------------------------------------------------------
+def test_environment( monkeypatch ):
+    monkeypatch.setenv( 'NQBP_CC_LAUNCHER', 'ccache' )
+    monkeypatch.setenv( 'PATH', '/usr/bin' )
+    monkeypatch.setenv( 'HOME_NOT_NQBP', 'x' )
+    for name in stamps.RUN_ENV:
+        monkeypatch.setenv( name, 'per-run' )
+    env = stamps.environment()
+    assert env['NQBP_CC_LAUNCHER'] == 'ccache'
+    assert env['PATH'] == '/usr/bin'
+    assert 'HOME_NOT_NQBP' not in env
+    for name in ( 'NQBP_STAMP_FILE', 'NQBP_EVENTS_FILE', 'NQBP_JOBSERVER', jobserver.SHARE_ENV ):
+        assert name not in env
+
+def test_file_signature( tmp_path ):
+    fname = tmp_path / 'a.h'
+    assert stamps.file_signature( str(fname) ) == None
+    fname.write_text( 'x' )
+    sig = stamps.file_signature( str(fname) )
+    assert sig[1] == 1
+    fname.write_text( 'xy' )
+    assert stamps.file_signature( str(fname) ) != sig
+
+def test_dir_signature( tmp_path ):
+    assert stamps.dir_signature( str(tmp_path / 'nosuch') ) == None
+    (tmp_path / 'a.cpp').write_text( 'a' )
+    (tmp_path / 'sub').mkdir()
+    sig = stamps.dir_signature( str(tmp_path) )
+    (tmp_path / 'sub' / 'x.cpp').write_text( 'x' )
+    assert stamps.dir_signature( str(tmp_path) ) == sig     # Not recursive
+    (tmp_path / 'b.cpp').write_text( 'b' )
+    assert stamps.dir_signature( str(tmp_path) ) != sig     # New file
+    (tmp_path / 'b.cpp').unlink()
+    assert stamps.dir_signature( str(tmp_path) ) == sig     # Deleted file
+
+
+#-----------------------------------------------------------------------------
+@pytest.fixture
+def stamp( tmp_path, cache_root, monkeypatch ):
+    """ Writes a stamp for a project directory with a single header file """
+    monkeypatch.delenv( stamps.STAMP_ENV, raising=False )
+    prjdir = tmp_path / 'prj'
+    prjdir.mkdir()
+    (prjdir / 'main.cpp').write_text( 'int main() {}' )
+    (tmp_path / 'a.h').write_text( '#pragma once' )
+    fname = str(tmp_path / 'stamp.json')
+    rec   = stamps.Recorder( fname, str(prjdir) )
+    rec.files.add( str(tmp_path / 'a.h') )
+    rec.extra['posix64'] = 'gcc'
+    rec.write( [ '-g' ] )
+    return fname
+
+def test_is_current( stamp ):
+    assert stamps.is_current( stamp )
+
+def test_is_current_missing_stamp( tmp_path ):
+    assert not stamps.is_current( str(tmp_path / 'stamp.json') )
+
+def test_changed_file( stamp, tmp_path ):
+    (tmp_path / 'a.h').write_text( '#pragma once // changed' )
+    assert not stamps.is_current( stamp )
+
+def test_new_source_file( stamp, tmp_path ):
+    (tmp_path / 'prj' / 'new.cpp').write_text( '' )
+    assert not stamps.is_current( stamp )
+
+def test_changed_environment( stamp, monkeypatch ):
+    monkeypatch.setenv( 'NQBP_AR_MODE', 'thin' )
+    assert not stamps.is_current( stamp )
+
+def test_per_run_environment_is_ignored( stamp, monkeypatch ):
+    monkeypatch.setenv( 'NQBP_EVENTS_FILE', 'events.jsonl' )
+    monkeypatch.setenv( jobserver.SHARE_ENV, '3' )
+    assert stamps.is_current( stamp )
+
+def test_nothing_built( tmp_path, cache_root ):
+    fname = str(tmp_path / 'stamp.json')
+    stamps.Recorder( fname, str(tmp_path) ).write( [] )
+    assert not os.path.exists( fname )
+
+def test_recorder_is_not_inherited( tmp_path, monkeypatch ):
+    monkeypatch.delenv( stamps.STAMP_ENV, raising=False )
+    assert stamps.recorder( str(tmp_path) ) == None
+    monkeypatch.setenv( stamps.STAMP_ENV, 'stamp.json' )
+    rec = stamps.recorder( str(tmp_path) )
+    assert rec.fname == os.path.abspath( 'stamp.json' )
+    assert stamps.STAMP_ENV not in os.environ
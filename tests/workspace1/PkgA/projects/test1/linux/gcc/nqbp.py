@@ -9,15 +9,17 @@ if __name__ == '__main__':
 	# Make sure the environment is properly set
 	NQBP_BIN = os.environ.get('NQBP_BIN')
 	if ( NQBP_BIN is None ):
-	    sys.exit( "ERROR: The environment variable NQBP_BIN is not set!" )
+		sys.exit( "ERROR: The environment variable NQBP_BIN is not set!" )
 	sys.path.append( NQBP_BIN )
 
 	# Find the Package & Workspace root
 	from nqbplib import utils
 	utils.set_pkg_and_wrkspace_roots(__file__)
 
-	# Call into core/common scripts
-	import mytoolchain
+	# Call into core/common scripts (the toolchain is only imported/created when needed)
+	def create_toolchain():
+		import mytoolchain
+		return mytoolchain.create()
 	from nqbplib import mk
-	mk.build( sys.argv, mytoolchain.create() )
+	mk.build( sys.argv, create_toolchain, os.path.dirname(os.path.abspath(__file__)) )
 